@@ -1,38 +1,108 @@
 """API маршруты для чат-бота."""
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+import asyncio
+import secrets
+import threading
+from typing import Optional
 
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.deadline import Deadline, RequestCancelled
 from app.core.logger import logger
+from app.core.memory_usage import start_tracemalloc, stop_tracemalloc, tracemalloc_top
 from app.rag.pipeline import LangChainRAGPipeline
-from app.schemas import ChatRequest, ChatResponse, HealthResponse
+from app.schemas import (
+    ChatRequest,
+    ChatResponse,
+    HealthDetailsResponse,
+    HealthResponse,
+    IndexReloadRequest,
+    IndexReloadResponse,
+    MemoryReportResponse,
+    TracemallocRequest,
+    TracemallocSnapshot,
+)
 
 # Создаем роутер
 router = APIRouter(tags=["chat"])
 
-# Глобальный экземпляр пайплайна
-rag_pipeline = LangChainRAGPipeline()
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    """Пускает только запросы с верным X-Admin-Token."""
+    if not settings.admin_token:
+        raise HTTPException(status_code=403, detail="Админские эндпоинты выключены")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=401, detail="Неверный админский токен")
+
+
+# Пайплайн процесса создается при первом обращении, а не при импорте модуля:
+# загрузка моделей и индекса не мешает импорту приложения и тестам
+_rag_pipeline: Optional[LangChainRAGPipeline] = None
+_rag_pipeline_lock = threading.Lock()
+
+
+def get_pipeline() -> LangChainRAGPipeline:
+    """Пайплайн процесса (создается при старте приложения или первом запросе)."""
+    global _rag_pipeline
+    if _rag_pipeline is None:
+        with _rag_pipeline_lock:
+            if _rag_pipeline is None:
+                _rag_pipeline = LangChainRAGPipeline()
+    return _rag_pipeline
+
+
+# Статус ответа клиенту, который уже отключился (как у nginx)
+CLIENT_CLOSED_REQUEST = 499
+
+
+async def watch_disconnect(http_request: Request, deadline: Deadline) -> None:
+    """Отменяет запрос, если клиент закрыл соединение, не дождавшись ответа."""
+    while not deadline.cancelled:
+        if await http_request.is_disconnected():
+            logger.info("Клиент отключился, отменяем запрос")
+            deadline.cancel("disconnected")
+            return
+        await asyncio.sleep(settings.disconnect_poll_interval)
 
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest) -> ChatResponse:
-    """Обрабатывает чат-запрос."""
+async def chat(request: ChatRequest, http_request: Request,
+               rag_pipeline: LangChainRAGPipeline = Depends(get_pipeline)) -> ChatResponse:
+    """Обрабатывает чат-запрос.
+    
+    Пайплайн работает в пуле потоков с дедлайном `request_timeout`, а
+    обработчик тем временем следит за соединением: при отключении клиента
+    или по дедлайну стадии прерываются, а генерация Ollama обрывается.
+    """
+    deadline = Deadline(settings.request_timeout)
+    watcher = asyncio.ensure_future(watch_disconnect(http_request, deadline))
     try:
         # Генерируем ответ через RAG пайплайн
-        response = rag_pipeline.answer(request)
+        response = await run_in_threadpool(rag_pipeline.answer, request, deadline)
         
         return response
         
+    except RequestCancelled as e:
+        if e.reason == "disconnected":
+            return Response(status_code=CLIENT_CLOSED_REQUEST)
+        raise HTTPException(status_code=504, detail="Превышено время обработки запроса")
     except Exception as e:
         logger.error(f"Ошибка обработки запроса: {e}")
         raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+    finally:
+        watcher.cancel()
 
 
 @router.get("/health", response_model=HealthResponse)
-async def health_check() -> HealthResponse:
+async def health_check(rag_pipeline: LangChainRAGPipeline = Depends(get_pipeline)) -> HealthResponse:
     """Проверка состояния системы."""
     try:
-        # Проверяем здоровье пайплайна
-        is_healthy = rag_pipeline.health_check()
+        # Пока кэш фоновых проб пуст, health_check опрашивает компоненты
+        # с таймаутами, поэтому выполняется вне event loop
+        is_healthy = await run_in_threadpool(rag_pipeline.health_check)
         
         status = "healthy" if is_healthy else "unhealthy"
         
@@ -46,4 +116,52 @@ async def health_check() -> HealthResponse:
         return HealthResponse(
             status="unhealthy",
             message=f"Ошибка проверки здоровья: {str(e)}"
-        ) 
\ No newline at end of file
+        ) 
+
+
+@router.get("/health/details", response_model=HealthDetailsResponse)
+async def health_details(rag_pipeline: LangChainRAGPipeline = Depends(get_pipeline)) -> HealthDetailsResponse:
+    """Кэшированный статус компонентов (без обращения к LLM и векторной БД)."""
+    components = rag_pipeline.health_details()
+    is_healthy = bool(components) and all(
+        item["healthy"] and not item["stale"] for item in components.values()
+    )
+    
+    return HealthDetailsResponse(
+        status="healthy" if is_healthy else "unhealthy",
+        components=components
+    )
+
+
+@router.post("/admin/index/reload", response_model=IndexReloadResponse, dependencies=[Depends(require_admin)])
+async def reload_index(request: Optional[IndexReloadRequest] = None,
+                       rag_pipeline: LangChainRAGPipeline = Depends(get_pipeline)) -> IndexReloadResponse:
+    """Переключает API на новую сборку индекса без простоя."""
+    collection = request.collection if request else None
+    try:
+        result = await run_in_threadpool(rag_pipeline.reload_index, collection)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Ошибка перезагрузки индекса: {e}")
+        raise HTTPException(status_code=409, detail=f"Сборка не прошла проверку, индекс не изменен: {e}")
+    
+    return IndexReloadResponse(**result)
+
+
+@router.get("/debug/memory", response_model=MemoryReportResponse, dependencies=[Depends(require_admin)])
+async def debug_memory(top: int = Query(default=20, ge=0, le=200),
+                       rag_pipeline: LangChainRAGPipeline = Depends(get_pipeline)) -> MemoryReportResponse:
+    """Память по компонентам и, если включен tracemalloc, `top` крупнейших мест выделения."""
+    report = await run_in_threadpool(rag_pipeline.memory_report, top)
+    return MemoryReportResponse(**report)
+
+
+@router.post("/debug/memory/tracemalloc", response_model=TracemallocSnapshot, dependencies=[Depends(require_admin)])
+async def toggle_tracemalloc(request: TracemallocRequest) -> TracemallocSnapshot:
+    """Включает или выключает tracemalloc (пока он включен, выделения памяти медленнее)."""
+    if request.enabled:
+        start_tracemalloc(request.frames)
+    else:
+        stop_tracemalloc()
+    return TracemallocSnapshot(**tracemalloc_top(0))
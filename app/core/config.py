@@ -1,6 +1,7 @@
 """Конфигурация приложения."""
+import os
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import Field
 from pydantic_settings import BaseSettings
@@ -15,25 +16,130 @@ class Settings(BaseSettings):
     chunks_dir: Path = Field(default=Path("data/chunks"), description="Папка с чанками")
     chroma_dir: Path = Field(default=Path("data/chroma"), description="Папка Chroma DB")
     models_dir: Path = Field(default=Path("models"), description="Папка с моделями")
+    offline_models: bool = Field(
+        default=False,
+        description="Загружать модели только из models_dir (make fetch-models), без Hugging Face Hub"
+    )
     
     # Moodle API
     moodle_api_url: str = Field(
         default="https://docs.moodle.org/403/en/api.php",
         description="URL MediaWiki API Moodle"
     )
-    moodle_version: str = Field(default="403", description="Версия Moodle")
-    moodle_lang: str = Field(default="en", description="Язык документации")
+    moodle_version: str = Field(default="403", description="Версия Moodle по умолчанию")
+    moodle_lang: str = Field(default="en", description="Язык документации по умолчанию")
+    docs_base_url: str = Field(default="https://docs.moodle.org", description="Базовый URL документации")
+    doc_versions: List[str] = Field(
+        default=["403"],
+        description="Версии документации, для которых строятся коллекции (например 311, 401, 403)"
+    )
+    doc_languages: List[str] = Field(
+        default=["en"],
+        description="Языки документации, для которых строятся коллекции"
+    )
     
     # Chroma DB
     collection_name: str = Field(default="moodle_docs", description="Имя коллекции Chroma")
+    vector_store_client: str = Field(
+        default="persistent",
+        description="Доступ к индексу: persistent (локальная папка), http (сервер Chroma) или service (сервис поиска)"
+    )
+    chroma_host: str = Field(default="localhost", description="Хост сервера Chroma при vector_store_client=http")
+    chroma_port: int = Field(default=8001, description="Порт сервера Chroma")
+    chroma_ssl: bool = Field(default=False, description="HTTPS к серверу Chroma")
+    retrieval_service_url: str = Field(
+        default="http://localhost:8002",
+        description="URL сервиса поиска при vector_store_client=service"
+    )
+    retrieval_service_timeout: float = Field(default=10.0, description="Таймаут запроса к сервису поиска (секунды)")
+    retrieval_service_pool_size: int = Field(
+        default=20,
+        description="Размер пула keep-alive соединений к сервису поиска"
+    )
+    retrieval_service_port: int = Field(default=8002, description="Порт, на котором запускается сервис поиска")
+    hnsw_space: str = Field(default="cosine", description="Метрика HNSW индекса: cosine, ip или l2")
+    hnsw_m: int = Field(default=16, description="Число связей вершины в графе HNSW (M)")
+    hnsw_construction_ef: int = Field(default=100, description="Ширина поиска при построении HNSW")
+    hnsw_search_ef: int = Field(default=50, description="Ширина поиска при запросе к HNSW")
+    vector_store: str = Field(
+        default="chroma",
+        description=(
+            "Поиск чанков: chroma (HNSW), quantized (квантованные коды в памяти процесса) "
+            "или bundle (бандл индекса, отображенный в память)"
+        )
+    )
+    quantization: str = Field(default="int8", description="Коды квантованного хранилища: int8 или binary")
+    quantized_shortlist: int = Field(
+        default=50,
+        description="Сколько кандидатов по кодам пересчитывать по float16 векторам"
+    )
+    quantized_dir: Path = Field(default=Path("data/quantized"), description="Папка квантованных индексов")
+    build_quantized_index: bool = Field(
+        default=True,
+        description="Строить квантованный индекс при загрузке в Chroma"
+    )
+    shared_vectors: bool = Field(
+        default=True,
+        description=(
+            "Квантованные векторы всех версий и языков хранятся одной матрицей по text_hash, "
+            "коллекции держат только номера своих строк"
+        )
+    )
+    blue_green_ingest: bool = Field(
+        default=True,
+        description="Загружать в новую сборку коллекции рядом с живой и переключаться после проверки"
+    )
+    index_keep_versions: int = Field(
+        default=1,
+        description="Сколько предыдущих сборок индекса хранить после переключения"
+    )
+    index_gc_grace_seconds: int = Field(
+        default=300,
+        description=(
+            "Через сколько секунд после переключения индекса закрывать прежний и удалять устаревшие сборки; "
+            "должно превышать INDEX_WATCH_INTERVAL и REQUEST_TIMEOUT"
+        )
+    )
+    index_watch_interval: int = Field(
+        default=0,
+        description="Интервал проверки реестра индекса для автоматической перезагрузки (0 — выключено)"
+    )
+    bundles_dir: Path = Field(default=Path("data/bundles"), description="Папка версионированных бандлов индекса")
+    build_index_bundle: bool = Field(
+        default=True,
+        description="Выпускать бандл индекса при загрузке в Chroma"
+    )
     
     # Embeddings
     embedding_model: str = Field(
         default="all-MiniLM-L6-v2",
         description="Модель для эмбеддингов"
     )
+    retrieval_mode: str = Field(
+        default="translate",
+        description="Режим поиска: translate (перевод + английские эмбеддинги) или multilingual"
+    )
+    multilingual_embedding_model: str = Field(
+        default="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+        description="Мультиязычная модель эмбеддингов для режима multilingual"
+    )
+    multilingual_collection_name: str = Field(
+        default="moodle_docs_multilingual",
+        description="Коллекция Chroma, проиндексированная мультиязычной моделью"
+    )
+    normalize_embeddings: bool = Field(
+        default=True,
+        description="L2-нормализация эмбеддингов (одинаково при загрузке и при запросе)"
+    )
     chunk_size: int = Field(default=1000, description="Размер чанка в символах")
     chunk_overlap: int = Field(default=100, description="Перекрытие чанков")
+    dedup_chunks: bool = Field(default=True, description="Удалять почти одинаковые чанки при разбиении")
+    dedup_threshold: float = Field(
+        default=0.85,
+        description="Коэффициент Жаккара шинглов, начиная с которого чанк считается дубликатом"
+    )
+    dedup_shingle_size: int = Field(default=5, description="Длина шингла в словах для поиска дубликатов")
+    dedup_num_perm: int = Field(default=64, description="Число хэш-функций MinHash")
     
     # LLM (LangChain)
     llm_provider: str = Field(default="ollama", description="Провайдер LLM (ollama, openai, etc.)")
@@ -43,16 +149,208 @@ class Settings(BaseSettings):
     llm_max_tokens: int = Field(default=4096, description="Максимум токенов для генерации")
     llm_temperature: float = Field(default=0.3, description="Температура генерации")
     llm_top_p: float = Field(default=0.9, description="Top-p параметр для генерации")
+    llm_max_concurrency: int = Field(
+        default=2,
+        description="Максимум одновременных генераций LLM (остальные ждут в очереди)"
+    )
+    degraded_mode: bool = Field(
+        default=True,
+        description="Отвечать выдержками из найденных документов, когда LLM перегружена или недоступна"
+    )
+    llm_queue_timeout: float = Field(
+        default=10.0,
+        description="Сколько секунд ждать свободного слота LLM до перехода на извлекающий ответ"
+    )
+    extractive_sentences: int = Field(
+        default=4,
+        description="Число предложений документации в извлекающем ответе"
+    )
+    token_accounting: bool = Field(
+        default=True,
+        description="Считать токены промпта по секциям и токены Ollama для каждого запроса"
+    )
+    llm_tokenizer: Optional[str] = Field(
+        default=None,
+        description=(
+            "Токенизатор модели LLM, например Qwen/Qwen2.5-7B-Instruct; загружается только из бандла "
+            "или кэша Hugging Face (make fetch-models). None — оценка по числу символов"
+        )
+    )
+    chars_per_token: float = Field(
+        default=3.5,
+        description="Символов на токен для оценки без токенизатора"
+    )
+    request_timeout: float = Field(
+        default=60.0,
+        description="Дедлайн обработки запроса /chat в секундах (0 — без дедлайна)"
+    )
+    disconnect_poll_interval: float = Field(
+        default=0.5,
+        description="Как часто проверять, не отключился ли клиент /chat (секунды)"
+    )
+    
+    # CPU инференс
+    optimized_inference: bool = Field(
+        default=False,
+        description="Int8 квантование и inference mode для переводчика и эмбеддингов"
+    )
+    torch_num_threads: Optional[int] = Field(
+        default=None,
+        description="Число потоков PyTorch (по умолчанию решает PyTorch)"
+    )
+    
+    # Перевод запросов
+    translation_model: str = Field(
+        default="Helsinki-NLP/opus-mt-ru-en",
+        description="Модель перевода ru -> en"
+    )
+    translation_max_length_ratio: float = Field(
+        default=2.0,
+        description="Максимальная длина перевода относительно длины входа в токенах"
+    )
+    translation_max_length_margin: int = Field(
+        default=16,
+        description="Запас токенов к длине перевода"
+    )
+    translation_num_beams: Optional[int] = Field(
+        default=None,
+        description="Число лучей при переводе (по умолчанию из конфигурации модели)"
+    )
+    glossary_fast_path: bool = Field(
+        default=True,
+        description="Переводить короткие запросы из известных терминов глоссарием без MarianMT"
+    )
+    glossary_fast_path_max_words: int = Field(
+        default=6,
+        description="Максимум слов в запросе для перевода только глоссарием"
+    )
+    glossary_annotate: bool = Field(
+        default=True,
+        description="Дополнять перевод MarianMT терминами Moodle из глоссария"
+    )
+    translation_cache_size: int = Field(
+        default=1024,
+        description="Размер LRU кэша переводов запросов"
+    )
+    
+    embedding_cache_size: int = Field(
+        default=1024,
+        description="Размер LRU кэша эмбеддингов запросов"
+    )
     
     # RAG
     top_k: int = Field(default=5, description="Количество релевантных документов")
+    adaptive_retrieval: bool = Field(
+        default=True,
+        description="Обрезать выдачу по порогу релевантности и разрыву оценок (не больше top_k)"
+    )
+    adaptive_min_k: int = Field(default=2, description="Минимум чанков в адаптивной выдаче")
+    adaptive_min_score: float = Field(
+        default=0.3,
+        description="Чанки с релевантностью ниже порога не попадают в контекст (после adaptive_min_k)"
+    )
+    adaptive_score_gap: float = Field(
+        default=0.15,
+        description="Разрыв релевантности с предыдущим чанком, на котором выдача обрывается"
+    )
+    skip_smalltalk_retrieval: bool = Field(
+        default=True,
+        description="Не искать документы для благодарностей, приветствий и подтверждений"
+    )
+    retrieval_strategy: str = Field(
+        default="flat",
+        description="Стратегия поиска: flat (все чанки) или hierarchical (страницы, затем их чанки)"
+    )
+    pages_collection_suffix: str = Field(
+        default="_pages",
+        description="Суффикс коллекции с векторами страниц"
+    )
+    hierarchical_top_pages: int = Field(
+        default=10,
+        description="Сколько страниц отбирать на первом этапе иерархического поиска"
+    )
+    page_title_weight: float = Field(
+        default=0.3,
+        description="Вес эмбеддинга заголовка в векторе страницы (остальное — центроид чанков)"
+    )
+    build_page_index: bool = Field(
+        default=True,
+        description="Строить коллекцию векторов страниц при загрузке"
+    )
+    title_index_mode: str = Field(
+        default="boost",
+        description="Поиск по заголовкам: off, boost (поднять страницу в выдаче) или direct (без векторного поиска)"
+    )
+    title_match_threshold: float = Field(
+        default=0.9,
+        description="Минимальная уверенность совпадения с заголовком"
+    )
+    title_fuzzy_threshold: float = Field(
+        default=0.8,
+        description="Порог нечеткого совпадения заголовков (коэффициент Дайса по триграммам)"
+    )
+    title_boost_chunks: int = Field(
+        default=2,
+        description="Сколько чанков найденной по заголовку страницы ставить в начало выдачи"
+    )
+    faq_enabled: bool = Field(
+        default=True,
+        description="Отвечать на частые вопросы из заранее сгенерированных ответов"
+    )
+    faq_path: Path = Field(
+        default=Path("data/faq/answers.jsonl"),
+        description="JSONL с ответами scripts/batch_answer.py для FAQ"
+    )
+    faq_match_threshold: float = Field(
+        default=0.92,
+        description="Порог почти точного совпадения вопроса с FAQ (коэффициент Дайса по триграммам)"
+    )
     use_reranker: bool = Field(default=True, description="Использовать reranker")
     reranker_model: str = Field(
         default="cross-encoder/ms-marco-MiniLM-L-6-v2",
         description="Модель для reranker"
     )
     
+    # Health checks
+    health_check_interval: int = Field(
+        default=30,
+        description="Интервал фоновых проверок компонентов (секунды)"
+    )
+    health_probe_timeout: float = Field(
+        default=2.0,
+        description="Таймаут одной проверки компонента (секунды)"
+    )
+    health_stale_after: int = Field(
+        default=120,
+        description="Через сколько секунд результат проверки считается устаревшим"
+    )
+    memory_log_interval: int = Field(
+        default=600,
+        description="Интервал записи сводки памяти по компонентам в лог (секунды, 0 — выключено)"
+    )
+    tracemalloc_frames: int = Field(
+        default=1,
+        description="Глубина стека, которую tracemalloc сохраняет для каждого выделения"
+    )
+    
+    # Логирование
+    log_level: str = Field(default="INFO", description="Уровень логирования")
+    log_format: str = Field(default="json", description="Формат логов (json или text)")
+    log_file: Optional[Path] = Field(default=None, description="Файл логов (по умолчанию data/app.log)")
+    log_rotation: str = Field(default="size", description="Ротация логов (size или time)")
+    log_max_bytes: int = Field(default=10 * 1024 * 1024, description="Размер файла лога до ротации")
+    log_rotate_when: str = Field(default="midnight", description="Момент ротации при log_rotation=time")
+    log_backup_count: int = Field(default=5, description="Сколько ротированных файлов хранить")
+    log_request_sample_rate: float = Field(
+        default=1.0,
+        description="Доля запросов, для которых пишутся info-логи запроса (0-1)"
+    )
+    
     # API
+    admin_token: Optional[str] = Field(
+        default=None,
+        description="Токен для админских эндпоинтов (заголовок X-Admin-Token); без него они выключены"
+    )
     host: str = Field(default="0.0.0.0", description="Хост для API")
     port: int = Field(default=8000, description="Порт для API")
     debug: bool = Field(default=False, description="Режим отладки")
@@ -61,10 +359,62 @@ class Settings(BaseSettings):
         env_file = ".env"
         case_sensitive = False
     
+    def embedding_model_for(self, mode: Optional[str] = None) -> str:
+        """Модель эмбеддингов для режима поиска."""
+        if (mode or self.retrieval_mode) == "multilingual":
+            return self.multilingual_embedding_model
+        return self.embedding_model
+    
+    def docs_suffix(self, version: Optional[str] = None, lang: Optional[str] = None) -> str:
+        """Суффикс файлов и коллекций версии документации.
+        
+        Для версии и языка по умолчанию суффикс пустой, поэтому
+        существующие коллекции и файлы продолжают работать.
+        """
+        version = version or self.moodle_version
+        lang = lang or self.moodle_lang
+        if version == self.moodle_version and lang == self.moodle_lang:
+            return ""
+        return f"_{version}_{lang}"
+    
+    def collection_name_for(self, mode: Optional[str] = None, version: Optional[str] = None,
+                            lang: Optional[str] = None) -> str:
+        """Коллекция Chroma для режима поиска и версии документации."""
+        if (mode or self.retrieval_mode) == "multilingual":
+            base = self.multilingual_collection_name
+        else:
+            base = self.collection_name
+        return base + self.docs_suffix(version, lang)
+    
+    def shared_vectors_dir(self, model_name: str) -> Path:
+        """Общая матрица квантованных векторов модели эмбеддингов."""
+        return self.quantized_dir / "shared" / model_name.replace("/", "__")
+    
+    def hnsw_metadata(self) -> dict:
+        """Параметры HNSW в формате метаданных коллекции Chroma."""
+        return {
+            "hnsw:space": self.hnsw_space,
+            "hnsw:M": self.hnsw_m,
+            "hnsw:construction_ef": self.hnsw_construction_ef,
+            "hnsw:search_ef": self.hnsw_search_ef,
+        }
+    
+    def docs_url(self, title: str, version: Optional[str] = None, lang: Optional[str] = None) -> str:
+        """URL страницы документации нужной версии и языка."""
+        return (
+            f"{self.docs_base_url}/{version or self.moodle_version}/{lang or self.moodle_lang}/"
+            f"{title.replace(' ', '_')}"
+        )
+    
     def __post_init__(self):
         """Создаем необходимые директории."""
         for path in [self.data_dir, self.raw_dir, self.chunks_dir, self.chroma_dir, self.models_dir]:
             path.mkdir(parents=True, exist_ok=True)
 
 
-settings = Settings() 
\ No newline at end of file
+settings = Settings()
+
+if settings.offline_models:
+    # transformers и huggingface_hub читают эти переменные при импорте
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1") 
\ No newline at end of file
@@ -0,0 +1,90 @@
+"""Дедлайн запроса и его отмена при отключении клиента."""
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from app.core.metrics import CANCELLATIONS
+
+
+class RequestCancelled(Exception):
+    """Запрос отменен: истек дедлайн или клиент отключился.
+
+    Attributes:
+        reason: deadline или disconnected
+        stage: Стадия, на которой отмена была замечена
+    """
+
+    def __init__(self, reason: str, stage: str = ""):
+        super().__init__(f"Запрос отменен ({reason}) на стадии {stage or '-'}")
+        self.reason = reason
+        self.stage = stage
+
+
+class Deadline:
+    """Срок, к которому запрос должен быть обработан, и флаг его отмены.
+
+    Создается обработчиком запроса, отменяется им же при отключении
+    клиента, а стадии пайплайна из рабочего потока проверяют его через
+    `check_deadline`.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.expires_at = time.monotonic() + timeout if timeout else None
+        self._cancelled = threading.Event()
+        self._reason: Optional[str] = None
+
+    def cancel(self, reason: str = "disconnected") -> None:
+        """Отменяет запрос (первая причина сохраняется)."""
+        if self._reason is None:
+            self._reason = reason
+        self._cancelled.set()
+
+    def remaining(self) -> Optional[float]:
+        """Секунды до дедлайна (None — без дедлайна)."""
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def reason(self) -> Optional[str]:
+        """Причина отмены или None, если запрос еще можно продолжать."""
+        if self._reason is None and self.expires_at is not None and time.monotonic() >= self.expires_at:
+            self._reason = "deadline"
+        return self._reason
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def check(self, stage: str) -> None:
+        """Прерывает стадию, если запрос отменен.
+
+        Raises:
+            RequestCancelled: Истек дедлайн или клиент отключился
+        """
+        reason = self.reason
+        if reason is not None:
+            CANCELLATIONS.labels(reason=reason, stage=stage).inc()
+            raise RequestCancelled(reason, stage)
+
+
+# Дедлайн запроса, который обрабатывается в текущем потоке
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("current_deadline", default=None)
+
+
+def set_deadline(deadline: Optional[Deadline]) -> None:
+    """Привязывает дедлайн к текущему запросу."""
+    _current_deadline.set(deadline)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Дедлайн текущего запроса (None вне запроса API)."""
+    return _current_deadline.get()
+
+
+def check_deadline(stage: str) -> None:
+    """Прерывает стадию, если текущий запрос отменен; вне запроса ничего не делает."""
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.check(stage)
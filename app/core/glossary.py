@@ -0,0 +1,372 @@
+"""Глоссарный переводчик терминов Moodle на автомате Ахо-Корасик."""
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.memory_usage import deep_sizeof, usage
+
+# Термины Moodle: русская форма -> английский термин.
+# "*" в конце означает основу: совпадение с начала слова до его конца
+# ("курс*" покрывает "курс", "курсы", "курсов").
+RU_EN_TERMS = {
+    # Курсы и структура
+    "курс*": "course",
+    "категори*": "category",
+    "раздел*": "section",
+    "элемент*": "activity",
+    "активност*": "activity",
+    "деятельност*": "activity",
+    "ресурс*": "resource",
+    "страниц*": "page",
+    "файл*": "file",
+    "блок*": "block",
+    "сайт*": "site",
+    "мудл*": "moodle",
+    "систем*": "system",
+    "доступ*": "access",
+    "ссылк*": "link",
+    "спис*": "list",
+    "использ*": "use",
+    # Действия
+    "созда*": "create",
+    "добав*": "add",
+    "удал*": "delete",
+    "редактир*": "edit",
+    "настро*": "configure",
+    "настройк*": "settings",
+    "измен*": "change",
+    "просмотр*": "view",
+    "просматр*": "view",
+    "посмотр*": "view",
+    "загруз*": "upload",
+    "выгруз*": "download",
+    "скача*": "download",
+    "экспорт*": "export",
+    "импорт*": "import",
+    "восстанов*": "restore",
+    "установ*": "install",
+    "обнов*": "upgrade",
+    "скрыт*": "hide",
+    "назнач*": "assign",
+    "включ*": "enable",
+    "отключ*": "disable",
+    # Пользователи и доступ
+    "пользовател*": "user",
+    "студент*": "student",
+    "учащ*": "student",
+    "преподавател*": "teacher",
+    "учител*": "teacher",
+    "администратор*": "administrator",
+    "администрирован*": "administration",
+    "рол*": "role",
+    "права": "permissions",
+    "прав": "permissions",
+    "правами": "permissions",
+    "групп*": "group",
+    "когорт*": "cohort",
+    "зачисл*": "enrol",
+    "запис*": "enrol",
+    "способы записи": "enrolment methods",
+    "способ записи": "enrolment method",
+    "парол*": "password",
+    "аутентификаци*": "authentication",
+    "авторизаци*": "authentication",
+    "логин*": "login",
+    "почт*": "email",
+    "электронная почта": "email",
+    "электронной почты": "email",
+    # Оценивание
+    "оцен*": "grade",
+    "журнал оценок": "gradebook",
+    "журнала оценок": "gradebook",
+    "журнале оценок": "gradebook",
+    "журналом оценок": "gradebook",
+    "рубрик*": "rubric",
+    "шкал*": "scale",
+    "компетенци*": "competency",
+    "значк*": "badge",
+    "значок": "badge",
+    "сертификат*": "certificate",
+    # Элементы курса
+    "тест*": "quiz",
+    "вопрос*": "question",
+    "банк вопросов": "question bank",
+    "банке вопросов": "question bank",
+    "задани*": "assignment",
+    "форум*": "forum",
+    "чат*": "chat",
+    "опрос*": "survey",
+    "урок*": "lesson",
+    "глоссари*": "glossary",
+    "вики": "wiki",
+    "семинар*": "workshop",
+    "лекци*": "lesson",
+    # Отчеты и журналы
+    "журнал*": "log",
+    "журнал событий": "logs",
+    "журналы событий": "logs",
+    "журналы активности": "logs",
+    "лог*": "logs",
+    "отчет*": "report",
+    "отчёт*": "report",
+    "выполнени*": "completion",
+    "завершени*": "completion",
+    "отслеживан*": "tracking",
+    "календар*": "calendar",
+    "срок*": "deadline",
+    "уведомлени*": "notification",
+    "сообщени*": "message",
+    # Система
+    "резервн*": "backup",
+    "резервная копия": "backup",
+    "резервную копию": "backup",
+    "резервной копии": "backup",
+    "резервное копирование": "backup",
+    "резервного копирования": "backup",
+    "бэкап*": "backup",
+    "копи*": "copy",
+    "плагин*": "plugin",
+    "модул*": "module",
+    "тема оформления": "theme",
+    "темы оформления": "theme",
+    "язык*": "language",
+    "перевод*": "translation",
+    "кэш*": "cache",
+    "сервер*": "server",
+    "новост*": "news",
+    "нов*": "new",
+}
+
+# Служебные слова: переводятся (или отбрасываются), но не считаются терминами
+RU_FUNCTION_WORDS = {
+    "как": "how to",
+    "что": "what",
+    "где": "where",
+    "когда": "when",
+    "почему": "why",
+    "зачем": "why",
+    "какой": "which",
+    "какая": "which",
+    "какие": "which",
+    "каких": "which",
+    "сколько": "how many",
+    "можно": "can",
+    "нельзя": "cannot",
+    "не": "not",
+    "и": "and",
+    "или": "or",
+    "сдела*": "",
+    **{
+        word: ""
+        for word in (
+            "в", "во", "на", "с", "со", "к", "ко", "по", "для", "из", "от", "до", "о", "об",
+            "при", "за", "у", "ли", "же", "бы", "мне", "меня", "я", "мы", "вы", "мой", "моем",
+            "моём", "свой", "свои", "это", "этот", "эти", "все", "всех", "его", "их",
+            "чтобы", "нужно", "надо", "есть", "пожалуйста", "подскажите", "скажите",
+            "а", "но", "то", "так", "там", "тут", "здесь",
+        )
+    },
+}
+
+
+class AhoCorasick:
+    """Автомат Ахо-Корасик для поиска множества подстрок за один проход."""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, int]]] = [[]]
+        self._built = False
+
+    def add(self, pattern: str, value: int) -> None:
+        """Добавляет шаблон с индексом значения."""
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append((len(pattern), value))
+        self._built = False
+
+    def build(self) -> None:
+        """Строит суффиксные ссылки обходом в ширину."""
+        queue = deque(self._goto[0].values())
+        for node in queue:
+            self._fail[node] = 0
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+        self._built = True
+
+    def iter_matches(self, text: str):
+        """Выдает (start, end, value) для всех вхождений шаблонов."""
+        if not self._built:
+            self.build()
+
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, value in self._output[node]:
+                yield position - length + 1, position + 1, value
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum()
+
+
+def _is_cyrillic_word(word: str) -> bool:
+    return any("Ѐ" <= char <= "ӿ" for char in word)
+
+
+class GlossaryTranslator:
+    """Переводит известные термины Moodle по границам слов.
+
+    Автомат содержит русские термины (`RU_EN_TERMS`), служебные слова и
+    английские заголовки страниц из `moodle_all_pages.txt`, поэтому
+    термины в смешанных запросах ("настроить Gradebook") тоже распознаются.
+    """
+
+    def __init__(self, titles_path: Optional[Path] = None):
+        self.titles_path = titles_path or settings.raw_dir / "moodle_all_pages.txt"
+        self._automaton: Optional[AhoCorasick] = None
+        # (перевод, является ли термином, совпадение по основе)
+        self._entries: List[Tuple[str, bool, bool]] = []
+        self._lock = threading.Lock()
+
+    def _add_entry(self, automaton: AhoCorasick, pattern: str, translation: str, is_term: bool) -> None:
+        prefix = pattern.endswith("*")
+        automaton.add(pattern.rstrip("*").lower(), len(self._entries))
+        self._entries.append((translation, is_term, prefix))
+
+    def _build(self) -> AhoCorasick:
+        """Строит автомат при первом использовании."""
+        automaton = AhoCorasick()
+
+        for pattern, translation in RU_EN_TERMS.items():
+            self._add_entry(automaton, pattern, translation, True)
+        for pattern, translation in RU_FUNCTION_WORDS.items():
+            self._add_entry(automaton, pattern, translation, False)
+
+        titles = 0
+        if self.titles_path.exists():
+            for line in self.titles_path.read_text(encoding="utf-8").splitlines():
+                title = line.strip()
+                # Служебные пути вида "enrol/manual" в запросах не встречаются
+                if len(title) < 4 or "/" in title:
+                    continue
+                self._add_entry(automaton, title, title.lower(), True)
+                titles += 1
+
+        automaton.build()
+        logger.info(f"Глоссарий построен: {len(RU_EN_TERMS)} терминов, {titles} заголовков")
+        return automaton
+
+    @property
+    def automaton(self) -> AhoCorasick:
+        if self._automaton is None:
+            with self._lock:
+                if self._automaton is None:
+                    self._automaton = self._build()
+        return self._automaton
+
+    def memory_usage(self) -> Dict[str, Dict]:
+        """Память автомата (пока он не построен — ноль)."""
+        if self._automaton is None:
+            return {"glossary": usage("index", 0, entries=0)}
+        size = deep_sizeof(self._automaton) + deep_sizeof(self._entries)
+        return {"glossary": usage("index", size, entries=len(self._entries))}
+
+    def _select_matches(self, text: str) -> List[Tuple[int, int, int]]:
+        """Самые длинные непересекающиеся совпадения по границам слов.
+
+        Основы продлеваются до конца слова, поэтому пересекающиеся основы
+        ("лог*" и "логин*") дают одинаковые совпадения; из них выбирается
+        самая длинная основа.
+        """
+        candidates = []
+        for start, end, value in self.automaton.iter_matches(text):
+            if start > 0 and _is_word_char(text[start - 1]):
+                continue
+
+            pattern_length = end - start
+            _, _, prefix = self._entries[value]
+            if prefix:
+                # Основа: продлеваем совпадение до конца слова
+                while end < len(text) and _is_word_char(text[end]):
+                    end += 1
+            elif end < len(text) and _is_word_char(text[end]):
+                continue
+
+            candidates.append((start, end, value, pattern_length))
+
+        candidates.sort(key=lambda match: (match[0], -(match[1] - match[0]), -match[3]))
+
+        selected = []
+        position = 0
+        for start, end, value, _ in candidates:
+            if start >= position:
+                selected.append((start, end, value))
+                position = end
+        return selected
+
+    def annotate(self, text: str) -> Dict:
+        """Разбирает запрос на известные термины и непокрытые слова.
+
+        Returns:
+            Словарь с ключами translation (перевод известных слов),
+            terms (английские термины Moodle) и uncovered (русские слова
+            без перевода в глоссарии)
+        """
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            lowered = text
+
+        parts = []
+        terms = []
+        uncovered = []
+        position = 0
+
+        def consume_gap(gap: str) -> None:
+            for word in "".join(char if _is_word_char(char) else " " for char in gap).split():
+                if _is_cyrillic_word(word):
+                    uncovered.append(word)
+                else:
+                    parts.append(word)
+
+        for start, end, value in self._select_matches(lowered):
+            consume_gap(lowered[position:start])
+            translation, is_term, _ = self._entries[value]
+            if translation:
+                parts.append(translation)
+            if is_term and translation not in terms:
+                terms.append(translation)
+            position = end
+        consume_gap(lowered[position:])
+
+        return {"translation": " ".join(parts), "terms": terms, "uncovered": uncovered}
+
+    def translate(self, text: str) -> str:
+        """Перевод известных терминов, непокрытые русские слова отбрасываются."""
+        return self.annotate(text)["translation"]
+
+
+# Глобальный экземпляр глоссария
+glossary = GlossaryTranslator()
@@ -1,38 +1,199 @@
 """Логгер приложения."""
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import queue
 import sys
+import uuid
+import zlib
+from contextvars import ContextVar
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Optional
 
 from app.core.config import settings
 
+# Контекст текущего запроса, добавляется в каждую запись лога
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+session_id_var: ContextVar[Optional[str]] = ContextVar("session_id", default=None)
+
+# Слушатель очереди, пишущий записи в консоль и файл в фоновом потоке
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def bind_request_context(request_id: Optional[str] = None, session_id: Optional[str] = None) -> str:
+    """Привязывает request_id и session_id к текущему контексту."""
+    if request_id is None:
+        request_id = request_id_var.get() or uuid.uuid4().hex[:16]
+    request_id_var.set(request_id)
+
+    if session_id is not None:
+        session_id_var.set(session_id)
+
+    return request_id
+
+
+class RequestContextFilter(logging.Filter):
+    """Добавляет в запись идентификаторы запроса и сессии."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        record.session_id = session_id_var.get()
+        return True
+
+
+class RequestSamplingFilter(logging.Filter):
+    """Сэмплирует помеченные `sampled=True` info-записи по запросам.
+
+    Решение принимается по хэшу request_id, поэтому все записи одного
+    запроса либо пишутся, либо отбрасываются вместе. Предупреждения и
+    ошибки не сэмплируются.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "sampled", False) or record.levelno > logging.INFO:
+            return True
+        if self.rate >= 1.0:
+            return True
+        if self.rate <= 0.0:
+            return False
+
+        request_id = getattr(record, "request_id", None) or ""
+        bucket = zlib.crc32(request_id.encode("utf-8")) % 10000
+        return bucket < self.rate * 10000
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует записи в JSON lines."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+
+        for key in ("request_id", "session_id", "timings"):
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+
+        # Из очереди traceback приходит уже отформатированным в exc_text
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class TracebackQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, который передает traceback слушателю отдельно от сообщения.
+
+    Стандартный prepare() вклеивает traceback в текст сообщения и обнуляет
+    exc_info, поэтому JSON форматтер на стороне слушателя не видел исключения.
+    Здесь traceback форматируется в exc_text, а сообщение остается прежним.
+    """
+
+    _traceback_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or self._traceback_formatter.formatException(record.exc_info)
+        # Объекты исключения и traceback в очередь не передаются
+        record.exc_info = None
+        return record
+
+
+def _build_formatter() -> logging.Formatter:
+    """Форматтер по настройкам."""
+    if settings.log_format == "json":
+        return JsonFormatter()
+    return logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+    )
+
+
+def _build_file_handler(log_file: Path) -> logging.Handler:
+    """Файловый хендлер с ротацией по размеру или времени."""
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+
+    if settings.log_rotation == "time":
+        return logging.handlers.TimedRotatingFileHandler(
+            log_file,
+            when=settings.log_rotate_when,
+            backupCount=settings.log_backup_count,
+            encoding="utf-8",
+        )
+
+    return logging.handlers.RotatingFileHandler(
+        log_file,
+        maxBytes=settings.log_max_bytes,
+        backupCount=settings.log_backup_count,
+        encoding="utf-8",
+    )
+
+
+def _stop_listener() -> None:
+    """Дописывает очередь и останавливает слушатель при выходе."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def setup_logger(name: str = "moodle_rag_bot", level: Optional[str] = None) -> logging.Logger:
+    """Настройка логгера.
+
+    Запись в консоль и файл выполняет фоновый QueueListener, поэтому
+    вызовы логгера на пути запроса не блокируются на I/O.
+    """
+    global _listener
 
-def setup_logger(name: str = "moodle_rag_bot", level: str = "INFO") -> logging.Logger:
-    """Настройка логгера."""
     logger = logging.getLogger(name)
-    
+
     # Проверяем, не настроен ли уже логгер
     if logger.handlers:
         return logger
-    
-    logger.setLevel(getattr(logging, level.upper()))
-    
-    # Форматтер
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-    
+
+    logger.setLevel(getattr(logging, (level or settings.log_level).upper()))
+    logger.propagate = False
+
+    formatter = _build_formatter()
+
     # Консольный хендлер
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
-    # Файловый хендлер
-    log_file = settings.data_dir / "app.log"
-    file_handler = logging.FileHandler(log_file)
+
+    # Файловый хендлер с ротацией
+    file_handler = _build_file_handler(settings.log_file or settings.data_dir / "app.log")
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-    
+
+    # Очередь между потоком запроса и слушателем
+    log_queue: queue.Queue = queue.Queue(-1)
+    queue_handler = TracebackQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+    queue_handler.addFilter(RequestSamplingFilter(settings.log_request_sample_rate))
+    logger.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(
+        log_queue, console_handler, file_handler, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(_stop_listener)
+
     return logger
 
 
-logger = setup_logger() 
\ No newline at end of file
+logger = setup_logger()
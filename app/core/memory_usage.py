@@ -0,0 +1,241 @@
+"""Учет памяти по компонентам и снимки tracemalloc."""
+import resource
+import sys
+import threading
+import tracemalloc
+import types
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import COMPONENT_MEMORY
+
+# Объекты, которые не принадлежат компоненту и не обходятся
+_SKIP_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+_ATOMIC_TYPES = (str, bytes, bytearray, int, float, bool, complex, type(None))
+
+
+def deep_sizeof(obj: Any, sample: int = 256) -> int:
+    """Приблизительный размер объекта вместе со всем, на что он ссылается (байты).
+
+    Обходятся контейнеры, __dict__ и __slots__; объект, встреченный
+    повторно, не считается. Из контейнеров длиннее `sample` измеряется
+    равномерная выборка элементов, а результат масштабируется на весь
+    контейнер, поэтому индексы на сотни тысяч объектов оцениваются за
+    миллисекунды. Данные numpy массивов учитываются, только если массив
+    владеет ими (mmap-массивы дают размер заголовка).
+    """
+    seen = set()
+    total = 0.0
+    stack = [(obj, 1.0)]
+    while stack:
+        item, weight = stack.pop()
+        if id(item) in seen or isinstance(item, _SKIP_TYPES):
+            continue
+        seen.add(id(item))
+        try:
+            total += sys.getsizeof(item) * weight
+        except TypeError:
+            continue
+        if isinstance(item, _ATOMIC_TYPES):
+            continue
+
+        # Группы обходятся целиком: пара ключ-значение словаря или один элемент
+        if isinstance(item, dict):
+            groups = list(item.items())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            groups = [(child,) for child in item]
+        else:
+            groups = []
+            if hasattr(item, "__dict__"):
+                groups.append((vars(item),))
+            for slot in getattr(type(item), "__slots__", ()):
+                if hasattr(item, slot):
+                    groups.append((getattr(item, slot),))
+
+        if len(groups) > sample:
+            step = len(groups) / sample
+            groups = [groups[int(i * step)] for i in range(sample)]
+            weight *= step
+        stack.extend((child, weight) for group in groups for child in group)
+    return int(total)
+
+
+def tensor_bytes(model: Any) -> int:
+    """Байты параметров и буферов модели torch (включая упакованные int8 веса).
+
+    Общие (связанные) тензоры считаются один раз.
+    """
+    if model is None:
+        return 0
+    seen = set()
+    total = 0
+
+    def add(value: Any) -> None:
+        nonlocal total
+        if isinstance(value, (tuple, list)):
+            for item in value:
+                add(item)
+            return
+        if not (hasattr(value, "numel") and hasattr(value, "element_size")):
+            return
+        try:
+            key = value.data_ptr()
+        except Exception:
+            key = id(value)
+        if key in seen:
+            return
+        seen.add(key)
+        total += value.numel() * value.element_size()
+
+    for value in model.state_dict().values():
+        add(value)
+    return total
+
+
+def array_bytes(*arrays: Any) -> Dict[str, int]:
+    """Байты numpy массивов: resident — в памяти процесса, mapped — отображенные с диска."""
+    import numpy as np
+
+    result = {"resident": 0, "mapped": 0}
+    for array in arrays:
+        if array is None:
+            continue
+        kind = "mapped" if isinstance(array, np.memmap) or isinstance(array.base, np.memmap) else "resident"
+        result[kind] += int(array.nbytes)
+    return result
+
+
+def usage(kind: str, size: float, entries: Optional[int] = None, mapped: int = 0) -> Dict:
+    """Запись отчета о памяти компонента.
+
+    Args:
+        kind: model, cache, index или sessions
+        size: Оценка байт в памяти процесса
+        entries: Число записей (для кэшей, индексов и сессий)
+        mapped: Байты файлов, отображенных в память (mmap); страницы
+            разделяются воркерами через кэш ОС и в size не входят
+    """
+    return {"kind": kind, "bytes": int(size), "entries": entries, "mapped_bytes": int(mapped)}
+
+
+def process_rss() -> int:
+    """Резидентная память процесса (байты)."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # Нет /proc: пиковое значение, на Linux в КБ, на macOS в байтах
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def start_tracemalloc(frames: Optional[int] = None) -> None:
+    """Включает трассировку выделений памяти (замедляет выделения в несколько раз)."""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames or settings.tracemalloc_frames)
+        logger.warning("tracemalloc включен, выделения памяти замедлены до его выключения")
+
+
+def stop_tracemalloc() -> None:
+    """Выключает трассировку и освобождает собранные следы."""
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+        logger.info("tracemalloc выключен")
+
+
+def tracemalloc_top(limit: int = 20) -> Dict:
+    """Крупнейшие места выделения памяти по строкам кода с момента включения tracemalloc."""
+    if not tracemalloc.is_tracing():
+        return {"tracing": False, "traced_bytes": 0, "peak_bytes": 0, "top": []}
+
+    current, peak = tracemalloc.get_traced_memory()
+    top = []
+    if limit > 0:
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        for stat in snapshot.statistics("lineno")[:limit]:
+            frame = stat.traceback[0]
+            top.append({
+                "location": f"{frame.filename}:{frame.lineno}",
+                "size_bytes": stat.size,
+                "count": stat.count,
+            })
+    return {"tracing": True, "traced_bytes": current, "peak_bytes": peak, "top": top}
+
+
+def build_report(components: Dict[str, Dict], top: int = 0) -> Dict:
+    """Отчет о памяти: RSS процесса, учтенные компоненты и снимок tracemalloc.
+
+    Значения компонентов заодно выставляются в метрику rag_component_memory_bytes.
+    """
+    for name, item in components.items():
+        COMPONENT_MEMORY.labels(component=name).set(item["bytes"])
+    return {
+        "rss_bytes": process_rss(),
+        "accounted_bytes": sum(item["bytes"] for item in components.values()),
+        "components": components,
+        "tracemalloc": tracemalloc_top(top),
+    }
+
+
+def format_bytes(size: float) -> str:
+    """Размер в человекочитаемом виде."""
+    for unit in ("Б", "КБ", "МБ"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "Б" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.2f} ГБ"
+
+
+def summarize(report: Dict, limit: int = 6) -> str:
+    """Строка лога: RSS, учтенная память и крупнейшие компоненты."""
+    components = sorted(report["components"].items(), key=lambda item: item[1]["bytes"], reverse=True)
+    parts = ", ".join(f"{name} {format_bytes(item['bytes'])}" for name, item in components[:limit])
+    return (
+        f"Память: RSS {format_bytes(report['rss_bytes'])}, "
+        f"учтено {format_bytes(report['accounted_bytes'])}: {parts}"
+    )
+
+
+class MemoryLogger:
+    """Периодически пишет в лог сводку памяти по компонентам."""
+
+    def __init__(self, report: Callable[[], Dict], interval: Optional[int] = None):
+        self.report = report
+        self.interval = settings.memory_log_interval if interval is None else interval
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def log_once(self) -> None:
+        try:
+            logger.info(summarize(self.report()))
+        except Exception as e:
+            logger.warning(f"Ошибка учета памяти: {e}")
+
+    def _loop(self) -> None:
+        """Цикл записи сводок."""
+        while not self._stop_event.wait(self.interval):
+            self.log_once()
+
+    def start(self) -> None:
+        """Запускает фоновую запись сводок (при interval > 0)."""
+        if self.interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name="memory-logger", daemon=True)
+        self._thread.start()
+        logger.info(f"Сводка памяти пишется в лог каждые {self.interval} с")
+
+    def stop(self) -> None:
+        """Останавливает фоновую запись сводок."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -0,0 +1,127 @@
+"""Метрики производительности (Prometheus)."""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Бакеты в секундах: от быстрых стадий (перевод по словарю, сборка промпта)
+# до генерации LLM
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0,
+)
+
+STAGE_LATENCY = Histogram(
+    "rag_stage_duration_seconds",
+    "Длительность стадий RAG пайплайна",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+CACHE_HITS = Counter("rag_cache_hits_total", "Попадания в кэш", ["cache"])
+CACHE_MISSES = Counter("rag_cache_misses_total", "Промахи кэша", ["cache"])
+FALLBACKS = Counter("rag_fallbacks_total", "Переходы на fallback", ["component"])
+ERRORS = Counter("rag_errors_total", "Ошибки по стадиям", ["stage"])
+TITLE_MATCHES = Counter(
+    "rag_title_matches_total", "Запросы, совпавшие с заголовком страницы", ["kind", "mode"]
+)
+DEGRADED_ANSWERS = Counter(
+    "rag_degraded_answers_total", "Извлекающие ответы без LLM", ["reason"]
+)
+RETRIEVAL_SKIPS = Counter("rag_retrieval_skips_total", "Запросы без поиска документов", ["reason"])
+CONTEXT_DOCUMENTS = Histogram(
+    "rag_context_documents",
+    "Число чанков в контексте промпта",
+    buckets=(0, 1, 2, 3, 4, 5, 7, 10, 15, 20),
+)
+CANCELLATIONS = Counter(
+    "rag_cancellations_total", "Запросы, прерванные по дедлайну или отключению клиента", ["reason", "stage"]
+)
+CANCELLED_TOKENS = Counter(
+    "rag_cancelled_tokens_total", "Токены, сгенерированные LLM до отмены запроса", ["reason"]
+)
+SAVED_TOKENS = Counter(
+    "rag_cancellation_saved_tokens_total",
+    "Оценка токенов, которые LLM не сгенерировала благодаря отмене",
+    ["reason"],
+)
+LLM_TOKENS = Counter("rag_llm_tokens_total", "Токены LLM по данным Ollama", ["kind"])
+PROMPT_SECTION_TOKENS = Histogram(
+    "rag_prompt_section_tokens",
+    "Токены секций промпта по токенизатору модели",
+    ["section"],
+    buckets=(0, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192),
+)
+MODEL_LOAD_SECONDS = Gauge("rag_model_load_seconds", "Время загрузки модели компонента", ["component"])
+COMPONENT_MEMORY = Gauge(
+    "rag_component_memory_bytes", "Оценка памяти компонента на момент последнего отчета", ["component"]
+)
+
+# Разбивка времени по стадиям для текущего запроса
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "request_timings", default=None
+)
+
+# Токены LLM текущего запроса
+_request_tokens: ContextVar[Optional[Dict[str, int]]] = ContextVar(
+    "request_tokens", default=None
+)
+
+
+def start_request_timings() -> Dict[str, float]:
+    """Начинает сбор разбивки времени для текущего запроса."""
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def get_request_timings() -> Dict[str, float]:
+    """Возвращает разбивку времени текущего запроса (в мс)."""
+    return dict(_request_timings.get() or {})
+
+
+def start_request_tokens() -> Dict[str, int]:
+    """Начинает учет токенов LLM для текущего запроса."""
+    tokens: Dict[str, int] = {}
+    _request_tokens.set(tokens)
+    return tokens
+
+
+def add_request_tokens(**counts: int) -> None:
+    """Добавляет токены к учету текущего запроса (вне запроса ничего не делает)."""
+    tokens = _request_tokens.get()
+    if tokens is not None:
+        for key, value in counts.items():
+            tokens[key] = tokens.get(key, 0) + value
+
+
+def get_request_tokens() -> Dict[str, int]:
+    """Токены LLM текущего запроса: prompt и completion."""
+    return dict(_request_tokens.get() or {})
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """Записывает длительность стадии в гистограмму и в разбивку запроса."""
+    STAGE_LATENCY.labels(stage=stage).observe(seconds)
+
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = round(timings.get(stage, 0.0) + seconds * 1000, 2)
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """Замеряет длительность блока как стадию пайплайна."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Метрики в текстовом формате Prometheus и тип содержимого ответа."""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
@@ -0,0 +1,96 @@
+"""Локальный бандл моделей в models_dir для запуска без сети."""
+import hashlib
+import json
+import logging
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from app.core.config import settings
+from app.core.metrics import MODEL_LOAD_SECONDS
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+
+
+def model_dir_name(model_name: str) -> str:
+    """Папка модели в models_dir: Helsinki-NLP/opus-mt-ru-en -> Helsinki-NLP__opus-mt-ru-en."""
+    return model_name.replace("/", "__")
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_manifest(models_dir: Optional[Path] = None) -> Dict:
+    """Манифест бандла моделей (пустой, если бандла нет)."""
+    path = (models_dir or settings.models_dir) / MANIFEST_FILE
+    if not path.exists():
+        return {"models": {}}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def model_info(model_name: str, models_dir: Optional[Path] = None) -> Optional[Dict]:
+    """Запись модели в манифесте, если ее файлы лежат в models_dir."""
+    models_dir = models_dir or settings.models_dir
+    info = read_manifest(models_dir)["models"].get(model_name)
+    if info is None or not (models_dir / info["path"]).exists():
+        return None
+    return info
+
+
+def resolve_model(model_name: str) -> str:
+    """Путь к локальной копии модели или имя на Hugging Face Hub.
+
+    Raises:
+        FileNotFoundError: offline_models включен, а модели нет в бандле
+    """
+    info = model_info(model_name)
+    if info is not None:
+        return str(settings.models_dir / info["path"])
+    if settings.offline_models:
+        raise FileNotFoundError(
+            f"Модели {model_name} нет в {settings.models_dir}, выполните make fetch-models"
+        )
+    return model_name
+
+
+def is_prequantized(model_name: str) -> bool:
+    """Бандл помечает модель для int8 квантования при загрузке."""
+    info = model_info(model_name)
+    return bool(info and info.get("quantized"))
+
+
+def verify_model(model_name: str, models_dir: Optional[Path] = None) -> Dict[str, str]:
+    """Проверяет контрольные суммы файлов модели.
+
+    Returns:
+        Файлы с ошибками: путь -> "missing" или "checksum"
+    """
+    models_dir = models_dir or settings.models_dir
+    info = read_manifest(models_dir)["models"][model_name]
+    errors = {}
+    for relative, checksum in info["files"].items():
+        path = models_dir / info["path"] / relative
+        if not path.exists():
+            errors[relative] = "missing"
+        elif file_sha256(path) != checksum:
+            errors[relative] = "checksum"
+    return errors
+
+
+@contextmanager
+def model_load_timer(component: str, model_name: str) -> Iterator[None]:
+    """Замеряет и логирует время загрузки модели компонента."""
+    started = time.perf_counter()
+    yield
+    seconds = time.perf_counter() - started
+    MODEL_LOAD_SECONDS.labels(component=component).set(seconds)
+    source = "models_dir" if model_info(model_name) else "hub"
+    logger.info(f"Модель {component} ({model_name}, {source}) загружена за {seconds * 1000:.0f} мс")
@@ -1,40 +1,89 @@
 """Модуль для перевода запросов."""
 import logging
-from typing import Optional
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
 
-try:
-    import torch
-    from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
-except ImportError:
-    torch = None
-    AutoTokenizer = None
-    AutoModelForSeq2SeqLM = None
+from app.core.config import settings
+from app.core.glossary import glossary
+from app.core.inference import configure_torch_threads, inference_context, quantize_linear
+from app.core.memory_usage import deep_sizeof, tensor_bytes, usage
+from app.core.metrics import CACHE_HITS, CACHE_MISSES, FALLBACKS, stage_timer
+from app.core.model_store import is_prequantized, model_load_timer, resolve_model
 
 logger = logging.getLogger(__name__)
 
+# Доля кириллических букв среди всех букв, начиная с которой текст считается русским
+CYRILLIC_SHARE_THRESHOLD = 0.3
+
+
+def detect_language(text: str) -> str:
+    """Определяет язык запроса по письменности букв.
+    
+    Учитываются только буквы: цифры, пунктуация, тире, эмодзи и
+    латинские буквы с диакритикой ("é") не делают текст русским.
+    
+    Returns:
+        "ru", если доля кириллицы достаточна, иначе "en"
+    """
+    cyrillic = 0
+    letters = 0
+    for char in text:
+        if not char.isalpha():
+            continue
+        letters += 1
+        if "\u0400" <= char <= "\u04ff":
+            cyrillic += 1
+    
+    if cyrillic and cyrillic / letters >= CYRILLIC_SHARE_THRESHOLD:
+        return "ru"
+    return "en"
+
 
 class QueryTranslator:
     """Переводчик запросов с использованием предобученной модели."""
     
-    def __init__(self):
+    def __init__(self, optimized: Optional[bool] = None):
         self._model = None
         self._tokenizer = None
         self._is_initialized = False
+        self.optimized = settings.optimized_inference if optimized is None else optimized
+        self._generation_kwargs = {}
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self.cache_size = settings.translation_cache_size
+        self._cache_lock = threading.Lock()
         
     def _initialize_model(self):
         """Инициализирует модель перевода."""
         try:
-            # Проверяем, что transformers доступен
-            if AutoTokenizer is None or AutoModelForSeq2SeqLM is None:
-                raise ImportError("transformers не установлен")
+            # transformers и torch импортируются только при загрузке модели
+            from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
             
             # Используем модель MarianMT для перевода русский -> английский
-            model_name = "Helsinki-NLP/opus-mt-ru-en"
+            model_name = settings.translation_model
             
             logger.info(f"Загружаем модель перевода: {model_name}")
             
-            self._tokenizer = AutoTokenizer.from_pretrained(model_name)
-            self._model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+            configure_torch_threads()
+            with model_load_timer("translator", model_name):
+                model_path = resolve_model(model_name)
+                local_only = settings.offline_models
+                self._tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=local_only)
+                self._model = AutoModelForSeq2SeqLM.from_pretrained(model_path, local_files_only=local_only)
+                self._model.eval()
+            
+            if self.optimized or is_prequantized(model_name):
+                self._model = quantize_linear(self._model)
+                logger.info("Модель перевода квантована в int8")
+            
+            # Служебные токены и параметры генерации считаем один раз
+            self._generation_kwargs = {
+                "pad_token_id": self._tokenizer.pad_token_id,
+                "eos_token_id": self._tokenizer.eos_token_id,
+                "decoder_start_token_id": self._model.config.decoder_start_token_id,
+            }
+            if settings.translation_num_beams:
+                self._generation_kwargs["num_beams"] = settings.translation_num_beams
             
             self._is_initialized = True
             logger.info("Модель перевода загружена успешно")
@@ -61,13 +110,124 @@ class QueryTranslator:
         # Если это не русский текст, возвращаем как есть
         if not self._is_russian_text(text):
             return text
-            
+        
+        cached = self._cache_get(text)
+        if cached is not None:
+            return cached
+        
+        with stage_timer("translation"):
+            translated = self._translate(text)
+        
+        self._cache_put(text, translated)
+        return translated
+    
+    def translate_batch(self, texts: List[str], batch_size: int = 16) -> List[str]:
+        """Переводит список запросов, прогоняя MarianMT батчами.
+        
+        Результаты попадают в кэш, поэтому последующие `translate` для
+        тех же запросов не вызывают модель. Каждый уникальный запрос
+        учитывается в метриках кэша один раз.
+        """
+        translations = {}
+        pending = []
+        for text in dict.fromkeys(texts):
+            if not text or not text.strip() or not self._is_russian_text(text):
+                continue
+            cached = self._cache_get(text)
+            if cached is None:
+                pending.append(text)
+            else:
+                translations[text] = cached
+        
+        annotations = {text: glossary.annotate(text) for text in pending}
+        needs_model = [text for text in pending if not self._glossary_only(text, annotations[text])]
+        
+        model_translations = {}
+        for start in range(0, len(needs_model), batch_size):
+            batch = needs_model[start:start + batch_size]
+            model_translations.update(zip(batch, self._translate_model_batch(batch)))
+        
+        for text in pending:
+            translations[text] = self._translate(text, model_translations.get(text))
+            self._cache_put(text, translations[text])
+        
+        return [translations.get(text, text) for text in texts]
+    
+    def _cache_get(self, text: str) -> Optional[str]:
+        """Перевод из LRU кэша (с учетом в метриках)."""
+        with self._cache_lock:
+            cached = self._cache.get(text)
+            if cached is not None:
+                self._cache.move_to_end(text)
+        if cached is not None:
+            CACHE_HITS.labels(cache="translation").inc()
+        else:
+            CACHE_MISSES.labels(cache="translation").inc()
+        return cached
+    
+    def _cache_put(self, text: str, translated: str) -> None:
+        with self._cache_lock:
+            self._cache[text] = translated
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+    
+    def clear_cache(self) -> None:
+        """Очищает кэш переводов."""
+        with self._cache_lock:
+            self._cache.clear()
+    
+    def memory_usage(self) -> Dict[str, Dict]:
+        """Память модели перевода и кэша переводов."""
+        with self._cache_lock:
+            cache = usage("cache", deep_sizeof(self._cache), entries=len(self._cache))
+        return {
+            "translator.model": usage("model", tensor_bytes(self._model)),
+            "translator.cache": cache,
+        }
+    
+    @staticmethod
+    def _glossary_only(text: str, annotation: Optional[dict]) -> bool:
+        """Короткий запрос целиком из известных терминов не требует нейросети."""
+        return bool(
+            settings.glossary_fast_path
+            and annotation["terms"]
+            and not annotation["uncovered"]
+            and len(text.split()) <= settings.glossary_fast_path_max_words
+        )
+    
+    def _translate(self, text: str, model_translation: Optional[str] = None) -> str:
+        """Переводит русский текст глоссарием, моделью или словарем.
+        
+        Args:
+            text: Русский запрос
+            model_translation: Готовый перевод MarianMT (из батча)
+        """
+        annotation = glossary.annotate(text) if settings.glossary_fast_path or settings.glossary_annotate else None
+        
+        if self._glossary_only(text, annotation):
+            logger.debug(f"Перевод глоссарием: '{text}' -> '{annotation['translation']}'")
+            return annotation["translation"]
+        
+        translated = model_translation if model_translation is not None else self._translate_model(text)
+        
+        # Добавляем канонические термины Moodle, которых нет в переводе модели
+        if settings.glossary_annotate and annotation and translated != annotation["translation"]:
+            lowered = translated.lower()
+            missing = [term for term in annotation["terms"] if term not in lowered]
+            if missing:
+                translated = f"{translated} {' '.join(missing)}"
+        
+        return translated
+    
+    def _translate_model(self, text: str) -> str:
+        """Переводит текст MarianMT, при недоступности модели — глоссарием."""
         # Инициализируем модель при первом использовании
         if not self._is_initialized:
             self._initialize_model()
             
         # Если модель не загрузилась, используем fallback
         if not self._is_initialized:
+            FALLBACKS.labels(component="translator").inc()
             return self._fallback_translate(text)
             
         try:
@@ -75,8 +235,12 @@ class QueryTranslator:
             inputs = self._tokenizer(text, return_tensors="pt", max_length=512, truncation=True)
             
             # Генерируем перевод
-            with torch.no_grad():
-                outputs = self._model.generate(**inputs, max_length=512)
+            with inference_context():
+                outputs = self._model.generate(
+                    **inputs,
+                    max_length=self._max_output_length(inputs["input_ids"].shape[-1]),
+                    **self._generation_kwargs
+                )
             
             # Декодируем результат
             translated = self._tokenizer.decode(outputs[0], skip_special_tokens=True)
@@ -86,58 +250,48 @@ class QueryTranslator:
             
         except Exception as e:
             logger.error(f"Ошибка перевода: {e}")
+            FALLBACKS.labels(component="translator").inc()
             return self._fallback_translate(text)
     
+    def _translate_model_batch(self, texts: List[str]) -> List[str]:
+        """Переводит батч текстов MarianMT одним вызовом generate."""
+        if not self._is_initialized:
+            self._initialize_model()
+        if not self._is_initialized:
+            FALLBACKS.labels(component="translator").inc()
+            return [self._fallback_translate(text) for text in texts]
+        
+        try:
+            inputs = self._tokenizer(texts, return_tensors="pt", max_length=512, truncation=True, padding=True)
+            with inference_context():
+                outputs = self._model.generate(
+                    **inputs,
+                    max_length=self._max_output_length(inputs["input_ids"].shape[-1]),
+                    **self._generation_kwargs
+                )
+            return self._tokenizer.batch_decode(outputs, skip_special_tokens=True)
+        except Exception as e:
+            logger.error(f"Ошибка пакетного перевода: {e}")
+            return [self._translate_model(text) for text in texts]
+    
+    def _max_output_length(self, input_length: int) -> int:
+        """Ограничивает длину перевода длиной входа.
+        
+        Перевод короткого запроса не бывает в разы длиннее оригинала, а
+        фиксированный лимит 512 позволяет модели зацикливаться на повторах.
+        """
+        if not self.optimized:
+            return 512
+        limit = int(input_length * settings.translation_max_length_ratio) + settings.translation_max_length_margin
+        return min(512, limit)
+    
     def _is_russian_text(self, text: str) -> bool:
-        """Проверяет, содержит ли текст русские символы."""
-        return any(ord(char) > 127 for char in text)
+        """Проверяет, написан ли текст на русском."""
+        return detect_language(text) == "ru"
     
     def _fallback_translate(self, query: str) -> str:
-        """Fallback переводчик с использованием словаря."""
-        # Простой словарь переводов для ключевых слов
-        translations = {
-            # Создание курса
-            "создать": "create",
-            "добавить": "add",
-            "новый": "new",
-            "курс": "course",
-            "курсы": "courses",
-            
-            # Настройки
-            "настроить": "configure",
-            "настройка": "configuration",
-            "система": "system",
-            "оценки": "grades",
-            "оценка": "grade",
-            
-            # Пользователи
-            "пользователь": "user",
-            "пользователи": "users",
-            "активность": "activity",
-            "журнал": "log",
-            "журналы": "logs",
-            "просмотреть": "view",
-            
-            # Общие слова
-            "как": "how to",
-            "что": "what",
-            "где": "where",
-            "когда": "when",
-            "почему": "why"
-        }
-        
-        # Простой перевод по словарю
-        translated_query = query.lower()
-        for ru_word, en_word in translations.items():
-            translated_query = translated_query.replace(ru_word, en_word)
-        
-        # Если запрос содержит русские символы, добавляем английские ключевые слова
-        if self._is_russian_text(query):
-            # Добавляем общие английские ключевые слова для Moodle
-            moodle_keywords = ["moodle", "course", "user", "admin", "settings"]
-            for keyword in moodle_keywords:
-                if keyword not in translated_query:
-                    translated_query += f" {keyword}"
+        """Fallback переводчик на глоссарии терминов Moodle."""
+        translated_query = glossary.translate(query) or query
         
         logger.debug(f"Fallback перевод: '{query}' -> '{translated_query}'")
         return translated_query
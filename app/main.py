@@ -1,10 +1,12 @@
 """Основное FastAPI приложение."""
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 
-from app.api.routes import router
+from app.api.routes import get_pipeline, router
 from app.core.config import settings
-from app.core.logger import logger
+from app.core.logger import bind_request_context, logger
+from app.core.metrics import render_metrics
 
 
 def create_app() -> FastAPI:
@@ -28,6 +30,14 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
     
+    @app.middleware("http")
+    async def request_context(request: Request, call_next):
+        """Привязывает request_id к логам запроса."""
+        request_id = bind_request_context(request.headers.get("X-Request-ID"))
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id
+        return response
+    
     # Подключаем роуты
     app.include_router(router, prefix="/api/v1")
     
@@ -37,11 +47,23 @@ def create_app() -> FastAPI:
         logger.info("Moodle RAG Chatbot запускается...")
         logger.info(f"Версия: 0.1.0")
         logger.info(f"Режим отладки: {settings.debug}")
+        # Модели и индекс загружаются здесь, а не при импорте app.main
+        rag_pipeline = await run_in_threadpool(get_pipeline)
+        app.state.rag_pipeline = rag_pipeline
+        rag_pipeline.health_monitor.start()
+        if settings.index_watch_interval > 0:
+            rag_pipeline.index_watcher.start()
+        rag_pipeline.memory_logger.start()
     
     @app.on_event("shutdown")
     async def shutdown_event():
         """Событие остановки приложения."""
         logger.info("Moodle RAG Chatbot останавливается...")
+        rag_pipeline = getattr(app.state, "rag_pipeline", None)
+        if rag_pipeline is not None:
+            rag_pipeline.health_monitor.stop()
+            rag_pipeline.index_watcher.stop()
+            rag_pipeline.memory_logger.stop()
     
     @app.get("/")
     async def root():
@@ -50,9 +72,16 @@ def create_app() -> FastAPI:
             "message": "Moodle RAG Chatbot API",
             "version": "0.1.0",
             "docs": "/docs",
-            "health": "/api/v1/health"
+            "health": "/api/v1/health",
+            "metrics": "/metrics"
         }
     
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics() -> Response:
+        """Метрики Prometheus."""
+        content, media_type = render_metrics()
+        return Response(content=content, media_type=media_type)
+    
     return app
 
 
@@ -0,0 +1,60 @@
+"""Адаптивный отбор контекста: сколько чанков брать и нужен ли поиск вообще."""
+from typing import List
+
+from langchain_core.documents import Document
+
+from app.rag.faq import normalize_question
+
+# Слова благодарностей, приветствий и подтверждений. Сообщение только из
+# них не содержит вопроса по документации, и поиск для него не нужен.
+# Ответов "да"/"нет" и местоимений здесь нет: так отвечают на уточняющий
+# вопрос бота, и такому ответу нужны история и поиск
+SMALLTALK_WORDS = {
+    "спасибо", "спс", "благодарю", "большое", "огромное", "вам", "тебе", "всем",
+    "ок", "окей", "хорошо", "понятно", "ясно", "понял", "поняла", "принято", "отлично",
+    "супер", "круто", "класс", "здорово", "ага", "угу",
+    "привет", "здравствуйте", "добрый", "доброе", "день", "вечер", "утро", "пока", "до", "свидания",
+    "thanks", "thank", "ok", "okay", "great", "cool",
+    "hi", "hello", "bye",
+}
+
+# Устойчивые фразы, слова которых по отдельности не считаются small talk
+SMALLTALK_PHRASES = ("thank you", "got it", "все ясно", "все понятно")
+
+
+def is_smalltalk(message: str, max_words: int = 6) -> bool:
+    """Реплика без вопроса по документации: "спасибо", "ок, понятно", "привет".
+
+    Args:
+        message: Сообщение пользователя
+        max_words: Более длинные сообщения всегда считаются вопросами
+    """
+    normalized = normalize_question(message)
+    words = normalized.split()
+    if not 0 < len(words) <= max_words:
+        return False
+    for phrase in SMALLTALK_PHRASES:
+        normalized = f" {normalized} ".replace(f" {phrase} ", " ")
+    return all(word in SMALLTALK_WORDS for word in normalized.split())
+
+
+def adaptive_cut(documents: List[Document], min_k: int, min_score: float, max_gap: float) -> List[Document]:
+    """Обрезает выдачу по порогу релевантности и разрыву между соседями.
+
+    Первые `min_k` документов остаются всегда. Дальше выдача обрывается на
+    первом документе с relevance ниже `min_score` или отстающем от
+    предыдущего больше чем на `max_gap`: если первый чанк почти точно
+    отвечает на вопрос, а остальные заметно хуже, в промпт идет только он.
+    Документы без оценки (найденные по заголовку) не обрезаются.
+    """
+    kept: List[Document] = []
+    previous = None
+    for doc in documents:
+        score = doc.metadata.get("score")
+        if len(kept) >= min_k and score is not None:
+            if score < min_score or (previous is not None and previous - score > max_gap):
+                break
+        kept.append(doc)
+        if score is not None:
+            previous = score
+    return kept
@@ -0,0 +1,25 @@
+"""Клиент Chroma: локальная папка или общий сервер."""
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+
+if TYPE_CHECKING:
+    import chromadb
+
+
+def create_chroma_client(path: Optional[Path] = None) -> "chromadb.ClientAPI":
+    """Клиент Chroma по settings.vector_store_client.
+
+    persistent — SQLite в data/chroma, только для одного процесса;
+    http — отдельный сервер Chroma (`chroma run --path data/chroma`), который
+    разделяют все воркеры и хосты. HTTP клиент держит пул keep-alive
+    соединений, поэтому на один процесс достаточно одного клиента.
+    """
+    import chromadb
+
+    if settings.vector_store_client == "http":
+        logger.info(f"Подключаемся к серверу Chroma {settings.chroma_host}:{settings.chroma_port}")
+        return chromadb.HttpClient(host=settings.chroma_host, port=settings.chroma_port, ssl=settings.chroma_ssl)
+    return chromadb.PersistentClient(path=str(path or settings.chroma_dir))
@@ -0,0 +1,55 @@
+"""Источники и контекст промпта из найденных документов."""
+from typing import List
+
+from langchain_core.documents import Document
+
+from app.core.metrics import stage_timer
+from app.schemas import Source
+
+
+def to_sources(documents: List[Document]) -> List[Source]:
+    """Преобразует найденные документы в Source объекты."""
+    sources = []
+    for i, doc in enumerate(documents):
+        # Извлекаем метаданные
+        metadata = doc.metadata
+        title = metadata.get("title", f"Document {i+1}")
+        chunk_id = metadata.get("chunk_id", f"chunk_{i}")
+
+        # Используем URL из метаданных
+        url = metadata.get("url", "")
+
+        # Релевантность из векторного поиска; для чанков, найденных по
+        # заголовку, — по позиции
+        score = min(max(metadata.get("score", 1.0 - i * 0.1), 0.0), 1.0)
+
+        source = Source(
+            title=title,
+            url=url,
+            chunk_id=chunk_id,
+            score=score
+        )
+        sources.append(source)
+
+    return sources
+
+
+def build_context(documents: List[Document]) -> str:
+    """Собирает контекст для промпта из найденных документов."""
+    if not documents:
+        return ""
+
+    with stage_timer("context_build"):
+        context_parts = []
+        for i, doc in enumerate(documents, 1):
+            metadata = doc.metadata
+            title = metadata.get("title", f"Document {i}")
+            content = doc.page_content
+
+            # Ограничиваем длину контента для лучшего качества
+            if len(content) > 1000:
+                content = content[:1000] + "..."
+
+            context_parts.append(f"=== ДОКУМЕНТ {i}: {title} ===\n{content}\n")
+
+        return "\n".join(context_parts)
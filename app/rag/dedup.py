@@ -0,0 +1,151 @@
+"""Поиск почти одинаковых чанков: MinHash по шинглам слов и LSH."""
+import hashlib
+import re
+import zlib
+from collections import Counter, defaultdict
+from typing import Dict, List, Sequence, Set
+
+import numpy as np
+
+# Простое число Мерсенна 2^31 - 1: a * h + b помещается в uint64
+_PRIME = (1 << 31) - 1
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def text_hash(text: str) -> str:
+    """Хэш текста чанка: одинаковые чанки разных версий получают один эмбеддинг."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def version_overlap(hashes: Dict[str, Sequence[str]], bytes_per_vector: int) -> Dict:
+    """Сколько векторов хранят коллекции версий и сколько из них уникальны по тексту.
+
+    В Chroma каждая коллекция хранит свою копию векторов и графа HNSW,
+    поэтому память растет с суммой чанков; общая матрица квантованного
+    хранилища — с числом уникальных текстов.
+
+    Args:
+        hashes: Коллекция -> text_hash ее чанков
+        bytes_per_vector: Оценка памяти индекса на один вектор
+    """
+    counts = {name: Counter(values) for name, values in hashes.items()}
+    total = sum(len(values) for values in hashes.values())
+    unique = set().union(*counts.values()) if counts else set()
+    collections = {}
+    for name, values in counts.items():
+        others = set().union(*(other for key, other in counts.items() if key != name))
+        collections[name] = {
+            "chunks": sum(values.values()),
+            "shared_with_other_versions": sum(n for h, n in values.items() if h in others),
+        }
+    return {
+        "collections": collections,
+        "stored_vectors": total,
+        "unique_texts": len(unique),
+        "stored_bytes": total * bytes_per_vector,
+        "shared_bytes": len(unique) * bytes_per_vector,
+    }
+
+
+def shingles(text: str, size: int = 5) -> Set[int]:
+    """Хэши шинглов — последовательностей из `size` слов текста."""
+    words = _WORD_PATTERN.findall(text.lower())
+    if not words:
+        return set()
+    if len(words) <= size:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))}
+    return {
+        zlib.crc32(" ".join(words[i:i + size]).encode("utf-8"))
+        for i in range(len(words) - size + 1)
+    }
+
+
+def jaccard(first: Set[int], second: Set[int]) -> float:
+    """Коэффициент Жаккара двух множеств шинглов."""
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def lsh_bands(num_perm: int, threshold: float, recall: float = 0.95) -> int:
+    """Наименьшее число полос LSH, при котором пара со сходством threshold
+    становится кандидатом с вероятностью не ниже recall: 1 - (1 - t^r)^b.
+
+    Меньше полос — меньше лишних кандидатов на точную проверку.
+    """
+    for bands in range(1, num_perm + 1):
+        if num_perm % bands:
+            continue
+        rows = num_perm // bands
+        if 1 - (1 - threshold ** rows) ** bands >= recall:
+            return bands
+    return num_perm
+
+
+class MinHasher:
+    """MinHash сигнатуры множеств шинглов (num_perm хэш-функций a * h + b mod p)."""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = rng.randint(1, _PRIME, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, _PRIME, size=num_perm).astype(np.uint64)
+
+    def signature(self, shingle_set: Set[int]) -> np.ndarray:
+        if not shingle_set:
+            return np.full(self.num_perm, _PRIME, dtype=np.uint64)
+        values = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set)) % _PRIME
+        hashes = (np.outer(self.a, values) + self.b[:, None]) % _PRIME
+        return hashes.min(axis=1)
+
+
+def find_near_duplicates(texts: Sequence[str], threshold: float = 0.85, shingle_size: int = 5,
+                         num_perm: int = 64, seed: int = 1) -> Dict[int, int]:
+    """Находит тексты, почти совпадающие с одним из предыдущих.
+
+    Кандидаты отбираются по совпадению полосы MinHash сигнатуры (LSH) и
+    подтверждаются точным коэффициентом Жаккара шинглов, поэтому ложных
+    срабатываний нет, а пропуски возможны только около порога.
+
+    Returns:
+        Индекс дубликата -> индекс оставленного текста (первого в порядке texts)
+    """
+    hasher = MinHasher(num_perm, seed)
+    bands = lsh_bands(num_perm, threshold)
+    rows = num_perm // bands
+    buckets: List[Dict[bytes, List[int]]] = [defaultdict(list) for _ in range(bands)]
+    shingle_sets: List[Set[int]] = []
+    duplicates: Dict[int, int] = {}
+
+    for index, text in enumerate(texts):
+        shingle_set = shingles(text, shingle_size)
+        shingle_sets.append(shingle_set)
+        if not shingle_set:
+            continue
+
+        signature = hasher.signature(shingle_set)
+        keys = [signature[band * rows:(band + 1) * rows].tobytes() for band in range(bands)]
+
+        original = None
+        checked: Set[int] = set()
+        for band, key in enumerate(keys):
+            for candidate in buckets[band].get(key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if jaccard(shingle_set, shingle_sets[candidate]) >= threshold:
+                    original = candidate
+                    break
+            if original is not None:
+                break
+
+        if original is not None:
+            duplicates[index] = original
+            # Шинглы дубликата больше не понадобятся
+            shingle_sets[index] = set()
+            continue
+        for band, key in enumerate(keys):
+            buckets[band][key].append(index)
+
+    return duplicates
@@ -0,0 +1,85 @@
+"""Извлекающий ответ из найденных документов, когда LLM недоступна."""
+import re
+from typing import List, Set, Tuple
+
+from langchain_core.documents import Document
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD = re.compile(r"\w+")
+
+# Частые слова вопросов, которые не помогают выбрать предложение
+STOP_WORDS = {
+    "the", "and", "for", "how", "what", "where", "can", "does", "you", "are", "with", "moodle",
+    "как", "что", "где", "это", "для", "или", "мне", "можно", "нужно",
+}
+
+EXTRACTIVE_HEADER = (
+    "Сервис генерации ответов сейчас перегружен, поэтому ниже приведены наиболее "
+    "подходящие фрагменты документации Moodle по вашему вопросу:"
+)
+
+# Длиннее обрезаем: в ответе нужна выдержка, а не абзац
+MAX_SENTENCE_LENGTH = 300
+
+
+def _terms(text: str) -> Set[str]:
+    return {word for word in _WORD.findall(text.lower()) if len(word) > 2 and word not in STOP_WORDS}
+
+
+def split_sentences(text: str, min_length: int = 20) -> List[str]:
+    """Предложения чанка без заголовков вики-разметки и обрывков."""
+    sentences = []
+    for sentence in _SENTENCE_SPLIT.split(text):
+        sentence = sentence.strip(" \t*#:-")
+        if len(sentence) >= min_length and not sentence.startswith("="):
+            sentences.append(sentence)
+    return sentences
+
+
+def select_sentences(query: str, documents: List[Document], max_sentences: int) -> List[Tuple[int, int, str]]:
+    """Лучшие предложения документов для запроса.
+
+    Оценка предложения — доля слов запроса, которые в нем встречаются,
+    плюс половина релевантности его чанка, чтобы при равном совпадении
+    выигрывали предложения из лучших документов.
+
+    Returns:
+        Тройки (номер документа, номер предложения, предложение) в порядке документов
+    """
+    terms = _terms(query)
+    candidates = []
+    seen = set()
+    for rank, doc in enumerate(documents):
+        relevance = doc.metadata.get("score", 1.0 - rank * 0.1)
+        for position, sentence in enumerate(split_sentences(doc.page_content)):
+            if sentence in seen:
+                continue
+            seen.add(sentence)
+            overlap = len(terms & _terms(sentence)) / len(terms) if terms else 0.0
+            candidates.append((overlap + 0.5 * relevance, rank, position, sentence))
+
+    best = sorted(candidates, key=lambda item: (-item[0], item[1], item[2]))[:max_sentences]
+    return sorted((rank, position, sentence) for _, rank, position, sentence in best)
+
+
+def extractive_answer(query: str, documents: List[Document], max_sentences: int = 4) -> str:
+    """Ответ из выдержек документации с названиями и ссылками страниц.
+
+    Args:
+        query: Поисковый запрос (на языке документации)
+        documents: Найденные документы в порядке релевантности
+        max_sentences: Сколько предложений включить
+    """
+    parts = [EXTRACTIVE_HEADER]
+    current_rank = None
+    for rank, _, sentence in select_sentences(query, documents, max_sentences):
+        if rank != current_rank:
+            current_rank = rank
+            metadata = documents[rank].metadata
+            title = metadata.get("title", f"Документ {rank + 1}")
+            url = metadata.get("url", "")
+            parts.append(f"\n{title}" + (f" ({url})" if url else ""))
+        if len(sentence) > MAX_SENTENCE_LENGTH:
+            sentence = sentence[:MAX_SENTENCE_LENGTH].rsplit(" ", 1)[0] + "..."
+        parts.append(f"- {sentence}")
+    return "\n".join(parts)
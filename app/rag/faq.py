@@ -0,0 +1,87 @@
+"""Хранилище заранее сгенерированных ответов на частые вопросы."""
+import json
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.core.logger import logger
+from app.core.memory_usage import deep_sizeof, usage
+from app.rag.title_index import trigrams
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+
+
+def normalize_question(text: str) -> str:
+    """Нормализует вопрос: нижний регистр, ё -> е, без пунктуации и лишних пробелов."""
+    text = _PUNCTUATION.sub(" ", text.lower().replace("ё", "е"))
+    return " ".join(text.split())
+
+
+class FAQStore:
+    """Ответы из вывода scripts/batch_answer.py, доступные только на чтение.
+
+    Вопрос ищется сначала по точному совпадению нормализованного текста,
+    затем по коэффициенту Дайса триграмм (опечатки, порядок слов в
+    пределах порога). Ответы хранятся отдельно для каждой версии Moodle.
+    """
+
+    def __init__(self, entries: List[Dict], default_version: str, match_threshold: float = 0.92):
+        self.default_version = default_version
+        self.match_threshold = match_threshold
+        self._exact: Dict[Tuple[str, str], Dict] = {}
+        self._trigrams: Dict[str, List[Tuple[Set[str], Dict]]] = {}
+
+        for entry in entries:
+            if not entry.get("answer") or entry.get("error") or entry.get("degraded"):
+                continue
+            version = str(entry.get("version") or default_version)
+            key = normalize_question(entry["question"])
+            if not key or (version, key) in self._exact:
+                continue
+            self._exact[(version, key)] = entry
+            self._trigrams.setdefault(version, []).append((trigrams(key), entry))
+
+    @classmethod
+    def load(cls, path: Path, default_version: str, match_threshold: float = 0.92) -> "FAQStore":
+        """Загружает ответы из JSONL файла."""
+        entries = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entries.append(json.loads(line))
+        store = cls(entries, default_version, match_threshold)
+        logger.info(f"Загружено {len(store)} ответов FAQ из {path}")
+        return store
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    def memory_usage(self) -> Dict[str, Dict]:
+        """Память ответов и триграмм вопросов."""
+        return {"faq": usage("cache", deep_sizeof((self._exact, self._trigrams)), entries=len(self))}
+
+    def lookup(self, question: str, version: Optional[str] = None) -> Optional[Dict]:
+        """Готовый ответ на вопрос или None.
+
+        Returns:
+            Запись FAQ с полем match ("exact" или "fuzzy") и score
+        """
+        version = version or self.default_version
+        key = normalize_question(question)
+        if not key:
+            return None
+
+        entry = self._exact.get((version, key))
+        if entry is not None:
+            return {**entry, "match": "exact", "score": 1.0}
+
+        query_trigrams = trigrams(key)
+        best_score, best_entry = 0.0, None
+        for entry_trigrams, entry in self._trigrams.get(version, []):
+            score = 2 * len(query_trigrams & entry_trigrams) / (len(query_trigrams) + len(entry_trigrams))
+            if score > best_score:
+                best_score, best_entry = score, entry
+
+        if best_entry is None or best_score < self.match_threshold:
+            return None
+        return {**best_entry, "match": "fuzzy", "score": round(best_score, 3)}
@@ -0,0 +1,93 @@
+"""Фоновый мониторинг здоровья компонентов."""
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+
+
+class HealthMonitor:
+    """Периодически опрашивает легкие пробы компонентов и кэширует результат.
+
+    Эндпоинты здоровья читают только кэш, поэтому не нагружают LLM и
+    векторное хранилище на каждый запрос Docker healthcheck.
+    """
+
+    def __init__(self, probes: Dict[str, Callable[[], Dict]], interval: Optional[int] = None):
+        self.probes = probes
+        self.interval = interval or settings.health_check_interval
+        self._status: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_probes(self) -> Dict[str, Dict]:
+        """Выполняет все пробы один раз и обновляет кэш."""
+        for name, probe in self.probes.items():
+            started = time.perf_counter()
+            try:
+                result = probe()
+            except Exception as e:
+                result = {"healthy": False, "message": f"Ошибка пробы: {e}"}
+
+            status = {
+                "name": name,
+                "healthy": bool(result.get("healthy")),
+                "message": result.get("message", ""),
+                "checked_at": datetime.now().isoformat(),
+                "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+            }
+
+            with self._lock:
+                previous = self._status.get(name)
+                self._status[name] = status
+
+            if previous is None or previous["healthy"] != status["healthy"]:
+                level = logger.info if status["healthy"] else logger.warning
+                level(f"Компонент {name}: {'healthy' if status['healthy'] else 'unhealthy'} ({status['message']})")
+
+        return self.get_status()
+
+    def get_status(self) -> Dict[str, Dict]:
+        """Возвращает кэшированный статус компонентов с пометкой об устаревании."""
+        now = datetime.now()
+        with self._lock:
+            snapshot = {name: dict(status) for name, status in self._status.items()}
+
+        for status in snapshot.values():
+            age = (now - datetime.fromisoformat(status["checked_at"])).total_seconds()
+            status["stale"] = age > settings.health_stale_after
+
+        return snapshot
+
+    def is_healthy(self) -> bool:
+        """Все компоненты здоровы и результаты не устарели."""
+        status = self.get_status()
+        if not status:
+            return False
+        return all(item["healthy"] and not item["stale"] for item in status.values())
+
+    def _loop(self) -> None:
+        """Цикл фоновых проверок."""
+        while not self._stop_event.is_set():
+            self.run_probes()
+            self._stop_event.wait(self.interval)
+
+    def start(self) -> None:
+        """Запускает фоновые проверки."""
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name="health-monitor", daemon=True)
+        self._thread.start()
+        logger.info(f"Фоновые проверки здоровья запущены (интервал {self.interval} с)")
+
+    def stop(self) -> None:
+        """Останавливает фоновые проверки."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=settings.health_probe_timeout + 1)
+            self._thread = None
@@ -0,0 +1,251 @@
+"""Неизменяемый версионированный бандл индекса с отображением в память."""
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.core.logger import logger
+from app.core.memory_usage import array_bytes, deep_sizeof, usage
+from app.rag.quantized_store import similarity_scores
+
+# Файл в папке коллекции с id актуального бандла
+CURRENT_FILE = "CURRENT"
+
+_CHUNK_DTYPE = np.dtype([
+    ("page", np.int32),
+    ("chunk_index", np.int32),
+    ("total_chunks", np.int32),
+    ("text_offset", np.int64),
+    ("text_length", np.int32),
+])
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_bundle(root: Path, ids: Sequence[str], documents: Sequence[str], metadatas: Sequence[Dict],
+                 embeddings: np.ndarray, manifest: Optional[Dict] = None, activate: bool = True) -> Path:
+    """Записывает новый бандл и (по умолчанию) делает его актуальным.
+
+    Бандл пишется во временную папку и переименовывается целиком, а
+    указатель CURRENT заменяется атомарно, поэтому читатели никогда не
+    видят частично записанный индекс.
+
+    Returns:
+        Путь к папке бандла
+    """
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    bundle_id = datetime.now().strftime("%Y%m%d-%H%M%S-") + hashlib.sha1(embeddings.tobytes()).hexdigest()[:8]
+    staging = root / f".{bundle_id}.tmp"
+    staging.mkdir()
+
+    # Страницы: одна запись на страницу, чанки ссылаются на нее индексом
+    pages: List[Dict] = []
+    page_index: Dict[str, int] = {}
+    chunks = np.zeros(len(ids), dtype=_CHUNK_DTYPE)
+    offset = 0
+    with open(staging / "texts.bin", "wb") as texts:
+        for row, (text, metadata) in enumerate(zip(documents, metadatas)):
+            page_id = str(metadata["page_id"])
+            if page_id not in page_index:
+                page_index[page_id] = len(pages)
+                pages.append({
+                    key: metadata.get(key, "")
+                    for key in ("page_id", "title", "url", "version", "lang", "aliases")
+                })
+                pages[-1]["page_id"] = page_id
+            data = text.encode("utf-8")
+            texts.write(data)
+            chunks[row] = (page_index[page_id], metadata.get("chunk_index", 0),
+                           metadata.get("total_chunks", 0), offset, len(data))
+            offset += len(data)
+
+    np.save(staging / "embeddings.npy", embeddings)
+    np.save(staging / "chunks.npy", chunks)
+    (staging / "ids.json").write_text(json.dumps(list(ids)), encoding="utf-8")
+    (staging / "pages.json").write_text(json.dumps(pages, ensure_ascii=False), encoding="utf-8")
+
+    manifest = {
+        "bundle_id": bundle_id,
+        "created_at": datetime.now().isoformat(),
+        "count": len(ids),
+        "pages": len(pages),
+        "dim": int(embeddings.shape[1]) if len(embeddings) else 0,
+        **(manifest or {}),
+        "files": {
+            path.name: _sha256(path) for path in sorted(staging.iterdir())
+        },
+    }
+    (staging / "manifest.json").write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    bundle_path = root / bundle_id
+    staging.rename(bundle_path)
+    if activate:
+        set_current(root, bundle_id)
+    logger.info(f"Бандл индекса {bundle_id}: {len(ids)} чанков, {len(pages)} страниц")
+    return bundle_path
+
+
+def set_current(root: Path, bundle_id: str) -> None:
+    """Атомарно переключает указатель CURRENT на бандл."""
+    pointer = Path(root) / f".{CURRENT_FILE}.tmp"
+    pointer.write_text(bundle_id, encoding="utf-8")
+    os.replace(pointer, Path(root) / CURRENT_FILE)
+
+
+def current_bundle(root: Path) -> Optional[Path]:
+    """Папка актуального бандла или None."""
+    pointer = Path(root) / CURRENT_FILE
+    if not pointer.exists():
+        return None
+    return Path(root) / pointer.read_text(encoding="utf-8").strip()
+
+
+def current_changed_at(root: Path) -> float:
+    """Время последнего переключения указателя CURRENT (0, если его нет)."""
+    pointer = Path(root) / CURRENT_FILE
+    return pointer.stat().st_mtime if pointer.exists() else 0.0
+
+
+def list_bundles(root: Path) -> List[str]:
+    """Id всех бандлов коллекции от старых к новым."""
+    root = Path(root)
+    if not root.exists():
+        return []
+    return sorted(path.name for path in root.iterdir() if path.is_dir() and not path.name.startswith("."))
+
+
+def remove_bundle(root: Path, bundle_id: str) -> None:
+    """Удаляет бандл с диска."""
+    shutil.rmtree(Path(root) / bundle_id, ignore_errors=True)
+
+
+class IndexBundle:
+    """Векторное хранилище поверх бандла индекса.
+
+    Матрица эмбеддингов, таблица чанков и тексты отображаются в память
+    без копирования: загрузка занимает миллисекунды, а страницы файлов
+    разделяются всеми воркерами через кэш ОС. Интерфейс повторяет
+    используемую retriever'ом часть LangChain Chroma.
+    """
+
+    def __init__(self, path: Path, space: str = "cosine"):
+        started = time.perf_counter()
+        self.path = Path(path)
+        self.space = space
+
+        self.manifest = json.loads((self.path / "manifest.json").read_text(encoding="utf-8"))
+        self.bundle_id = self.manifest["bundle_id"]
+        self.ids: List[str] = json.loads((self.path / "ids.json").read_text(encoding="utf-8"))
+        self.pages: List[Dict] = json.loads((self.path / "pages.json").read_text(encoding="utf-8"))
+        self.embeddings = np.load(self.path / "embeddings.npy", mmap_mode="r")
+        self.chunks = np.load(self.path / "chunks.npy", mmap_mode="r")
+
+        self._texts_file = open(self.path / "texts.bin", "rb")
+        size = os.fstat(self._texts_file.fileno()).st_size
+        self._texts = mmap.mmap(self._texts_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        self._page_rows = {page["page_id"]: i for i, page in enumerate(self.pages)}
+
+        self.load_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"Загружен бандл индекса {self.bundle_id} за {self.load_ms:.1f} мс")
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def memory_usage(self) -> Dict:
+        """id, страницы и словари строк в памяти; матрицы и тексты отображены с диска."""
+        arrays = array_bytes(self.embeddings, self.chunks)
+        size = arrays["resident"] + deep_sizeof((self.ids, self.pages, self._rows, self._page_rows))
+        return usage("index", size, entries=len(self.ids), mapped=arrays["mapped"] + len(self._texts))
+
+    def close(self) -> None:
+        """Освобождает отображения файлов; после этого бандлом пользоваться нельзя."""
+        if isinstance(self._texts, mmap.mmap):
+            self._texts.close()
+        self._texts = b""
+        self._texts_file.close()
+        # Последние ссылки на np.memmap: отображения матриц закрываются сразу, а не сборщиком мусора
+        self.embeddings = None
+        self.chunks = None
+
+    def _text(self, row: int) -> str:
+        chunk = self.chunks[row]
+        start = int(chunk["text_offset"])
+        return self._texts[start:start + int(chunk["text_length"])].decode("utf-8")
+
+    def _metadata(self, row: int) -> Dict:
+        chunk = self.chunks[row]
+        page = self.pages[int(chunk["page"])]
+        return {
+            **{key: value for key, value in page.items() if value != ""},
+            "chunk_index": int(chunk["chunk_index"]),
+            "total_chunks": int(chunk["total_chunks"]),
+            "chunk_id": self.ids[row],
+        }
+
+    def _document(self, row: int) -> Document:
+        return Document(page_content=self._text(row), metadata=self._metadata(row))
+
+    def _page_mask(self, page_ids: List[str]) -> np.ndarray:
+        pages = [self._page_rows[str(page_id)] for page_id in page_ids if str(page_id) in self._page_rows]
+        return np.isin(self.chunks["page"], pages)
+
+    def similarity_search_by_vector(self, embedding: Sequence[float], k: int = 4,
+                                     filter: Optional[Dict] = None) -> List[Document]:
+        """Точный поиск по матрице эмбеддингов."""
+        return [doc for doc, _ in self.similarity_search_by_vector_with_relevance_scores(embedding, k, filter)]
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self, embedding: Sequence[float], k: int = 4, filter: Optional[Dict] = None
+    ) -> List[Tuple[Document, float]]:
+        """Точный поиск с расстояниями в шкале Chroma (меньше — ближе)."""
+        if not self.ids:
+            return []
+
+        query = np.asarray(embedding, dtype=np.float32)
+        scores = similarity_scores(self.embeddings, query, self.space).astype(np.float32)
+        if filter and "page_id" in filter:
+            scores[~self._page_mask(filter["page_id"]["$in"])] = -np.inf
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (self._document(int(row)), float(-scores[row] if self.space == "l2" else 1.0 - scores[row]))
+            for row in top if np.isfinite(scores[row])
+        ]
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None,
+            include: Optional[List[str]] = None) -> Dict:
+        """Чанки по id или по page_id в формате ответа Chroma."""
+        if ids is not None:
+            rows = [self._rows[chunk_id] for chunk_id in ids if chunk_id in self._rows]
+        elif where and "page_id" in where:
+            rows = np.flatnonzero(self._page_mask(where["page_id"]["$in"])).tolist()
+        else:
+            rows = range(len(self.ids))
+
+        include = include or ["documents", "metadatas"]
+        return {
+            "ids": [self.ids[row] for row in rows],
+            "documents": [self._text(row) for row in rows] if "documents" in include else None,
+            "metadatas": [self._metadata(row) for row in rows] if "metadatas" in include else None,
+        }
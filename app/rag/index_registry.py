@@ -0,0 +1,189 @@
+"""Реестр версий индекса для blue/green переключения без простоя."""
+import json
+import os
+import shutil
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+
+# Разделитель логического имени коллекции и id сборки: moodle_docs__20240101120000
+BUILD_SEPARATOR = "__"
+
+
+def new_build_name(name: str) -> str:
+    """Имя физической коллекции для новой сборки индекса."""
+    return f"{name}{BUILD_SEPARATOR}{datetime.now().strftime('%Y%m%d%H%M%S')}"
+
+
+def logical_name(collection: str) -> str:
+    """Логическое имя коллекции по имени физической сборки."""
+    return collection.split(BUILD_SEPARATOR, 1)[0]
+
+
+class IndexRegistry:
+    """JSON-реестр сборок: какая физическая коллекция сейчас активна.
+
+    Загрузка пишет новую сборку рядом с живой и публикует ее в реестре;
+    API переключается на нее только после проверки. Файл реестра
+    заменяется атомарно, поэтому его можно читать из другого процесса.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path or settings.chroma_dir / "registry.json"
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, Dict]:
+        if not self.path.exists():
+            return {}
+        return json.loads(self.path.read_text(encoding="utf-8"))
+
+    def _write(self, data: Dict[str, Dict]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        staging = self.path.with_suffix(".tmp")
+        staging.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(staging, self.path)
+
+    def mtime(self) -> float:
+        """Время изменения реестра (0, если его нет)."""
+        return self.path.stat().st_mtime if self.path.exists() else 0.0
+
+    def entry(self, name: str) -> Dict:
+        """Запись логической коллекции: active, builds, history."""
+        return self._read().get(name, {"active": None, "builds": [], "history": []})
+
+    def resolve(self, name: str) -> str:
+        """Активная физическая коллекция (или само имя для индексов без сборок)."""
+        return self.entry(name).get("active") or name
+
+    def publish(self, name: str, collection: str, info: Optional[Dict] = None, activate: bool = True) -> None:
+        """Регистрирует проверенную сборку и при необходимости делает ее активной."""
+        with self._lock:
+            data = self._read()
+            entry = data.setdefault(name, {"active": None, "builds": [], "history": []})
+            entry["builds"].append({
+                "collection": collection,
+                "built_at": datetime.now().isoformat(),
+                **(info or {}),
+            })
+            if activate:
+                self._activate(entry, collection)
+            self._write(data)
+
+    def has_build(self, name: str, collection: str) -> bool:
+        """Сборка зарегистрирована для логической коллекции (или это сама коллекция без сборок)."""
+        return collection == name or any(build["collection"] == collection for build in self.entry(name)["builds"])
+
+    def activate(self, name: str, collection: str) -> Optional[str]:
+        """Делает сборку активной.
+
+        Returns:
+            Предыдущая активная сборка
+        """
+        with self._lock:
+            data = self._read()
+            entry = data.setdefault(name, {"active": None, "builds": [], "history": []})
+            if collection not in {build["collection"] for build in entry["builds"]} and collection != name:
+                raise ValueError(f"Сборка {collection} не зарегистрирована для {name}")
+            previous = entry.get("active")
+            self._activate(entry, collection)
+            self._write(data)
+            return previous
+
+    @staticmethod
+    def _activate(entry: Dict, collection: str) -> None:
+        # Время отключения прежней сборки: ее могут еще читать другие воркеры и начатые запросы
+        for build in entry["builds"]:
+            if build["collection"] == entry.get("active") and build["collection"] != collection:
+                build["deactivated_at"] = datetime.now().isoformat()
+            elif build["collection"] == collection:
+                build.pop("deactivated_at", None)
+        entry["active"] = collection
+        entry["history"] = [item for item in entry["history"] if item != collection] + [collection]
+
+    def obsolete(self, name: str, keep: int, grace: float = 0.0) -> List[str]:
+        """Сборки, которые можно удалить: кроме активной и `keep` предыдущих.
+
+        Неактивированные сборки старше активной тоже считаются устаревшими.
+        Сборки, отключенные меньше `grace` секунд назад, не удаляются.
+        """
+        entry = self.entry(name)
+        retained = set(entry["history"][-(keep + 1):])
+        active_built_at = next(
+            (build["built_at"] for build in entry["builds"] if build["collection"] == entry.get("active")), ""
+        )
+        recent = (datetime.now() - timedelta(seconds=grace)).isoformat()
+        return [
+            build["collection"] for build in entry["builds"]
+            if build["collection"] not in retained and build["built_at"] <= active_built_at
+            and build.get("deactivated_at", "") <= recent
+        ]
+
+    def forget(self, name: str, collections: List[str]) -> None:
+        """Убирает удаленные сборки из реестра."""
+        with self._lock:
+            data = self._read()
+            entry = data.get(name)
+            if not entry:
+                return
+            entry["builds"] = [build for build in entry["builds"] if build["collection"] not in collections]
+            entry["history"] = [item for item in entry["history"] if item not in collections]
+            self._write(data)
+
+
+def delete_build(client, collection: str) -> None:
+    """Удаляет физическую сборку: чанки, векторы страниц и квантованные коды."""
+    for name in (collection, f"{collection}{settings.pages_collection_suffix}"):
+        try:
+            client.delete_collection(name)
+        except Exception:
+            pass
+    shutil.rmtree(settings.quantized_dir / collection, ignore_errors=True)
+    logger.info(f"Удалена устаревшая сборка индекса {collection}")
+
+
+class IndexWatcher:
+    """Следит за файлом реестра и вызывает перезагрузку при его изменении."""
+
+    def __init__(self, registry: IndexRegistry, on_change: Callable[[], None], interval: int):
+        self.registry = registry
+        self.on_change = on_change
+        self.interval = interval
+        self._mtime = registry.mtime()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _loop(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            mtime = self.registry.mtime()
+            if mtime == self._mtime:
+                continue
+            self._mtime = mtime
+            try:
+                self.on_change()
+            except Exception as e:
+                logger.error(f"Ошибка перезагрузки индекса: {e}")
+
+    def start(self) -> None:
+        """Запускает наблюдение."""
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name="index-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Наблюдение за реестром индекса запущено (интервал {self.interval} с)")
+
+    def stop(self) -> None:
+        """Останавливает наблюдение."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+
+# Глобальный реестр
+index_registry = IndexRegistry()
@@ -1,29 +1,68 @@
 """Интерфейс для LLM через LangChain."""
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
+import asyncio
 import logging
+import threading
+import time
 
-from langchain_core.language_models import BaseLLM
-from langchain_core.callbacks import CallbackManagerForLLMRun
-from langchain_core.outputs import LLMResult
-from langchain_ollama import ChatOllama
+import httpx
 
 from app.core.config import settings
+from app.core.deadline import Deadline, current_deadline
 from app.core.logger import logger
+from app.core.metrics import CANCELLED_TOKENS, ERRORS, FALLBACKS, SAVED_TOKENS, observe_stage
+from app.rag.prompts import LLM_PROMPT_TEMPLATE
+from app.rag.tokens import ollama_usage, record_ollama_usage
+
+
+DEFAULT_OLLAMA_URL = "http://localhost:11434"
+
+# Как часто запрос в очереди к LLM проверяет, не отменен ли он (секунды)
+_SLOT_POLL_INTERVAL = 0.25
+
+# Как часто генерация без новых токенов (обработка промпта, зависание) проверяет отмену (секунды)
+_STREAM_POLL_INTERVAL = 0.1
+
+# Вес последней генерации в скользящем среднем длины ответа
+_TOKENS_EMA_ALPHA = 0.1
+
+
+class LLMUnavailable(Exception):
+    """LLM не может ответить на запрос.
+    
+    Attributes:
+        reason: not_loaded, queue_timeout или error
+    """
+    
+    def __init__(self, reason: str, message: str = ""):
+        super().__init__(message or reason)
+        self.reason = reason
 
 
 class LangChainLLM:
     """Интерфейс для LLM через LangChain."""
     
     def __init__(self):
+        self.base_url = (settings.llm_base_url or DEFAULT_OLLAMA_URL).rstrip("/")
         self.llm = None
         self.is_loaded = False
+        # Ограничиваем число одновременных генераций, остальные запросы ждут
+        self._slots = threading.BoundedSemaphore(settings.llm_max_concurrency)
+        # Скользящее среднее числа токенов в ответе для оценки экономии от отмены
+        self.mean_tokens: Optional[float] = None
+        # Потоковые запросы к Ollama идут в отдельном цикле asyncio, чтобы их можно было прервать
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
         self._load_model()
     
     def _load_model(self) -> None:
         """Загружает LLM модель через LangChain."""
         try:
+            from langchain_ollama import ChatOllama
+
             self.llm = ChatOllama(
                 model=settings.llm_model_name,
+                base_url=self.base_url,
                 temperature=settings.llm_temperature,
                 top_p=settings.llm_top_p,
                 num_predict=settings.llm_max_tokens,
@@ -39,53 +78,176 @@ class LangChainLLM:
             self.is_loaded = False
     
     def generate(self, prompt: str, max_tokens: int = None, temperature: float = None, top_p: float = None) -> str:
-        """Генерирует ответ на основе промпта."""
-        if not self.is_loaded or not self.llm:
+        """Генерирует ответ на основе промпта (fallback ответ при недоступной LLM)."""
+        try:
+            return self.complete(prompt)
+        except LLMUnavailable:
+            FALLBACKS.labels(component="llm").inc()
             return self._fallback_response(prompt)
+    
+    def complete(self, prompt: str, queue_timeout: Optional[float] = None) -> str:
+        """Генерирует ответ или сообщает, почему LLM не может ответить.
         
-        try:
-            # Формируем промпт для модели
-            formatted_prompt = self._format_prompt(prompt)
-            
-            # Генерируем ответ
-            response = self.llm.invoke(formatted_prompt)
-            
-            # Извлекаем текст ответа
-            if hasattr(response, 'content'):
-                answer = response.content
-            elif hasattr(response, 'text'):
-                answer = response.text
-            else:
-                answer = str(response)
-            
-            logger.debug(f"LLM сгенерировал ответ длиной {len(answer)} символов")
-            return answer.strip()
+        Args:
+            prompt: Промпт
+            queue_timeout: Сколько секунд ждать свободного слота (None — без ограничения)
             
+        Генерация прерывается, как только запрос отменен (дедлайн или
+        отключение клиента), в том числе до первого токена: поток ответа
+        закрывается, вместе с ним закрывается HTTP соединение, и Ollama
+        освобождает слот, не догенерировав ответ до num_predict.
+        
+        Raises:
+            LLMUnavailable: LLM не загружена, очередь не дошла за queue_timeout
+                или генерация завершилась ошибкой
+            RequestCancelled: Запрос отменен в очереди или во время генерации
+        """
+        if not self.is_loaded or not self.llm:
+            raise LLMUnavailable("not_loaded", "LLM не загружена")
+        
+        # Формируем промпт для модели
+        formatted_prompt = self._format_prompt(prompt)
+        deadline = current_deadline()
+        
+        queued_at = time.perf_counter()
+        if not self._acquire_slot(queue_timeout, deadline):
+            observe_stage("llm_queue_wait", time.perf_counter() - queued_at)
+            if deadline is not None and deadline.cancelled:
+                self._record_cancellation(deadline.reason, 0)
+                deadline.check("llm_queue")
+            raise LLMUnavailable("queue_timeout", f"Очередь к LLM дольше {queue_timeout} с")
+        
+        try:
+            started = time.perf_counter()
+            observe_stage("llm_queue_wait", started - queued_at)
+            parts, usage, aborted = asyncio.run_coroutine_threadsafe(
+                self._stream(formatted_prompt, deadline, started), self._event_loop()
+            ).result()
+            observe_stage("llm_generation", time.perf_counter() - started)
         except Exception as e:
             logger.error(f"Ошибка генерации ответа: {e}")
-            return self._fallback_response(prompt)
+            ERRORS.labels(stage="llm").inc()
+            raise LLMUnavailable("error", str(e)) from e
+        finally:
+            self._slots.release()
+        
+        # Фрагмент потока не обязательно один токен, точное число — eval_count последнего фрагмента
+        generated = (ollama_usage(usage)["completion"] if usage else 0) or len(parts)
+        if aborted:
+            self._record_cancellation(deadline.reason, generated)
+            deadline.check("llm_generation")
+        self._record_generation(generated)
+        if usage:
+            record_ollama_usage(usage)
+        
+        answer = "".join(parts)
+        logger.debug(f"LLM сгенерировал ответ длиной {len(answer)} символов")
+        return answer.strip()
+    
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        """Фоновый цикл asyncio для потоковых запросов (запускается при первой генерации)."""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="llm-stream", daemon=True).start()
+        return self._loop
+    
+    async def _stream(
+        self, prompt: str, deadline: Optional[Deadline], started: float
+    ) -> Tuple[List[str], Optional[Dict], bool]:
+        """Читает поток ответа, пока он не закончится или запрос не будет отменен.
+        
+        Отмена проверяется не только после каждого токена, но и пока
+        токенов нет (обработка промпта, зависшая Ollama): ожидание
+        следующего фрагмента отменяется, поток закрывается вместе с HTTP
+        соединением.
+        
+        Returns:
+            Фрагменты текста, метаданные последнего фрагмента Ollama и флаг отмены
+        """
+        parts = []
+        usage = None
+        stream = self.llm.astream(prompt).__aiter__()
+        pending = None
+        try:
+            while True:
+                if deadline is not None and deadline.cancelled:
+                    return parts, usage, True
+                if pending is None:
+                    pending = asyncio.ensure_future(stream.__anext__())
+                wait = None
+                if deadline is not None:
+                    wait = _STREAM_POLL_INTERVAL
+                    if deadline.remaining() is not None:
+                        wait = min(wait, deadline.remaining())
+                done, _ = await asyncio.wait({pending}, timeout=wait)
+                if not done:
+                    continue
+                finished, pending = pending, None
+                try:
+                    chunk = finished.result()
+                except StopAsyncIteration:
+                    return parts, usage, False
+                
+                if not parts:
+                    observe_stage("llm_ttft", time.perf_counter() - started)
+                parts.append(self._chunk_text(chunk))
+                # Последний фрагмент Ollama несет счетчики токенов и длительности
+                metadata = getattr(chunk, "response_metadata", None) or {}
+                if "eval_count" in metadata or getattr(chunk, "usage_metadata", None):
+                    usage = {**metadata, "usage_metadata": getattr(chunk, "usage_metadata", None)}
+        finally:
+            if pending is not None:
+                pending.cancel()
+                await asyncio.gather(pending, return_exceptions=True)
+            await stream.aclose()
+    
+    def _acquire_slot(self, queue_timeout: Optional[float], deadline: Optional[Deadline]) -> bool:
+        """Ждет слот не дольше queue_timeout и дедлайна, прерываясь при отмене запроса."""
+        if deadline is None:
+            return self._slots.acquire(timeout=queue_timeout)
+        
+        gives_up_at = time.monotonic() + queue_timeout if queue_timeout is not None else None
+        while not deadline.cancelled:
+            limits = [_SLOT_POLL_INTERVAL, deadline.remaining()]
+            if gives_up_at is not None:
+                limits.append(gives_up_at - time.monotonic())
+            wait = max(min(limit for limit in limits if limit is not None), 0.0)
+            if self._slots.acquire(timeout=wait):
+                return True
+            if gives_up_at is not None and time.monotonic() >= gives_up_at:
+                return False
+        return False
+    
+    def _record_generation(self, tokens: int) -> None:
+        """Обновляет среднюю длину ответа в токенах."""
+        if self.mean_tokens is None:
+            self.mean_tokens = float(tokens)
+        else:
+            self.mean_tokens += _TOKENS_EMA_ALPHA * (tokens - self.mean_tokens)
+    
+    def _record_cancellation(self, reason: str, generated: int) -> None:
+        """Считает токены, потраченные до отмены, и оценку сэкономленных.
+        
+        Экономия — средняя длина завершенных ответов минус уже
+        сгенерированное; пока завершенных ответов нет, она не считается.
+        """
+        CANCELLED_TOKENS.labels(reason=reason).inc(generated)
+        if self.mean_tokens is not None:
+            SAVED_TOKENS.labels(reason=reason).inc(max(self.mean_tokens - generated, 0.0))
+        logger.info(f"Генерация отменена ({reason}) после {generated} токенов")
+    
+    def _chunk_text(self, chunk) -> str:
+        """Извлекает текст из фрагмента ответа."""
+        if hasattr(chunk, 'content'):
+            return chunk.content
+        elif hasattr(chunk, 'text'):
+            return chunk.text
+        return str(chunk)
     
     def _format_prompt(self, prompt: str) -> str:
         """Форматирует промпт для модели."""
-        # Системный промпт для RAG
-        system_prompt = """Ты — помощник по Moodle. Твоя задача — давать конкретные, практические инструкции.
-
-ВАЖНЫЕ ПРАВИЛА:
-1. Давай конкретные пошаговые инструкции, а не общие фразы
-2. Используй форматированный вывод (шаги, буллеты, списки)
-3. Отвечай на русском языке, если вопрос задан на русском
-4. Будь точным и конкретным
-
-ФОРМАТ ОТВЕТА:
-1. Краткий ответ на вопрос
-2. Конкретные пошаговые инструкции (если применимо)
-3. Практические советы
-
-ВОПРОС: {prompt}
-
-ОТВЕТ:"""
-        
-        return system_prompt.format(prompt=prompt)
+        return LLM_PROMPT_TEMPLATE.format(prompt=prompt)
     
     def _fallback_response(self, prompt: str) -> str:
         """Fallback ответ, если LLM недоступна."""
@@ -93,16 +255,31 @@ class LangChainLLM:
                "Рекомендую обратиться к официальной документации Moodle или уточнить вопрос. "
                "Для получения более точных ответов убедитесь, что у вас загружена LLM модель.")
     
-    def health_check(self) -> bool:
-        """Проверка здоровья LLM."""
+    def ping(self, timeout: Optional[float] = None) -> Dict:
+        """Легкая проверка Ollama: список моделей без генерации.
+        
+        Returns:
+            Словарь со статусом (healthy, message)
+        """
         if not self.is_loaded:
-            logger.warning("LLM не загружена, но fallback режим доступен")
-            return True  # Fallback доступен
+            return {"healthy": True, "message": "LLM не загружена, используется fallback"}
         
+        timeout = timeout or settings.health_probe_timeout
         try:
-            # Простой тест генерации
-            test_response = self.generate("Test", max_tokens=10)
-            return len(test_response) > 0
+            response = httpx.get(f"{self.base_url}/api/tags", timeout=timeout)
+            response.raise_for_status()
+            models = {model.get("name") for model in response.json().get("models", [])}
         except Exception as e:
-            logger.error(f"LLM не здоров: {e}")
-            return False 
\ No newline at end of file
+            return {"healthy": False, "message": f"Ollama недоступна: {e}"}
+        
+        if settings.llm_model_name not in models:
+            return {"healthy": False, "message": f"Модель {settings.llm_model_name} не найдена в Ollama"}
+        
+        return {"healthy": True, "message": f"Модель {settings.llm_model_name} доступна"}
+    
+    def health_check(self) -> bool:
+        """Проверка здоровья LLM."""
+        status = self.ping()
+        if not status["healthy"]:
+            logger.error(f"LLM не здоров: {status['message']}")
+        return status["healthy"]
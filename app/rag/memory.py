@@ -4,6 +4,7 @@ from datetime import datetime, timedelta
 import json
 
 from app.core.logger import logger
+from app.core.memory_usage import deep_sizeof, usage
 
 
 class ConversationMemory:
@@ -90,4 +91,8 @@ class ConversationMemory:
             "total_messages": total_messages,
             "max_history_length": self.max_history_length,
             "session_timeout_hours": self.session_timeout_hours
-        } 
\ No newline at end of file
+        }
+    
+    def memory_usage(self) -> Dict[str, Dict]:
+        """Память истории диалогов (entries — число сессий)."""
+        return {"sessions": usage("sessions", deep_sizeof(self.memory), entries=len(self.memory))}
@@ -1,12 +1,30 @@
 """RAG пайплайн для генерации ответов."""
-from typing import List, Optional
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
 
 from app.core.config import settings
-from app.core.logger import logger
-from app.rag.llm import LangChainLLM
-from app.rag.retriever import LangChainRetriever
+from app.core.deadline import Deadline, RequestCancelled, check_deadline, set_deadline
+from app.core.glossary import glossary
+from app.core.logger import bind_request_context, logger
+from app.core.memory_usage import MemoryLogger, build_report
+from app.core.metrics import (
+    CACHE_HITS, CACHE_MISSES, CONTEXT_DOCUMENTS, DEGRADED_ANSWERS, ERRORS, FALLBACKS, PROMPT_SECTION_TOKENS,
+    RETRIEVAL_SKIPS, add_request_tokens, get_request_timings, get_request_tokens, stage_timer,
+    start_request_timings, start_request_tokens,
+)
+from app.core.translator import translator
+from app.rag.adaptive import is_smalltalk
+from app.rag.extractive import extractive_answer
+from app.rag.faq import FAQStore
+from app.rag.health import HealthMonitor
+from app.rag.index_registry import IndexWatcher, delete_build, index_registry, logical_name
+from app.rag.llm import LangChainLLM, LLMUnavailable
+from app.rag.remote_retriever import RemoteRetriever
+from app.rag.retriever import VersionedRetriever
 from app.rag.memory import ConversationMemory
-from app.rag.prompts import build_prompt
+from app.rag.prompts import build_prompt, prompt_sections
+from app.rag.tokens import TokenCounter, section_tokens
 from app.schemas import ChatRequest, ChatResponse, Source
 
 
@@ -15,57 +33,353 @@ class LangChainRAGPipeline:
     
     def __init__(self):
         self.llm = LangChainLLM()
-        self.retriever = LangChainRetriever()
+        self.retriever = self._create_retriever()
         self.memory = ConversationMemory()
+        self.faq = self._load_faq()
+        self.token_counter = TokenCounter()
+        if settings.token_accounting:
+            # Токенизатор загружается вместе с остальными моделями, а не на первом запросе
+            mode = f"токенизатор {settings.llm_tokenizer}" if self.token_counter.exact else "оценка по символам"
+            logger.info(f"Учет токенов: {mode}")
+        # Пробы обращаются к текущему retriever, который меняется при перезагрузке индекса
+        self.health_monitor = HealthMonitor({
+            "llm": self.llm.ping,
+            "embeddings": lambda: self.retriever.ping_embeddings(),
+            "vectorstore": lambda: self.retriever.ping_vectorstore(),
+        })
+        self._reload_lock = threading.Lock()
+        self.index_watcher = IndexWatcher(index_registry, self.reload_if_changed, settings.index_watch_interval)
+        self.memory_logger = MemoryLogger(self.memory_report)
         
         logger.info("RAG пайплайн инициализирован")
     
-    def answer(self, request: ChatRequest) -> ChatResponse:
-        """Генерирует ответ на основе запроса."""
-        try:
-            question = request.message
-            session_id = request.session_id
-            
-            logger.info(f"Получен запрос от сессии {session_id}: {question[:50]}...")
-            
-            # Получаем историю диалога
-            history = self.memory.get_history(session_id)
-            
-            # Ищем релевантные документы
-            sources = self.retriever.search(question)
-            
-            # Получаем контекст
-            context = self.retriever.get_context(question)
-            
-            # Строим промпт с контекстом и историей
-            prompt = build_prompt(question, context, history)
-            
-            # Генерируем ответ
-            answer = self.llm.generate(prompt)
-            
-            # Сохраняем сообщения в историю
-            self.memory.add_message(session_id, "user", question)
-            self.memory.add_message(session_id, "assistant", answer)
-            
-            return ChatResponse(
-                answer=answer,
-                sources=sources,
-                session_id=session_id
-            )
+    @staticmethod
+    def _create_retriever():
+        """Локальный retriever или клиент общего сервиса поиска."""
+        if settings.vector_store_client == "service":
+            return RemoteRetriever()
+        return VersionedRetriever()
+    
+    def answer(self, request: ChatRequest, deadline: Optional[Deadline] = None) -> ChatResponse:
+        """Генерирует ответ на основе запроса.
+        
+        Args:
+            request: Запрос чата
+            deadline: Дедлайн запроса; стадии проверяют его и прерываются,
+                если он истек или клиент отключился
             
+        Raises:
+            RequestCancelled: Запрос отменен
+        """
+        bind_request_context(session_id=request.session_id)
+        set_deadline(deadline)
+        timings = start_request_timings()
+        start_request_tokens()
+        try:
+            with stage_timer("total"):
+                response = self._answer(request)
+        except RequestCancelled as e:
+            logger.info(f"{e}, обработка заняла {timings.get('total', 0.0):.0f} мс")
+            raise
         except Exception as e:
             logger.error(f"Ошибка в RAG пайплайне: {e}")
-            return ChatResponse(
+            ERRORS.labels(stage="pipeline").inc()
+            response = ChatResponse(
                 answer="Произошла ошибка при обработке запроса. Попробуйте позже.",
                 sources=[],
                 session_id=request.session_id
             )
+        
+        logger.info(
+            f"Запрос обработан за {timings.get('total', 0.0):.0f} мс",
+            extra={"sampled": True, "timings": get_request_timings()}
+        )
+        
+        if request.include_timings:
+            response.timings = get_request_timings()
+        if request.include_tokens:
+            response.tokens = get_request_tokens()
+        
+        return response
+    
+    def _answer(self, request: ChatRequest) -> ChatResponse:
+        """Основные шаги RAG: поиск, промпт, генерация."""
+        question = request.message
+        session_id = request.session_id
+        
+        logger.info(
+            f"Получен запрос от сессии {session_id}: {question[:50]}...",
+            extra={"sampled": True}
+        )
+        
+        # Получаем историю диалога
+        history = self.memory.get_history(session_id)
+        
+        # Частый вопрос отвечаем заранее сгенерированным ответом, без поиска и LLM
+        if self.faq is not None:
+            faq_response = self._answer_from_faq(request)
+            if faq_response is not None:
+                return faq_response
+        
+        # Запрос до конца работает с индексом, активным на момент его начала
+        retriever = self.retriever
+        
+        # Ищем релевантные документы (один раз для источников и контекста);
+        # благодарностям и приветствиям хватает истории диалога
+        if settings.skip_smalltalk_retrieval and is_smalltalk(question):
+            RETRIEVAL_SKIPS.labels(reason="smalltalk").inc()
+            documents = []
+        else:
+            check_deadline("retrieval")
+            try:
+                documents = retriever.retrieve(question, version=request.version)
+            except RequestCancelled:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка поиска: {e}")
+                ERRORS.labels(stage="retrieval").inc()
+                documents = []
+        CONTEXT_DOCUMENTS.observe(len(documents))
+        
+        sources = retriever.to_sources(documents)
+        
+        # Получаем контекст
+        context = retriever.build_context(documents)
+        
+        # Строим промпт с контекстом и историей
+        prompt = build_prompt(question, context, history)
+        
+        # Генерируем ответ
+        check_deadline("generation")
+        answer, degraded = self._generate(prompt, question, documents, retriever, request.version)
+        if settings.token_accounting and not degraded:
+            self._account_tokens(question, context, history)
+        
+        # Сохраняем сообщения в историю
+        self.memory.add_message(session_id, "user", question)
+        self.memory.add_message(session_id, "assistant", answer)
+        
+        return ChatResponse(
+            answer=answer,
+            sources=sources,
+            session_id=session_id,
+            degraded=degraded
+        )
+    
+    def _generate(self, prompt: str, question: str, documents: List, retriever: VersionedRetriever,
+                  version: Optional[str]) -> Tuple[str, bool]:
+        """Ответ LLM или, если она перегружена или недоступна, выдержки из документов.
+        
+        Returns:
+            Ответ и признак деградированного режима
+        """
+        if not settings.degraded_mode or not documents:
+            return self.llm.generate(prompt), False
+        
+        # Упавшую по фоновой проверке LLM не ждем до таймаута соединения
+        llm_status = self.health_monitor.get_status().get("llm")
+        if llm_status and not llm_status["healthy"] and not llm_status["stale"]:
+            reason = "llm_down"
+        else:
+            try:
+                return self.llm.complete(prompt, queue_timeout=settings.llm_queue_timeout), False
+            except LLMUnavailable as e:
+                reason = e.reason
+        
+        DEGRADED_ANSWERS.labels(reason=reason).inc()
+        FALLBACKS.labels(component="llm").inc()
+        logger.warning(f"LLM недоступна ({reason}), отвечаем выдержками из документации")
+        
+        with stage_timer("extractive_answer"):
+            query = retriever.get(version).search_query(question)
+            return extractive_answer(query, documents, settings.extractive_sentences), True
+    
+    def _account_tokens(self, question: str, context: str, history: str) -> None:
+        """Считает токены секций промпта и сверяет их сумму с prompt_eval_count Ollama."""
+        with stage_timer("token_count"):
+            counts = section_tokens(prompt_sections(question, context, history), self.token_counter)
+        for name, value in counts.items():
+            PROMPT_SECTION_TOKENS.labels(section=name).observe(value)
+        
+        usage = get_request_tokens()
+        if usage.get("prompt"):
+            # Шаблон чата модели в Ollama добавляет токены, которых нет в тексте промпта
+            counts["template"] = max(usage["prompt"] - sum(counts.values()), 0)
+        add_request_tokens(**counts)
+    
+    @staticmethod
+    def _load_faq() -> Optional[FAQStore]:
+        """Загружает FAQ, если он включен и сгенерирован."""
+        if not settings.faq_enabled or not settings.faq_path.exists():
+            return None
+        try:
+            return FAQStore.load(settings.faq_path, settings.moodle_version, settings.faq_match_threshold)
+        except Exception as e:
+            logger.error(f"Ошибка загрузки FAQ: {e}")
+            return None
+    
+    def _answer_from_faq(self, request: ChatRequest) -> Optional[ChatResponse]:
+        """Ответ из FAQ или None, если вопроса там нет."""
+        with stage_timer("faq_lookup"):
+            entry = self.faq.lookup(request.message, request.version)
+        if entry is None:
+            CACHE_MISSES.labels(cache="faq").inc()
+            return None
+        
+        CACHE_HITS.labels(cache="faq").inc()
+        logger.debug(f"Ответ из FAQ ({entry['match']}, {entry['score']}): {entry['question'][:50]}")
+        
+        self.memory.add_message(request.session_id, "user", request.message)
+        self.memory.add_message(request.session_id, "assistant", entry["answer"])
+        
+        return ChatResponse(
+            answer=entry["answer"],
+            sources=[Source(**source) for source in entry.get("sources", [])],
+            session_id=request.session_id,
+            faq=True
+        )
     
+    def reload_index(self, collection: Optional[str] = None) -> Dict:
+        """Blue/green переключение на новую сборку индекса.
+        
+        Новый retriever строится рядом с текущим (с той же моделью
+        эмбеддингов) и проверяется; явно заданная сборка активируется в
+        реестре только после проверки. Ссылка на retriever подменяется
+        одним присваиванием. Запросы, уже получившие старый retriever,
+        завершаются на старом индексе, поэтому он закрывается, а
+        устаревшие сборки удаляются только через `index_gc_grace_seconds`.
+        
+        Args:
+            collection: Физическая сборка, которую нужно активировать
+                (по умолчанию активные сборки из реестра)
+            
+        Raises:
+            ValueError: Сборка не зарегистрирована в реестре
+        """
+        if isinstance(self.retriever, RemoteRetriever):
+            raise RuntimeError("Индексом управляет сервис поиска, перезагрузите его там")
+        
+        with self._reload_lock:
+            started = time.perf_counter()
+            previous = self.retriever
+            overrides = None
+            if collection:
+                name = logical_name(collection)
+                if not index_registry.has_build(name, collection):
+                    raise ValueError(f"Сборка {collection} не зарегистрирована для {name}")
+                overrides = {name: collection}
+            
+            candidate = VersionedRetriever(embeddings=previous.default.embeddings, collections=overrides)
+            try:
+                if collection and collection not in candidate.collections.values():
+                    raise RuntimeError(f"Сборка {collection} пуста или не относится к загруженным версиям")
+                self._validate_retriever(candidate)
+                if collection:
+                    index_registry.activate(name, collection)
+            except Exception:
+                candidate.close()
+                raise
+            
+            self.retriever = candidate
+            self._schedule_cleanup(previous)
+            
+            result = {
+                "previous": previous.collections,
+                "active": candidate.collections,
+                "reload_ms": round((time.perf_counter() - started) * 1000, 1),
+            }
+            logger.info(f"Индекс перезагружен: {result}")
+            return result
+    
+    def reload_if_changed(self) -> Optional[Dict]:
+        """Перезагружает индекс, если в реестре активирована другая сборка."""
+        if isinstance(self.retriever, RemoteRetriever):
+            return None
+        changed = any(
+            index_registry.resolve(name) != collection
+            for name, collection in self.retriever.collections.items()
+        )
+        return self.reload_index() if changed else None
+    
+    @staticmethod
+    def _validate_retriever(retriever: VersionedRetriever) -> None:
+        """Новая сборка не пуста и находит документы."""
+        status = retriever.ping_vectorstore()
+        if not status["healthy"]:
+            raise RuntimeError(f"Новая сборка индекса не прошла проверку: {status['message']}")
+        if not retriever.retrieve("course", translate=False):
+            raise RuntimeError("Новая сборка индекса не вернула документов на тестовый запрос")
+    
+    def _schedule_cleanup(self, previous: VersionedRetriever) -> None:
+        """Закрывает прежний retriever и удаляет устаревшие сборки по истечении grace периода."""
+        grace = settings.index_gc_grace_seconds
+        if grace <= 0:
+            self._cleanup(previous)
+            return
+        
+        timer = threading.Timer(grace, self._cleanup, args=(previous,))
+        timer.name = "index-cleanup"
+        timer.daemon = True
+        timer.start()
+        logger.info(f"Прежний индекс будет закрыт, а устаревшие сборки удалены через {grace} с")
+    
+    def _cleanup(self, previous: VersionedRetriever) -> None:
+        """Освобождает бандлы прежнего retriever'а и удаляет устаревшие сборки."""
+        try:
+            previous.close()
+            with self._reload_lock:
+                self._collect_garbage(self.retriever)
+        except Exception as e:
+            logger.error(f"Ошибка очистки прежнего индекса: {e}")
+    
+    def _collect_garbage(self, retriever: VersionedRetriever) -> None:
+        """Удаляет сборки старше активной и `index_keep_versions` предыдущих.
+        
+        Сборки и бандлы, отключенные меньше `index_gc_grace_seconds`
+        назад, остаются: их еще могут читать другие воркеры.
+        """
+        from app.rag.index_bundle import current_bundle, current_changed_at, list_bundles, remove_bundle
 
+        keep = settings.index_keep_versions
+        grace = settings.index_gc_grace_seconds
+        for version_retriever in retriever.retrievers.values():
+            name = version_retriever.index_name
+            obsolete = index_registry.obsolete(name, keep, grace)
+            if obsolete and version_retriever.client is not None:
+                for collection in obsolete:
+                    delete_build(version_retriever.client, collection)
+                index_registry.forget(name, obsolete)
+            
+            root = settings.bundles_dir / name
+            if time.time() - current_changed_at(root) < grace:
+                continue
+            current = current_bundle(root)
+            bundles = [bundle_id for bundle_id in list_bundles(root) if current is None or bundle_id != current.name]
+            for bundle_id in bundles[:max(len(bundles) - keep, 0)]:
+                remove_bundle(root, bundle_id)
     
     def health_check(self) -> bool:
-        """Проверка здоровья всех компонентов."""
-        llm_healthy = self.llm.health_check()
-        retriever_healthy = self.retriever.health_check()
+        """Проверка здоровья всех компонентов по кэшу фоновых проб."""
+        if not self.health_monitor.get_status():
+            self.health_monitor.run_probes()
         
-        return llm_healthy and retriever_healthy 
\ No newline at end of file
+        return self.health_monitor.is_healthy()
+    
+    def health_details(self) -> Dict[str, Dict]:
+        """Кэшированный статус каждого компонента."""
+        return self.health_monitor.get_status()
+    
+    def memory_usage(self) -> Dict[str, Dict]:
+        """Оценка памяти каждого компонента: модели, кэши, индексы и сессии."""
+        components = {}
+        components.update(translator.memory_usage())
+        components.update(glossary.memory_usage())
+        components.update(self.retriever.memory_usage())
+        components.update(self.memory.memory_usage())
+        if self.faq is not None:
+            components.update(self.faq.memory_usage())
+        return components
+    
+    def memory_report(self, top: int = 0) -> Dict:
+        """Отчет о памяти процесса с `top` крупнейшими местами выделения (если включен tracemalloc)."""
+        return build_report(self.memory_usage(), top)
@@ -1,4 +1,7 @@
 """Промпты для RAG системы."""
+from typing import Dict
+
+from app.core.metrics import stage_timer
 
 # Системный промпт для RAG
 SYSTEM_PROMPT = """You are a Moodle assistant. Use ONLY information from the provided context.
@@ -24,6 +27,39 @@ QUESTION_PROMPT = "QUESTION: {question}"
 # Промпт для ответа
 ANSWER_PROMPT = "ANSWER:"
 
+# Обертка, в которую LangChainLLM заворачивает промпт build_prompt
+LLM_PROMPT_TEMPLATE = """Ты — помощник по Moodle. Твоя задача — давать конкретные, практические инструкции.
+
+ВАЖНЫЕ ПРАВИЛА:
+1. Давай конкретные пошаговые инструкции, а не общие фразы
+2. Используй форматированный вывод (шаги, буллеты, списки)
+3. Отвечай на русском языке, если вопрос задан на русском
+4. Будь точным и конкретным
+
+ФОРМАТ ОТВЕТА:
+1. Краткий ответ на вопрос
+2. Конкретные пошаговые инструкции (если применимо)
+3. Практические советы
+
+ВОПРОС: {prompt}
+
+ОТВЕТ:"""
+
+
+def prompt_sections(question: str, context: str = "", history: str = "") -> Dict[str, str]:
+    """Секции текста, который уходит в LLM, для подсчета токенов.
+    
+    Returns:
+        system (обертка LLM, системный промпт и строка ответа), context,
+        history и question; отсутствующие секции — пустые строки
+    """
+    return {
+        "system": "\n\n".join([LLM_PROMPT_TEMPLATE.format(prompt=""), SYSTEM_PROMPT, ANSWER_PROMPT]),
+        "context": CONTEXT_PROMPT.format(context=context) if context else "",
+        "history": HISTORY_PROMPT.format(history=history) if history else "",
+        "question": QUESTION_PROMPT.format(question=question),
+    }
+
 
 def build_prompt(question: str, context: str = "", history: str = "") -> str:
     """Строит полный промпт для LLM.
@@ -36,15 +72,16 @@ def build_prompt(question: str, context: str = "", history: str = "") -> str:
     Returns:
         Полный промпт для LLM
     """
-    prompt_parts = [SYSTEM_PROMPT]
-    
-    if context:
-        prompt_parts.append(CONTEXT_PROMPT.format(context=context))
-    
-    if history:
-        prompt_parts.append(HISTORY_PROMPT.format(history=history))
-    
-    prompt_parts.append(QUESTION_PROMPT.format(question=question))
-    prompt_parts.append(ANSWER_PROMPT)
-    
-    return "\n\n".join(prompt_parts) 
\ No newline at end of file
+    with stage_timer("prompt_build"):
+        prompt_parts = [SYSTEM_PROMPT]
+        
+        if context:
+            prompt_parts.append(CONTEXT_PROMPT.format(context=context))
+        
+        if history:
+            prompt_parts.append(HISTORY_PROMPT.format(history=history))
+        
+        prompt_parts.append(QUESTION_PROMPT.format(question=question))
+        prompt_parts.append(ANSWER_PROMPT)
+        
+        return "\n\n".join(prompt_parts) 
\ No newline at end of file
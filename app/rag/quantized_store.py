@@ -0,0 +1,302 @@
+"""Компактное векторное хранилище на квантованных кодах с точным пересчетом."""
+import fcntl
+import json
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.logger import logger
+from app.core.memory_usage import array_bytes, deep_sizeof, usage
+
+# Число единичных бит в каждом байте для расстояния Хэмминга
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+# Строк за раз при поиске по кодам: ограничивает временные массивы
+_BLOCK_ROWS = 16384
+
+# Файл в папке коллекции со строками ее чанков в общей матрице
+VIEW_ROWS_FILE = "rows.npy"
+
+
+def similarity_scores(vectors: np.ndarray, query: np.ndarray, space: str) -> np.ndarray:
+    """Точная близость векторов к запросу в метрике индекса (больше — ближе)."""
+    if space == "l2":
+        return -np.sum((vectors - query) ** 2, axis=1)
+    if space == "cosine":
+        norms = np.maximum(np.linalg.norm(vectors, axis=1), 1e-12)
+        return (vectors @ query) / norms / max(np.linalg.norm(query), 1e-12)
+    return vectors @ query
+
+
+class QuantizedVectorStore:
+    """Поиск по int8 или 1-битным кодам эмбеддингов чанков.
+
+    Кандидаты отбираются по кодам (int8 скалярное произведение или
+    расстояние Хэмминга), затем короткий список пересчитывается точно по
+    float16 векторам, которые остаются на диске (np.load с mmap). В памяти
+    живут только коды: d байт (int8) или d/8 байт (binary) на чанк вместо
+    4*d байт float32 и графа HNSW.
+    """
+
+    def __init__(self, path: Path, quantization: str = "int8", space: str = "cosine"):
+        self.path = Path(path)
+        self.quantization = quantization
+        self.space = space
+
+        self.manifest = json.loads((self.path / "manifest.json").read_text(encoding="utf-8"))
+        ids = json.loads((self.path / "ids.json").read_text(encoding="utf-8"))
+        self.ids: List[str] = ids["ids"]
+        self.page_ids = np.asarray(ids["page_ids"])
+        self.mean = np.load(self.path / "mean.npy")
+
+        if quantization == "binary":
+            self.codes = np.load(self.path / "codes_binary.npy")
+            self.scales = None
+        else:
+            self.codes = np.load(self.path / "codes_int8.npy")
+            self.scales = np.load(self.path / "scales.npy")
+
+        # Полные векторы для пересчета читаются с диска по требованию
+        self.vectors = np.load(self.path / "vectors_f16.npy", mmap_mode="r")
+
+        logger.info(
+            f"Квантованный индекс {self.path.name}: {len(self.ids)} векторов, "
+            f"{quantization}, {self.codes.nbytes / 1024 / 1024:.1f} МБ кодов"
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def memory_usage(self) -> Dict:
+        """Коды, шкалы и id в памяти; векторы для пересчета отображены с диска."""
+        arrays = array_bytes(self.codes, self.scales, self.mean, self.page_ids, self.vectors)
+        return usage("index", arrays["resident"] + deep_sizeof(self.ids), entries=len(self.ids),
+                     mapped=arrays["mapped"])
+
+    @staticmethod
+    def build(path: Path, ids: Sequence[str], page_ids: Sequence[str], embeddings: np.ndarray,
+              metadata: Optional[Dict] = None) -> None:
+        """Сохраняет int8 и 1-битные коды вместе с float16 векторами."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+
+        # Центрирование по среднему корпуса делает знаки битов информативными.
+        # Скалярное произведение кодов с нецентрированным запросом отличается
+        # от точного на mean·q, одинаковое для всех документов, и порядок не меняет
+        mean = embeddings.mean(axis=0)
+        centered = embeddings - mean
+        scales = np.maximum(np.abs(centered).max(axis=0), 1e-12) / 127
+        codes_int8 = np.clip(np.round(centered / scales), -127, 127).astype(np.int8)
+        codes_binary = np.packbits(centered > 0, axis=1)
+
+        np.save(path / "mean.npy", mean)
+        np.save(path / "scales.npy", scales.astype(np.float32))
+        np.save(path / "codes_int8.npy", codes_int8)
+        np.save(path / "codes_binary.npy", codes_binary)
+        np.save(path / "vectors_f16.npy", embeddings.astype(np.float16))
+        (path / "ids.json").write_text(
+            json.dumps({"ids": list(ids), "page_ids": [str(page_id) for page_id in page_ids]}),
+            encoding="utf-8"
+        )
+        (path / "manifest.json").write_text(
+            json.dumps({"count": len(ids), "dim": int(embeddings.shape[1]), **(metadata or {})}, indent=2),
+            encoding="utf-8"
+        )
+
+    def _code_scores(self, query: np.ndarray, rows) -> np.ndarray:
+        """Приближенная близость по кодам (больше — ближе); rows — срез или массив строк."""
+        codes = self.codes[rows]
+        if self.quantization == "binary":
+            # Знаки сравниваются в центрированных координатах
+            query_bits = np.packbits(query - self.mean > 0)
+            return -_POPCOUNT[np.bitwise_xor(codes, query_bits)].sum(axis=1, dtype=np.int32)
+        # (d - mean)·q = d·q - mean·q: запрос не центрируется, иначе к оценке
+        # добавится зависящий от документа член -(d - mean)·mean
+        return codes @ (query * self.scales).astype(np.float32)
+
+    def search_rows(self, query: Sequence[float], top_k: int, shortlist: int = 50,
+                    rows: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Отбор по кодам и точный пересчет среди строк `rows` (None — все строки).
+
+        Returns:
+            Пары (позиция в rows или номер строки, score) по убыванию близости
+        """
+        count = len(self.codes) if rows is None else len(rows)
+        if count == 0:
+            return []
+
+        query = np.asarray(query, dtype=np.float32)
+        scores = np.concatenate([
+            self._code_scores(query, slice(start, start + _BLOCK_ROWS) if rows is None
+                              else rows[start:start + _BLOCK_ROWS])
+            for start in range(0, count, _BLOCK_ROWS)
+        ]).astype(np.float32)
+
+        shortlist = min(max(shortlist, top_k), count)
+        candidates = np.argpartition(-scores, shortlist - 1)[:shortlist]
+        candidates.sort()
+        vector_rows = candidates if rows is None else rows[candidates]
+
+        exact = similarity_scores(np.asarray(self.vectors[vector_rows], dtype=np.float32), query, self.space)
+        order = np.argsort(-exact)[:top_k]
+        return [(int(candidates[i]), float(exact[i])) for i in order]
+
+    def search(self, query: Sequence[float], top_k: int, shortlist: int = 50,
+               page_ids: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        """Находит top_k чанков: отбор по кодам, затем точный пересчет.
+
+        Args:
+            query: Эмбеддинг запроса
+            top_k: Сколько чанков вернуть
+            shortlist: Сколько кандидатов пересчитывать по float16 векторам
+            page_ids: Искать только среди чанков этих страниц
+
+        Returns:
+            Пары (chunk_id, score) по убыванию близости
+        """
+        rows = None if page_ids is None else np.flatnonzero(np.isin(self.page_ids, page_ids))
+        hits = self.search_rows(query, top_k, shortlist, rows)
+        return [(self.ids[row if rows is None else rows[row]], score) for row, score in hits]
+
+    def memory_stats(self) -> Dict[str, float]:
+        """Память кодов против float32 векторов (без учета графа HNSW)."""
+        count, dim = len(self.ids), self.manifest["dim"]
+        float32_bytes = count * dim * 4
+        return {
+            "vectors": count,
+            "codes_mb": round(self.codes.nbytes / 1024 / 1024, 3),
+            "float32_mb": round(float32_bytes / 1024 / 1024, 3),
+            "reduction": round(float32_bytes / max(self.codes.nbytes, 1), 1),
+        }
+
+
+class QuantizedView:
+    """Коллекция поверх общей матрицы кодов всех версий документации.
+
+    Совпадающие по тексту чанки разных версий и языков хранятся в общей
+    матрице одной строкой (ключ — text_hash), а коллекция держит только
+    id своих чанков и номера их строк. Поиск идет по кодам только этих
+    строк, поэтому результаты те же, что у отдельного индекса коллекции.
+    """
+
+    def __init__(self, path: Path, store: QuantizedVectorStore):
+        self.path = Path(path)
+        self.store = store
+        self.manifest = json.loads((self.path / "manifest.json").read_text(encoding="utf-8"))
+        ids = json.loads((self.path / "ids.json").read_text(encoding="utf-8"))
+        self.ids: List[str] = ids["ids"]
+        self.page_ids = np.asarray(ids["page_ids"])
+        self.rows = np.load(self.path / VIEW_ROWS_FILE)
+        if len(self.rows) and int(self.rows.max()) >= len(store):
+            raise ValueError(
+                f"Строки {self.path.name} выходят за общую матрицу {store.path}, перезапустите ingest-chroma"
+            )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def memory_usage(self) -> Dict:
+        """id и номера строк коллекции; общая матрица учитывается отдельно."""
+        arrays = array_bytes(self.rows, self.page_ids)
+        return usage("index", arrays["resident"] + deep_sizeof(self.ids), entries=len(self.ids))
+
+    def search(self, query: Sequence[float], top_k: int, shortlist: int = 50,
+               page_ids: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        """Как QuantizedVectorStore.search, но только среди чанков коллекции."""
+        positions = np.arange(len(self.rows)) if page_ids is None else np.flatnonzero(np.isin(self.page_ids, page_ids))
+        hits = self.store.search_rows(query, top_k, shortlist, self.rows[positions])
+        return [(self.ids[positions[i]], score) for i, score in hits]
+
+
+def write_view(path: Path, ids: Sequence[str], page_ids: Sequence[str], rows: np.ndarray,
+               metadata: Optional[Dict] = None) -> None:
+    """Сохраняет id чанков коллекции и номера их строк в общей матрице."""
+    path = Path(path)
+    shutil.rmtree(path, ignore_errors=True)
+    path.mkdir(parents=True)
+    np.save(path / VIEW_ROWS_FILE, np.asarray(rows, dtype=np.int32))
+    (path / "ids.json").write_text(
+        json.dumps({"ids": list(ids), "page_ids": [str(page_id) for page_id in page_ids]}),
+        encoding="utf-8"
+    )
+    (path / "manifest.json").write_text(
+        json.dumps({"count": len(ids), "unique": int(len(np.unique(rows))), **(metadata or {})}, indent=2),
+        encoding="utf-8"
+    )
+
+
+def is_view(path: Path) -> bool:
+    """Квантованный индекс коллекции хранит только строки общей матрицы."""
+    return (Path(path) / VIEW_ROWS_FILE).exists()
+
+
+def open_shared(root: Path, quantization: str = "int8", space: str = "cosine") -> Optional[QuantizedVectorStore]:
+    """Актуальное поколение общей матрицы или None, если ее еще нет."""
+    from app.rag.index_bundle import current_bundle
+
+    path = current_bundle(root)
+    if path is None or not path.exists():
+        return None
+    return QuantizedVectorStore(path, quantization, space)
+
+
+def update_shared(root: Path, hashes: Sequence[str], embeddings: np.ndarray,
+                  metadata: Optional[Dict] = None) -> np.ndarray:
+    """Добавляет в общую матрицу векторы новых текстов.
+
+    Пишется новое поколение матрицы: прежние строки сохраняют номера,
+    тексты, которых еще не было, дописываются в конец, а коды
+    пересчитываются по всем векторам. Указатель CURRENT переключается
+    атомарно; поколения старше предыдущего удаляются. Загрузки разных
+    версий сериализуются блокировкой файла.
+
+    Returns:
+        Номера строк для каждого из hashes
+    """
+    from app.rag.index_bundle import current_bundle, list_bundles, remove_bundle, set_current
+
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    with open(root / ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        current = current_bundle(root)
+        if current is not None and current.exists():
+            known: List[str] = json.loads((current / "ids.json").read_text(encoding="utf-8"))["ids"]
+            vectors = np.load(current / "vectors_f16.npy").astype(np.float32)
+        else:
+            known, vectors = [], np.zeros((0, embeddings.shape[1]), dtype=np.float32)
+
+        index = {text: row for row, text in enumerate(known)}
+        added = []
+        for position, text in enumerate(hashes):
+            if text not in index:
+                index[text] = len(known) + len(added)
+                added.append(position)
+
+        rows = np.asarray([index[text] for text in hashes], dtype=np.int32)
+        if not added and current is not None:
+            return rows
+
+        generation = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        staging = root / f".{generation}.tmp"
+        QuantizedVectorStore.build(
+            staging,
+            ids=known + [hashes[i] for i in added],
+            page_ids=[],
+            embeddings=np.concatenate([vectors, embeddings[added]]),
+            metadata=metadata
+        )
+        staging.rename(root / generation)
+        set_current(root, generation)
+
+        generations = list_bundles(root)
+        for old in generations[:max(len(generations) - 2, 0)]:
+            remove_bundle(root, old)
+        logger.info(f"Общая матрица {root.name}: {len(known) + len(added)} векторов, новых {len(added)}")
+        return rows
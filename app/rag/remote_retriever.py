@@ -0,0 +1,116 @@
+"""Клиент сервиса поиска с интерфейсом VersionedRetriever."""
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import httpx
+from langchain_core.documents import Document
+
+from app.core.config import settings
+from app.core.deadline import current_deadline
+from app.core.logger import logger
+from app.core.metrics import stage_timer
+from app.rag.context import build_context, to_sources
+from app.schemas import Source
+
+# Сколько последних поисковых запросов (переводов) помнить для извлекающих ответов
+_SEARCH_QUERY_CACHE_SIZE = 256
+
+
+class RemoteRetriever:
+    """Поиск через сервис app.retrieval_service.
+
+    Модель эмбеддингов и индекс живут в одном процессе сервиса, а воркеры
+    API на любых хостах ходят в него через общий пул keep-alive
+    соединений httpx. Маршрутизация по версиям выполняется сервисом,
+    поэтому `get` возвращает сам клиент.
+    """
+
+    mode = "remote"
+
+    def __init__(self, base_url: Optional[str] = None, client: Optional[httpx.Client] = None):
+        self.base_url = (base_url or settings.retrieval_service_url).rstrip("/")
+        pool_size = settings.retrieval_service_pool_size
+        self.client = client or httpx.Client(
+            base_url=self.base_url,
+            timeout=settings.retrieval_service_timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+        self._search_queries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        logger.info(f"Поиск выполняется сервисом {self.base_url}")
+
+    @property
+    def collections(self) -> Dict[str, str]:
+        """Коллекциями управляет сервис поиска."""
+        return {}
+
+    def get(self, version: Optional[str] = None, lang: Optional[str] = None) -> "RemoteRetriever":
+        return self
+
+    def retrieve(self, query: str, top_k: Optional[int] = None, translate: Optional[bool] = None,
+                 version: Optional[str] = None, lang: Optional[str] = None,
+                 adaptive: Optional[bool] = None) -> List[Document]:
+        """Поиск в коллекции нужной версии на стороне сервиса."""
+        # Запрос к сервису не переживает дедлайн запроса API
+        timeout = settings.retrieval_service_timeout
+        deadline = current_deadline()
+        if deadline is not None and deadline.remaining() is not None:
+            timeout = min(timeout, max(deadline.remaining(), 0.001))
+        
+        with stage_timer("remote_retrieval"):
+            response = self.client.post("/retrieve", json={
+                "query": query, "top_k": top_k, "translate": translate,
+                "version": version, "lang": lang, "adaptive": adaptive,
+            }, timeout=timeout)
+            response.raise_for_status()
+            data = response.json()
+
+        with self._lock:
+            self._search_queries[query] = data["search_query"]
+            if len(self._search_queries) > _SEARCH_QUERY_CACHE_SIZE:
+                self._search_queries.popitem(last=False)
+
+        return [Document(page_content=doc["page_content"], metadata=doc["metadata"]) for doc in data["documents"]]
+
+    def search_query(self, query: str, translate: Optional[bool] = None) -> str:
+        """Текст, по которому сервис искал этот запрос (или сам запрос)."""
+        with self._lock:
+            return self._search_queries.get(query, query)
+
+    def embed_queries(self, queries: List[str]) -> None:
+        """Эмбеддинги считает и кэширует сервис."""
+
+    def to_sources(self, documents: List[Document]) -> List[Source]:
+        return to_sources(documents)
+
+    def build_context(self, documents: List[Document]) -> str:
+        return build_context(documents)
+
+    def _health(self) -> Dict:
+        response = self.client.get("/health", timeout=settings.health_probe_timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def ping_embeddings(self) -> Dict:
+        try:
+            return self._health()["embeddings"]
+        except Exception as e:
+            return {"healthy": False, "message": f"Сервис поиска недоступен: {e}"}
+
+    def ping_vectorstore(self) -> Dict:
+        try:
+            return self._health()["vectorstore"]
+        except Exception as e:
+            return {"healthy": False, "message": f"Сервис поиска недоступен: {e}"}
+
+    def memory_usage(self) -> Dict[str, Dict]:
+        """Модель и индексы живут в процессе сервиса поиска."""
+        return {}
+
+    def health_check(self) -> bool:
+        return self.ping_embeddings()["healthy"] and self.ping_vectorstore()["healthy"]
+
+    def close(self) -> None:
+        """Закрывает пул соединений."""
+        self.client.close()
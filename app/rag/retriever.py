@@ -1,53 +1,116 @@
 """Retriever для поиска релевантных документов через LangChain."""
-from typing import List, Optional
-import chromadb
-from chromadb.config import Settings
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Optional
 
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.documents import Document
 
 from app.core.config import settings
+from app.core.deadline import check_deadline
+from app.core.inference import configure_torch_threads, quantize_linear
 from app.core.logger import logger
+from app.core.memory_usage import deep_sizeof, tensor_bytes, usage
+from app.core.model_store import is_prequantized, model_load_timer, resolve_model
+from app.core.metrics import CACHE_HITS, CACHE_MISSES, ERRORS, TITLE_MATCHES, stage_timer
 from app.core.translator import translator
+from app.rag.adaptive import adaptive_cut
+from app.rag.chroma_client import create_chroma_client
+from app.rag.context import build_context, to_sources
+from app.rag.index_registry import index_registry
+from app.rag.title_index import TitleIndex
 from app.schemas import Source
 
+if TYPE_CHECKING:
+    import chromadb
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    from app.rag.quantized_store import QuantizedVectorStore
+
+# chromadb, langchain_chroma, langchain_huggingface (torch) и numpy
+# импортируются при создании retriever'а, а не при импорте модуля
+
 
 class LangChainRetriever:
     """Retriever для поиска в ChromaDB через LangChain."""
     
-    def __init__(self):
+    def __init__(self, collection_name: Optional[str] = None, mode: Optional[str] = None,
+                 version: Optional[str] = None, lang: Optional[str] = None,
+                 embeddings: Optional["HuggingFaceEmbeddings"] = None,
+                 client: Optional["chromadb.ClientAPI"] = None,
+                 shared_vectors: Optional["QuantizedVectorStore"] = None):
         self.chroma_dir = settings.chroma_dir
-        self.collection_name = settings.collection_name
+        # translate: перевод MarianMT + английские эмбеддинги;
+        # multilingual: русские запросы эмбеддятся напрямую, без перевода
+        self.mode = mode or settings.retrieval_mode
+        self.version = version or settings.moodle_version
+        self.lang = lang or settings.moodle_lang
+        self.embedding_model_name = settings.embedding_model_for(self.mode)
+        # Логическое имя индекса; физическая коллекция — его активная сборка
+        self.index_name = settings.collection_name_for(self.mode, self.version, self.lang)
+        self.collection_name = collection_name or index_registry.resolve(self.index_name)
         self.top_k = settings.top_k
         self.vectorstore = None
-        self.embeddings = None
+        # Модель, клиент Chroma и общую матрицу векторов можно разделять между retriever'ами версий
+        self.embeddings = embeddings
+        self.client = client
+        self.shared_vectors = shared_vectors
         self.retriever = None
+        self.title_index = None
+        self.title_index_mode = settings.title_index_mode
+        self.strategy = settings.retrieval_strategy
+        self.adaptive = settings.adaptive_retrieval
+        self.pages_collection = None
+        self.quantized_store = None
+        # LRU кэш эмбеддингов запросов (поисковый запрос -> вектор)
+        self._embedding_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._embedding_cache_lock = threading.Lock()
         
-        self._init_embeddings()
+        if self.embeddings is None:
+            self._init_embeddings()
         self._init_vectorstore()
+        self._init_pages_collection()
+        self._init_quantized_store()
+        self._init_title_index()
     
     def _init_embeddings(self) -> None:
         """Инициализирует модель эмбеддингов."""
         try:
-            self.embeddings = HuggingFaceEmbeddings(
-                model_name=settings.embedding_model,
-                model_kwargs={'device': 'cpu'},
-                encode_kwargs={'normalize_embeddings': True}
-            )
-            logger.info(f"Загружена модель эмбеддингов: {settings.embedding_model}")
+            from langchain_huggingface import HuggingFaceEmbeddings
+
+            configure_torch_threads()
+            with model_load_timer("embeddings", self.embedding_model_name):
+                self.embeddings = HuggingFaceEmbeddings(
+                    model_name=resolve_model(self.embedding_model_name),
+                    model_kwargs={'device': 'cpu'},
+                    encode_kwargs={'normalize_embeddings': settings.normalize_embeddings}
+                )
+            
+            if settings.optimized_inference or is_prequantized(self.embedding_model_name):
+                # SentenceTransformer внутри обертки LangChain
+                self.embeddings._client = quantize_linear(self.embeddings._client)
+                logger.info("Модель эмбеддингов квантована в int8")
+            logger.info(f"Загружена модель эмбеддингов: {self.embedding_model_name} (режим {self.mode})")
         except Exception as e:
             logger.error(f"Ошибка загрузки модели эмбеддингов: {e}")
             raise
     
     def _init_vectorstore(self) -> None:
         """Инициализирует векторное хранилище."""
+        if settings.vector_store == "bundle" and self._init_bundle():
+            return
+        
         try:
+            from langchain_chroma import Chroma
+
+            if self.client is None:
+                self.client = create_chroma_client(self.chroma_dir)
             self.vectorstore = Chroma(
-                persist_directory=str(self.chroma_dir),
+                client=self.client,
                 embedding_function=self.embeddings,
-                collection_name=self.collection_name
+                collection_name=self.collection_name,
+                collection_metadata=settings.hnsw_metadata()
             )
+            self._check_index_settings()
             
             # Создаем базовый retriever
             self.retriever = self.vectorstore.as_retriever(
@@ -60,79 +123,519 @@ class LangChainRetriever:
             logger.error(f"Ошибка инициализации векторного хранилища: {e}")
             raise
     
-    def search(self, query: str) -> List[Source]:
-        """Ищет релевантные документы."""
+    def _init_bundle(self) -> bool:
+        """Открывает актуальный бандл индекса коллекции вместо Chroma."""
+        from app.rag.index_bundle import IndexBundle, current_bundle
+
+        path = current_bundle(settings.bundles_dir / self.index_name)
+        if path is None or not path.exists():
+            logger.warning(f"Бандл индекса для {self.collection_name} не найден, используем Chroma")
+            return False
+        
+        self.vectorstore = IndexBundle(path, settings.hnsw_space)
+        manifest = self.vectorstore.manifest
+        if manifest.get("embedding_model") != self.embedding_model_name:
+            logger.warning(
+                f"Бандл {manifest['bundle_id']} построен моделью {manifest.get('embedding_model')}, "
+                f"а запросы эмбеддятся моделью {self.embedding_model_name}"
+            )
+        return True
+    
+    def count_documents(self) -> int:
+        """Число чанков в хранилище."""
+        if hasattr(self.vectorstore, "_collection"):
+            return self.vectorstore._collection.count()
+        # Бандл индекса
+        return self.vectorstore.count()
+    
+    def _check_index_settings(self) -> None:
+        """Предупреждает, если коллекция построена с другими параметрами."""
+        metadata = self.vectorstore._collection.metadata or {}
+        if "normalized" in metadata and metadata["normalized"] != settings.normalize_embeddings:
+            logger.warning(
+                f"Коллекция {self.collection_name} построена с normalized={metadata['normalized']}, "
+                f"а запросы эмбеддятся с normalize_embeddings={settings.normalize_embeddings}"
+            )
+        space = metadata.get("hnsw:space", "l2")
+        if space != settings.hnsw_space:
+            logger.warning(
+                f"Коллекция {self.collection_name} использует метрику {space} вместо {settings.hnsw_space}, "
+                "перезапустите ingest-chroma"
+            )
+    
+    def _init_pages_collection(self) -> None:
+        """Открывает коллекцию векторов страниц для иерархического поиска."""
+        if self.strategy != "hierarchical":
+            return
+        if self.client is None:
+            logger.warning("Иерархический поиск доступен только с Chroma, используем плоский поиск")
+            return
+        
+        pages_name = f"{self.collection_name}{settings.pages_collection_suffix}"
         try:
-            # Переводим запрос на английский для лучшего поиска
-            translated_query = translator.translate(query)
+            self.pages_collection = self.client.get_collection(pages_name)
+            logger.info(f"Иерархический поиск: {self.pages_collection.count()} страниц в {pages_name}")
+        except Exception as e:
+            logger.warning(f"Коллекция страниц {pages_name} недоступна, используем плоский поиск: {e}")
+            self.pages_collection = None
+    
+    def _init_quantized_store(self) -> None:
+        """Загружает квантованные коды коллекции вместо поиска по HNSW."""
+        if settings.vector_store != "quantized":
+            return
+        
+        from app.rag.quantized_store import QuantizedVectorStore, QuantizedView, is_view, open_shared
 
-            # Получаем документы через LangChain retriever
-            documents = self.retriever.get_relevant_documents(translated_query)
+        path = settings.quantized_dir / self.collection_name
+        try:
+            if is_view(path):
+                # Коллекция хранит только номера строк общей матрицы всех версий
+                if self.shared_vectors is None:
+                    root = settings.shared_vectors_dir(self.embedding_model_name)
+                    self.shared_vectors = open_shared(root, settings.quantization, settings.hnsw_space)
+                    if self.shared_vectors is None:
+                        raise FileNotFoundError(f"Общая матрица {root} не найдена")
+                self.quantized_store = QuantizedView(path, self.shared_vectors)
+            else:
+                self.quantized_store = QuantizedVectorStore(path, settings.quantization, settings.hnsw_space)
+        except (FileNotFoundError, ValueError) as e:
+            logger.warning(f"Квантованный индекс {path} недоступен, используем HNSW Chroma: {e}")
+            self.quantized_store = None
+    
+    def get_documents(self, chunk_ids: List[str]) -> List[Document]:
+        """Чанки по id в заданном порядке."""
+        data = self.vectorstore.get(ids=chunk_ids, include=["documents", "metadatas"])
+        by_id = {
+            chunk_id: Document(page_content=text, metadata={**metadata, "chunk_id": chunk_id})
+            for chunk_id, text, metadata in zip(data["ids"], data["documents"], data["metadatas"])
+        }
+        return [by_id[chunk_id] for chunk_id in chunk_ids if chunk_id in by_id]
+    
+    def search_pages(self, query_embedding: List[float], n_pages: Optional[int] = None) -> List[str]:
+        """Первый этап: page_id ближайших страниц."""
+        result = self.pages_collection.query(
+            query_embeddings=[query_embedding],
+            n_results=n_pages or settings.hierarchical_top_pages,
+            include=["metadatas"]
+        )
+        return [str(metadata["page_id"]) for metadata in result["metadatas"][0]]
+    
+    @staticmethod
+    def _relevance(distance: float) -> float:
+        """Релевантность (больше — ближе) из расстояния в метрике индекса.
+        
+        Для l2 по нормализованным векторам d = 2 - 2cos, поэтому обе шкалы
+        совпадают с косинусной близостью.
+        """
+        if settings.hnsw_space == "l2":
+            return 1.0 - distance / 2
+        return 1.0 - distance
+    
+    def vector_search(self, query_embedding: List[float], top_k: int) -> List[Document]:
+        """Поиск чанков: по всей коллекции или только в отобранных страницах.
+        
+        Релевантность каждого чанка записывается в metadata["score"].
+        """
+        page_ids = None
+        if self.strategy == "hierarchical" and self.pages_collection is not None:
+            with stage_timer("page_search"):
+                page_ids = self.search_pages(query_embedding) or None
+        
+        if self.quantized_store is not None:
+            hits = self.quantized_store.search(
+                query_embedding, top_k, shortlist=settings.quantized_shortlist, page_ids=page_ids
+            )
+            # Точные оценки хранилища в шкале близости, для l2 это -d
+            distances = {
+                chunk_id: -score if settings.hnsw_space == "l2" else 1.0 - score
+                for chunk_id, score in hits
+            }
+            scored = [
+                (doc, distances[doc.metadata["chunk_id"]])
+                for doc in self.get_documents([chunk_id for chunk_id, _ in hits])
+            ]
+        elif page_ids:
+            scored = self.vectorstore.similarity_search_by_vector_with_relevance_scores(
+                query_embedding, k=top_k, filter={"page_id": {"$in": page_ids}}
+            )
+        else:
+            scored = self.vectorstore.similarity_search_by_vector_with_relevance_scores(query_embedding, k=top_k)
+        
+        documents = []
+        for doc, distance in scored:
+            doc.metadata["score"] = round(self._relevance(distance), 4)
+            documents.append(doc)
+        return documents
+    
+    def _init_title_index(self) -> None:
+        """Строит индекс заголовков по метаданным коллекции."""
+        if self.title_index_mode == "off":
+            return
+        
+        try:
+            data = self.vectorstore.get(include=["metadatas"])
+            self.title_index = TitleIndex(fuzzy_threshold=settings.title_fuzzy_threshold)
+            for metadata in data["metadatas"]:
+                title = metadata.get("title")
+                if not title:
+                    continue
+                page_id = str(metadata.get("page_id", ""))
+                self.title_index.add(title, page_id)
+                # Алиасы (редиректы) хранятся строкой через "|"
+                for alias in (metadata.get("aliases") or "").split("|"):
+                    if alias:
+                        self.title_index.add_alias(alias, title)
             
-            # Преобразуем в Source объекты
-            sources = []
-            for i, doc in enumerate(documents):
-                # Извлекаем метаданные
-                metadata = doc.metadata
-                title = metadata.get("title", f"Document {i+1}")
-                chunk_id = metadata.get("chunk_id", f"chunk_{i}")
-                
-                # Используем URL из метаданных
-                url = metadata.get("url", "")
-                
-                # Простой score на основе позиции (можно улучшить)
-                score = 1.0 - (i * 0.1)
-                
-                source = Source(
-                    title=title,
-                    url=url,
-                    chunk_id=chunk_id,
-                    score=score
-                )
-                sources.append(source)
+            logger.info(f"Индекс заголовков построен: {len(self.title_index)} названий")
+        except Exception as e:
+            logger.error(f"Ошибка построения индекса заголовков: {e}")
+            self.title_index = None
+    
+    def match_title(self, *queries: str) -> Optional[Dict]:
+        """Страница, уверенно названная в одном из вариантов запроса."""
+        if self.title_index is None:
+            return None
+        
+        for query in queries:
+            match = self.title_index.lookup(query)
+            if match and match["score"] >= settings.title_match_threshold:
+                return match
+        return None
+    
+    def get_page_documents(self, page_ids: List[str], limit: int) -> List[Document]:
+        """Чанки страниц по page_id в порядке следования на странице."""
+        data = self.vectorstore.get(
+            where={"page_id": {"$in": page_ids}},
+            include=["documents", "metadatas"]
+        )
+        
+        documents = []
+        for chunk_id, text, metadata in zip(data["ids"], data["documents"], data["metadatas"]):
+            metadata = dict(metadata)
+            metadata.setdefault("chunk_id", chunk_id)
+            documents.append(Document(page_content=text, metadata=metadata))
+        
+        documents.sort(key=lambda doc: (
+            page_ids.index(str(doc.metadata.get("page_id"))),
+            doc.metadata.get("chunk_index", 0)
+        ))
+        return documents[:limit]
+    
+    def _cache_embedding(self, query: str, embedding: List[float]) -> None:
+        with self._embedding_cache_lock:
+            self._embedding_cache[query] = embedding
+            if len(self._embedding_cache) > settings.embedding_cache_size:
+                self._embedding_cache.popitem(last=False)
+    
+    def embed_query(self, query: str) -> List[float]:
+        """Эмбеддинг поискового запроса с LRU кэшем."""
+        with self._embedding_cache_lock:
+            cached = self._embedding_cache.get(query)
+            if cached is not None:
+                self._embedding_cache.move_to_end(query)
+        if cached is not None:
+            CACHE_HITS.labels(cache="embedding").inc()
+            return cached
+        CACHE_MISSES.labels(cache="embedding").inc()
+        
+        embedding = self.embeddings.embed_query(query)
+        self._cache_embedding(query, embedding)
+        return embedding
+    
+    def clear_cache(self) -> None:
+        """Очищает кэш эмбеддингов запросов."""
+        with self._embedding_cache_lock:
+            self._embedding_cache.clear()
+    
+    def close(self) -> None:
+        """Закрывает отображенный в память бандл индекса.
+        
+        Модель эмбеддингов и клиент Chroma общие с другими retriever'ами
+        и не закрываются.
+        """
+        from app.rag.index_bundle import IndexBundle
+
+        if isinstance(self.vectorstore, IndexBundle):
+            self.vectorstore.close()
+    
+    def embed_queries(self, queries: List[str]) -> None:
+        """Эмбеддит запросы одним батчем и кладет их в кэш."""
+        with self._embedding_cache_lock:
+            pending = [query for query in dict.fromkeys(queries) if query not in self._embedding_cache]
+        if not pending:
+            return
+        for query, embedding in zip(pending, self.embeddings.embed_documents(pending)):
+            self._cache_embedding(query, embedding)
+    
+    def search_query(self, query: str, translate: Optional[bool] = None) -> str:
+        """Текст, который эмбеддится при поиске: перевод или сам запрос."""
+        if translate is None:
+            translate = self.mode == "translate"
+        return translator.translate(query) if translate else query
+    
+    def retrieve(self, query: str, top_k: Optional[int] = None, translate: Optional[bool] = None,
+                 adaptive: Optional[bool] = None) -> List[Document]:
+        """Переводит запрос и находит релевантные документы.
+        
+        Args:
+            query: Запрос пользователя
+            top_k: Сколько документов вернуть (по умолчанию settings.top_k)
+            translate: Переводить ли запрос на английский перед поиском
+                (по умолчанию только в режиме translate)
+            adaptive: Обрезать ли выдачу по релевантности (по умолчанию self.adaptive);
+                top_k тогда задает максимум
             
-            return sources
+        Returns:
+            Найденные документы в порядке релевантности
+        """
+        top_k = top_k or self.top_k
+        
+        # Переводим запрос на английский для лучшего поиска
+        search_query = self.search_query(query, translate)
+        check_deadline("query_embedding")
+        
+        # Запрос, называющий страницу документации, обслуживаем по заголовку
+        with stage_timer("title_lookup"):
+            match = self.match_title(search_query, query)
+        
+        if match:
+            TITLE_MATCHES.labels(kind=match["kind"], mode=self.title_index_mode).inc()
+            logger.debug(f"Запрос совпал с заголовком '{match['title']}' ({match['kind']}, {match['score']})")
             
+            if self.title_index_mode == "direct":
+                page_documents = self.get_page_documents(match["page_ids"], top_k)
+                if page_documents:
+                    return page_documents
+        
+        with stage_timer("query_embedding"):
+            query_embedding = self.embed_query(search_query)
+        
+        with stage_timer("vector_search"):
+            documents = self.vector_search(query_embedding, top_k)
+        
+        if self.adaptive if adaptive is None else adaptive:
+            documents = adaptive_cut(
+                documents, settings.adaptive_min_k, settings.adaptive_min_score, settings.adaptive_score_gap
+            )
+        
+        if match and self.title_index_mode == "boost":
+            boosted = self.get_page_documents(match["page_ids"], settings.title_boost_chunks)
+            seen = {(doc.metadata.get("page_id"), doc.metadata.get("chunk_index")) for doc in boosted}
+            rest = [
+                doc for doc in documents
+                if (doc.metadata.get("page_id"), doc.metadata.get("chunk_index")) not in seen
+            ]
+            documents = (boosted + rest)[:top_k]
+        
+        return documents
+    
+    def to_sources(self, documents: List[Document]) -> List[Source]:
+        """Преобразует найденные документы в Source объекты."""
+        return to_sources(documents)
+    
+    def build_context(self, documents: List[Document]) -> str:
+        """Собирает контекст для промпта из найденных документов."""
+        return build_context(documents)
+    
+    def search(self, query: str) -> List[Source]:
+        """Ищет релевантные документы."""
+        try:
+            return self.to_sources(self.retrieve(query))
         except Exception as e:
             logger.error(f"Ошибка поиска: {e}")
+            ERRORS.labels(stage="retrieval").inc()
             return []
     
     def get_context(self, query: str) -> str:
         """Получает контекст из найденных документов."""
         try:
-            # Переводим запрос на английский для лучшего поиска
-            translated_query = translator.translate(query)
-            documents = self.retriever.get_relevant_documents(translated_query)
-            
-            if not documents:
-                return ""
-            
-            context_parts = []
-            for i, doc in enumerate(documents, 1):
-                metadata = doc.metadata
-                title = metadata.get("title", f"Document {i}")
-                content = doc.page_content
-                
-                # Ограничиваем длину контента для лучшего качества
-                if len(content) > 1000:
-                    content = content[:1000] + "..."
-                
-                context_parts.append(f"=== ДОКУМЕНТ {i}: {title} ===\n{content}\n")
-            
-            return "\n".join(context_parts)
-            
+            return self.build_context(self.retrieve(query))
         except Exception as e:
             logger.error(f"Ошибка получения контекста: {e}")
+            ERRORS.labels(stage="retrieval").inc()
             return ""
     
-
+    def ping_embeddings(self) -> Dict:
+        """Проверяет, что модель эмбеддингов загружена (без инференса)."""
+        if self.embeddings is None:
+            return {"healthy": False, "message": "Модель эмбеддингов не загружена"}
+        return {"healthy": True, "message": f"Модель {self.embedding_model_name} загружена"}
     
-    def health_check(self) -> bool:
-        """Проверка здоровья retriever."""
+    def ping_vectorstore(self) -> Dict:
+        """Проверяет коллекцию по числу документов (без поиска)."""
         try:
-            # Простой тест поиска
-            test_results = self.search("test")
-            return True
+            count = self.count_documents()
         except Exception as e:
-            logger.error(f"Retriever не здоров: {e}")
-            return False 
\ No newline at end of file
+            return {"healthy": False, "message": f"Коллекция недоступна: {e}"}
+        
+        if count == 0:
+            return {"healthy": False, "message": f"Коллекция {self.collection_name} пуста"}
+        
+        return {"healthy": True, "message": f"В коллекции {self.collection_name}: {count} документов"}
+    
+    def memory_usage(self, include_model: bool = True) -> Dict[str, Dict]:
+        """Память модели эмбеддингов, кэша запросов и индексов коллекции.
+        
+        Args:
+            include_model: Учитывать модель эмбеддингов и общую матрицу
+                векторов (они общие у retriever'ов версий и считаются один раз)
+        """
+        prefix = f"retriever.{self.version}.{self.lang}"
+        components = {}
+        if include_model and self.embeddings is not None:
+            # SentenceTransformer внутри обертки LangChain
+            model = getattr(self.embeddings, "_client", None)
+            components["embeddings.model"] = usage("model", tensor_bytes(model))
+        with self._embedding_cache_lock:
+            components[f"{prefix}.embedding_cache"] = usage(
+                "cache", deep_sizeof(self._embedding_cache), entries=len(self._embedding_cache)
+            )
+        components[f"{prefix}.vectorstore"] = self._vectorstore_memory()
+        if self.title_index is not None:
+            components[f"{prefix}.title_index"] = usage(
+                "index", deep_sizeof(self.title_index), entries=len(self.title_index)
+            )
+        if self.quantized_store is not None:
+            components[f"{prefix}.quantized_store"] = self.quantized_store.memory_usage()
+        if include_model and self.shared_vectors is not None:
+            components["shared_vectors"] = self.shared_vectors.memory_usage()
+        return components
+    
+    def _vectorstore_memory(self) -> Dict:
+        """Память векторного хранилища.
+        
+        Chroma держит индекс HNSW коллекции в памяти процесса целиком,
+        поэтому его размер оценивается по числу векторов: float32 вектор
+        и 2*M связей нижнего слоя графа на каждый.
+        """
+        if not hasattr(self.vectorstore, "_collection"):
+            # Бандл индекса
+            return self.vectorstore.memory_usage()
+        
+        metadata = self.vectorstore._collection.metadata or {}
+        per_vector = self._embedding_dimension() * 4 + 2 * int(metadata.get("hnsw:M", settings.hnsw_m)) * 4
+        # С квантованным хранилищем граф HNSW чанков не загружается
+        count = 0 if self.quantized_store is not None else self.count_documents()
+        if self.pages_collection is not None:
+            count += self.pages_collection.count()
+        return usage("index", count * per_vector, entries=count)
+    
+    def _embedding_dimension(self) -> int:
+        try:
+            return int(self.embeddings._client.get_sentence_embedding_dimension() or 0)
+        except Exception:
+            return 0
+    
+    def health_check(self) -> bool:
+        """Проверка здоровья retriever."""
+        for status in (self.ping_embeddings(), self.ping_vectorstore()):
+            if not status["healthy"]:
+                logger.error(f"Retriever не здоров: {status['message']}")
+                return False
+        return True
+
+
+
+class VersionedRetriever:
+    """Retriever'ы всех версий и языков документации с маршрутизацией запросов.
+    
+    Коллекции (версия, язык) открываются одновременно, но модель эмбеддингов
+    и клиент Chroma у них общие, поэтому каждая новая версия добавляет в
+    память только свой индекс, а не еще одну модель. С VECTOR_STORE=quantized
+    общая у версий и матрица векторов: совпадающий текст хранится в ней
+    один раз, а версия добавляет только id и номера строк своих чанков.
+    """
+    
+    def __init__(self, mode: Optional[str] = None, versions: Optional[List[str]] = None,
+                 languages: Optional[List[str]] = None,
+                 embeddings: Optional["HuggingFaceEmbeddings"] = None,
+                 collections: Optional[Dict[str, str]] = None):
+        self.mode = mode or settings.retrieval_mode
+        self.default_key = (settings.moodle_version, settings.moodle_lang)
+        self.retrievers: Dict[tuple, LangChainRetriever] = {}
+        # Логический индекс -> сборка вместо активной в реестре (проверка сборки до активации)
+        collections = collections or {}
+        
+        # Retriever по умолчанию загружает модель (если она не передана) и клиент для остальных
+        self.default = LangChainRetriever(
+            collection_name=collections.get(settings.collection_name_for(self.mode)),
+            mode=self.mode, embeddings=embeddings
+        )
+        self.retrievers[self.default_key] = self.default
+        
+        for version in versions or settings.doc_versions:
+            for lang in languages or settings.doc_languages:
+                if (version, lang) in self.retrievers:
+                    continue
+                retriever = LangChainRetriever(
+                    collection_name=collections.get(settings.collection_name_for(self.mode, version, lang)),
+                    mode=self.mode, version=version, lang=lang,
+                    embeddings=self.default.embeddings, client=self.default.client,
+                    shared_vectors=self.default.shared_vectors
+                )
+                if not retriever.ping_vectorstore()["healthy"]:
+                    logger.warning(f"Коллекция {retriever.collection_name} пуста, версия {version}/{lang} недоступна")
+                    continue
+                self.retrievers[(version, lang)] = retriever
+        
+        logger.info(f"Доступные версии документации: {', '.join(f'{v}/{l}' for v, l in self.retrievers)}")
+    
+    @property
+    def collections(self) -> Dict[str, str]:
+        """Логический индекс -> активная физическая коллекция."""
+        return {retriever.index_name: retriever.collection_name for retriever in self.retrievers.values()}
+    
+    @property
+    def versions(self) -> List[str]:
+        return sorted({version for version, _ in self.retrievers})
+    
+    def get(self, version: Optional[str] = None, lang: Optional[str] = None) -> LangChainRetriever:
+        """Retriever версии; неизвестная версия обслуживается версией по умолчанию."""
+        key = (version or self.default_key[0], lang or self.default_key[1])
+        retriever = self.retrievers.get(key)
+        if retriever is None:
+            logger.warning(f"Версия документации {key[0]}/{key[1]} не загружена, используем {self.default_key[0]}")
+            return self.default
+        return retriever
+    
+    def retrieve(self, query: str, top_k: Optional[int] = None, translate: Optional[bool] = None,
+                 version: Optional[str] = None, lang: Optional[str] = None,
+                 adaptive: Optional[bool] = None) -> List[Document]:
+        """Поиск в коллекции нужной версии."""
+        return self.get(version, lang).retrieve(query, top_k=top_k, translate=translate, adaptive=adaptive)
+    
+    def to_sources(self, documents: List[Document]) -> List[Source]:
+        return self.default.to_sources(documents)
+    
+    def build_context(self, documents: List[Document]) -> str:
+        return self.default.build_context(documents)
+    
+    def ping_embeddings(self) -> Dict:
+        return self.default.ping_embeddings()
+    
+    def clear_cache(self) -> None:
+        """Очищает кэши эмбеддингов запросов всех версий."""
+        for retriever in self.retrievers.values():
+            retriever.clear_cache()
+    
+    def close(self) -> None:
+        """Закрывает бандлы индексов всех версий."""
+        for retriever in self.retrievers.values():
+            retriever.close()
+    
+    def memory_usage(self) -> Dict[str, Dict]:
+        """Память всех версий; общая модель эмбеддингов учитывается один раз."""
+        components = {}
+        for retriever in self.retrievers.values():
+            components.update(retriever.memory_usage(include_model=retriever is self.default))
+        return components
+    
+    def ping_vectorstore(self) -> Dict:
+        """Проверяет коллекции всех загруженных версий."""
+        statuses = {key: retriever.ping_vectorstore() for key, retriever in self.retrievers.items()}
+        healthy = all(status["healthy"] for status in statuses.values())
+        return {"healthy": healthy, "message": "; ".join(status["message"] for status in statuses.values())}
+    
+    def health_check(self) -> bool:
+        """Проверка здоровья всех версий."""
+        return self.ping_embeddings()["healthy"] and self.ping_vectorstore()["healthy"]
@@ -0,0 +1,147 @@
+"""Индекс заголовков страниц для быстрого поиска по названию."""
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Set
+
+# Вопросительные обороты, которые не входят в название страницы
+QUESTION_PREFIXES = (
+    "how do i", "how can i", "how to", "how do you", "what is", "what are", "where is",
+    "where are", "where can i find", "tell me about", "explain", "help with",
+)
+STOP_WORDS = {"a", "an", "the", "in", "moodle", "please", "my"}
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+
+
+def normalize(text: str) -> str:
+    """Нормализует заголовок или запрос для сравнения.
+
+    Нижний регистр, без пунктуации, вопросительных оборотов и артиклей:
+    "How to create a course in Moodle?" -> "create course".
+    """
+    text = _PUNCTUATION.sub(" ", text.replace("_", " ").lower())
+    text = " ".join(text.split())
+
+    for prefix in QUESTION_PREFIXES:
+        if text.startswith(prefix + " "):
+            text = text[len(prefix) + 1:]
+            break
+
+    return " ".join(word for word in text.split() if word not in STOP_WORDS)
+
+
+def trigrams(text: str) -> Set[str]:
+    """Символьные триграммы строки с отступами по краям."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _TrieNode:
+    __slots__ = ("children", "keys")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.keys: Set[str] = set()
+
+
+class TitleIndex:
+    """Точное, префиксное и нечеткое сопоставление запроса с заголовками.
+
+    Ключ индекса — нормализованный заголовок; он указывает на канонический
+    заголовок и список page_id. Алиасы (редиректы, варианты написания)
+    добавляются как дополнительные ключи того же заголовка.
+    """
+
+    def __init__(self, fuzzy_threshold: float = 0.8, min_prefix_length: int = 4):
+        self.fuzzy_threshold = fuzzy_threshold
+        self.min_prefix_length = min_prefix_length
+        self._titles: Dict[str, str] = {}
+        self._pages: Dict[str, List[str]] = defaultdict(list)
+        self._trie = _TrieNode()
+        self._trigram_index: Dict[str, Set[str]] = defaultdict(set)
+        self._trigram_counts: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._titles)
+
+    def add(self, title: str, page_id: str) -> None:
+        """Добавляет страницу под ее заголовком."""
+        self._add_key(normalize(title), title, page_id)
+
+    def add_alias(self, alias: str, title: str) -> None:
+        """Добавляет альтернативное название существующей страницы."""
+        canonical_key = normalize(title)
+        if canonical_key not in self._titles:
+            return
+        for page_id in self._pages[canonical_key]:
+            self._add_key(normalize(alias), self._titles[canonical_key], page_id)
+
+    def _add_key(self, key: str, title: str, page_id: str) -> None:
+        if not key:
+            return
+
+        if key not in self._titles:
+            self._titles[key] = title
+            node = self._trie
+            for char in key:
+                node = node.children.setdefault(char, _TrieNode())
+                node.keys.add(key)
+            key_trigrams = trigrams(key)
+            self._trigram_counts[key] = len(key_trigrams)
+            for trigram in key_trigrams:
+                self._trigram_index[trigram].add(key)
+
+        if page_id not in self._pages[key]:
+            self._pages[key].append(page_id)
+
+    def _result(self, key: str, kind: str, score: float) -> Dict:
+        return {
+            "title": self._titles[key],
+            "page_ids": list(self._pages[key]),
+            "kind": kind,
+            "score": round(score, 4),
+        }
+
+    def lookup(self, query: str) -> Optional[Dict]:
+        """Ищет страницу, названную в запросе.
+
+        Returns:
+            Словарь (title, page_ids, kind, score) или None. kind — exact,
+            prefix или fuzzy; score — уверенность от 0 до 1.
+        """
+        key = normalize(query)
+        if not key:
+            return None
+
+        # Точное совпадение
+        if key in self._titles:
+            return self._result(key, "exact", 1.0)
+
+        # Префикс, однозначно продолжающийся до одного заголовка
+        if len(key) >= self.min_prefix_length:
+            node = self._trie
+            for char in key:
+                node = node.children.get(char)
+                if node is None:
+                    break
+            else:
+                if len(node.keys) == 1:
+                    match = next(iter(node.keys))
+                    return self._result(match, "prefix", 0.9 * len(key) / len(match) + 0.1)
+
+        # Нечеткое совпадение по триграммам (коэффициент Дайса)
+        query_trigrams = trigrams(key)
+        shared = Counter()
+        for trigram in query_trigrams:
+            shared.update(self._trigram_index.get(trigram, ()))
+
+        best_key, best_score = None, 0.0
+        for candidate, count in shared.items():
+            score = 2 * count / (len(query_trigrams) + self._trigram_counts[candidate])
+            if score > best_score:
+                best_key, best_score = candidate, score
+
+        if best_key is not None and best_score >= self.fuzzy_threshold:
+            return self._result(best_key, "fuzzy", best_score)
+
+        return None
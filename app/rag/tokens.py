@@ -0,0 +1,121 @@
+"""Учет токенов промпта и ответа LLM."""
+import math
+import statistics
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import LLM_TOKENS, add_request_tokens, observe_stage
+from app.core.model_store import model_load_timer, resolve_model
+
+# Секции промпта в порядке следования (см. prompt_sections)
+SECTIONS = ("system", "context", "history", "question")
+
+# Длительности из ответа Ollama (наносекунды) -> стадии пайплайна
+OLLAMA_DURATIONS = {
+    "load_duration": "ollama_load",
+    "prompt_eval_duration": "ollama_prompt_eval",
+    "eval_duration": "ollama_eval",
+}
+
+
+def ollama_usage(metadata: Dict) -> Dict[str, int]:
+    """Токены промпта и ответа из метаданных последнего фрагмента ответа Ollama.
+
+    prompt_eval_count не включает префикс промпта, который Ollama взяла из
+    KV-кэша предыдущего запроса, поэтому он может быть меньше длины промпта.
+    """
+    usage = metadata.get("usage_metadata") or {}
+    return {
+        "prompt": int(metadata.get("prompt_eval_count") or usage.get("input_tokens") or 0),
+        "completion": int(metadata.get("eval_count") or usage.get("output_tokens") or 0),
+    }
+
+
+def record_ollama_usage(metadata: Dict) -> Dict[str, int]:
+    """Записывает токены и длительности ответа Ollama в метрики и учет запроса."""
+    usage = ollama_usage(metadata)
+    for kind, value in usage.items():
+        LLM_TOKENS.labels(kind=kind).inc(value)
+    for key, stage in OLLAMA_DURATIONS.items():
+        if metadata.get(key):
+            observe_stage(stage, metadata[key] / 1e9)
+    add_request_tokens(**usage)
+    return usage
+
+
+class TokenCounter:
+    """Считает токены текста токенизатором модели LLM.
+
+    Токенизатор загружается при первом подсчете и только с диска: из
+    бандла models_dir или кэша Hugging Face, сервис его не скачивает.
+    Если он не задан или недоступен, число токенов оценивается по числу
+    символов (`chars_per_token`).
+    """
+
+    def __init__(self, model_name: Optional[str] = None):
+        self.model_name = settings.llm_tokenizer if model_name is None else model_name
+        self._tokenizer = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self) -> None:
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if not self.model_name:
+                return
+            try:
+                from transformers import AutoTokenizer
+
+                with model_load_timer("tokenizer", self.model_name):
+                    self._tokenizer = AutoTokenizer.from_pretrained(
+                        resolve_model(self.model_name), local_files_only=True
+                    )
+            except Exception as e:
+                logger.warning(
+                    f"Токенизатора {self.model_name} нет локально (make fetch-models), "
+                    f"токены оцениваются по символам: {e}"
+                )
+
+    @property
+    def exact(self) -> bool:
+        """Подсчет идет токенизатором модели, а не оценкой по символам."""
+        self._load()
+        return self._tokenizer is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        self._load()
+        if self._tokenizer is None:
+            return math.ceil(len(text) / settings.chars_per_token)
+        return len(self._tokenizer.encode(text, add_special_tokens=False))
+
+
+def section_tokens(sections: Dict[str, str], counter: TokenCounter) -> Dict[str, int]:
+    """Токены каждой секции промпта."""
+    return {name: counter.count(sections.get(name, "")) for name in SECTIONS}
+
+
+def median_tokens(rows: List[Dict[str, int]]) -> Dict[str, float]:
+    """Медианы токенов по секциям и всего промпта."""
+    keys = SECTIONS + ("total",)
+    return {key: float(statistics.median(row.get(key, 0) for row in rows)) if rows else 0.0 for key in keys}
+
+
+def median_regressions(current: Dict[str, float], baseline: Dict[str, float],
+                       tolerance: float) -> Dict[str, Tuple[float, float]]:
+    """Секции, медиана которых выросла больше чем на долю tolerance.
+
+    Returns:
+        Секция -> (медиана в baseline, текущая медиана)
+    """
+    regressions = {}
+    for key, value in current.items():
+        base = baseline.get(key)
+        if base is not None and value > base * (1 + tolerance):
+            regressions[key] = (base, value)
+    return regressions
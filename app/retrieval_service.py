@@ -0,0 +1,92 @@
+"""Сервис поиска: общий индекс для воркеров API на нескольких хостах."""
+from typing import Optional
+
+from fastapi import FastAPI, Response
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import render_metrics
+from app.schemas import RetrievedDocument, RetrieveRequest, RetrieveResponse
+
+
+def create_retrieval_app(retriever=None) -> FastAPI:
+    """Создает приложение сервиса поиска.
+
+    Args:
+        retriever: Готовый retriever (в тестах — заглушка); по умолчанию
+            VersionedRetriever создается при старте
+    """
+    app = FastAPI(
+        title="Moodle RAG Retrieval",
+        description="Поиск по документации Moodle для воркеров RAG API",
+        version="0.1.0",
+    )
+    state = {"retriever": retriever}
+
+    def get_retriever():
+        if state["retriever"] is None:
+            from app.rag.retriever import VersionedRetriever
+
+            state["retriever"] = VersionedRetriever()
+        return state["retriever"]
+
+    def search(request: RetrieveRequest) -> RetrieveResponse:
+        retriever = get_retriever()
+        documents = retriever.retrieve(
+            request.query, top_k=request.top_k, translate=request.translate,
+            version=request.version, lang=request.lang, adaptive=request.adaptive
+        )
+        # Перевод уже в кэше; клиенту он нужен для извлекающих ответов
+        search_query = retriever.get(request.version, request.lang).search_query(request.query, request.translate)
+        return RetrieveResponse(
+            documents=[RetrievedDocument(page_content=doc.page_content, metadata=doc.metadata) for doc in documents],
+            search_query=search_query,
+        )
+
+    @app.on_event("startup")
+    async def startup_event():
+        """Загружает модель и индекс до первого запроса."""
+        logger.info("Сервис поиска запускается...")
+        await run_in_threadpool(get_retriever)
+
+    @app.post("/retrieve", response_model=RetrieveResponse)
+    async def retrieve(request: RetrieveRequest) -> RetrieveResponse:
+        """Ищет чанки для запроса."""
+        return await run_in_threadpool(search, request)
+
+    @app.get("/health")
+    async def health() -> dict:
+        """Статус модели эмбеддингов и коллекций."""
+        retriever = get_retriever()
+        return {
+            "embeddings": retriever.ping_embeddings(),
+            "vectorstore": retriever.ping_vectorstore(),
+        }
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics() -> Response:
+        """Метрики Prometheus."""
+        content, media_type = render_metrics()
+        return Response(content=content, media_type=media_type)
+
+    return app
+
+
+app = create_retrieval_app()
+
+
+def main(port: Optional[int] = None):
+    """Запуск сервиса поиска."""
+    import uvicorn
+
+    uvicorn.run(
+        "app.retrieval_service:app",
+        host=settings.host,
+        port=port or settings.retrieval_service_port,
+        log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
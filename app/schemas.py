@@ -1,5 +1,5 @@
 """Схемы данных для API."""
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, Field
 
 
@@ -15,6 +15,12 @@ class ChatRequest(BaseModel):
     """Запрос на чат."""
     session_id: str = Field(..., description="ID сессии")
     message: str = Field(..., description="Сообщение пользователя")
+    version: Optional[str] = Field(
+        default=None,
+        description="Версия Moodle (например 311, 401, 403); по умолчанию settings.moodle_version"
+    )
+    include_timings: bool = Field(default=False, description="Вернуть разбивку времени по стадиям")
+    include_tokens: bool = Field(default=False, description="Вернуть токены промпта по секциям и токены LLM")
 
 
 class ChatResponse(BaseModel):
@@ -22,9 +28,119 @@ class ChatResponse(BaseModel):
     answer: str = Field(..., description="Ответ бота")
     sources: List[Source] = Field(default=[], description="Источники информации")
     session_id: str = Field(..., description="ID сессии")
+    timings: Optional[Dict[str, float]] = Field(
+        default=None,
+        description="Длительность стадий пайплайна в мс (если запрошено)"
+    )
+    tokens: Optional[Dict[str, int]] = Field(
+        default=None,
+        description=(
+            "Токены запроса (если запрошено): секции промпта system, context, history, question; "
+            "prompt и completion по данным Ollama; template — токены шаблона чата модели"
+        )
+    )
+    faq: bool = Field(default=False, description="Ответ взят из заранее сгенерированного FAQ")
+    degraded: bool = Field(
+        default=False,
+        description="LLM была недоступна, ответ собран из выдержек документации"
+    )
 
 
 class HealthResponse(BaseModel):
     """Ответ проверки здоровья."""
     status: str = Field(..., description="Статус системы")
-    message: str = Field(..., description="Сообщение о состоянии") 
\ No newline at end of file
+    message: str = Field(..., description="Сообщение о состоянии") 
+
+
+class ComponentHealth(BaseModel):
+    """Статус отдельного компонента."""
+    name: str = Field(..., description="Название компонента")
+    healthy: bool = Field(..., description="Компонент работает")
+    message: str = Field(default="", description="Детали проверки")
+    checked_at: str = Field(..., description="Время последней проверки (ISO 8601)")
+    latency_ms: float = Field(..., description="Длительность проверки в мс")
+    stale: bool = Field(default=False, description="Результат проверки устарел")
+
+
+class HealthDetailsResponse(BaseModel):
+    """Детальный статус компонентов."""
+    status: str = Field(..., description="Статус системы")
+    components: Dict[str, ComponentHealth] = Field(default={}, description="Статус по компонентам")
+
+
+
+class MemoryComponent(BaseModel):
+    """Оценка памяти компонента."""
+    kind: str = Field(..., description="Тип: model, cache, index или sessions")
+    bytes: int = Field(..., description="Оценка байт в памяти процесса")
+    entries: Optional[int] = Field(default=None, description="Число записей кэша, индекса или сессий")
+    mapped_bytes: int = Field(
+        default=0,
+        description="Байты файлов, отображенных в память (mmap); разделяются воркерами и в bytes не входят"
+    )
+
+
+class TracemallocAllocation(BaseModel):
+    """Место выделения памяти."""
+    location: str = Field(..., description="Файл и строка")
+    size_bytes: int = Field(..., description="Занято байт")
+    count: int = Field(..., description="Число живых блоков")
+
+
+class TracemallocSnapshot(BaseModel):
+    """Снимок tracemalloc."""
+    tracing: bool = Field(..., description="Трассировка выделений включена")
+    traced_bytes: int = Field(default=0, description="Память, выделенная с момента включения")
+    peak_bytes: int = Field(default=0, description="Пик выделенной памяти с момента включения")
+    top: List[TracemallocAllocation] = Field(default=[], description="Крупнейшие места выделения")
+
+
+class MemoryReportResponse(BaseModel):
+    """Отчет о памяти процесса."""
+    rss_bytes: int = Field(..., description="Резидентная память процесса")
+    accounted_bytes: int = Field(..., description="Сумма оценок компонентов")
+    components: Dict[str, MemoryComponent] = Field(default={}, description="Оценка по компонентам")
+    tracemalloc: TracemallocSnapshot = Field(..., description="Состояние и снимок tracemalloc")
+
+
+class TracemallocRequest(BaseModel):
+    """Включение или выключение tracemalloc."""
+    enabled: bool = Field(..., description="Включить (true) или выключить (false) трассировку")
+    frames: Optional[int] = Field(default=None, description="Глубина стека (по умолчанию tracemalloc_frames)")
+
+
+class IndexReloadRequest(BaseModel):
+    """Запрос на переключение индекса."""
+    collection: Optional[str] = Field(
+        default=None,
+        description="Сборка для активации (например moodle_docs__20240101120000); по умолчанию активные из реестра"
+    )
+
+
+class IndexReloadResponse(BaseModel):
+    """Результат переключения индекса."""
+    previous: Dict[str, str] = Field(default={}, description="Индекс -> сборка до переключения")
+    active: Dict[str, str] = Field(default={}, description="Индекс -> сборка после переключения")
+    reload_ms: float = Field(..., description="Длительность перезагрузки в мс")
+
+
+class RetrieveRequest(BaseModel):
+    """Запрос к сервису поиска."""
+    query: str = Field(..., description="Запрос пользователя")
+    top_k: Optional[int] = Field(default=None, description="Сколько документов вернуть")
+    translate: Optional[bool] = Field(default=None, description="Переводить ли запрос перед поиском")
+    version: Optional[str] = Field(default=None, description="Версия Moodle")
+    lang: Optional[str] = Field(default=None, description="Язык документации")
+    adaptive: Optional[bool] = Field(default=None, description="Адаптивный top-k")
+
+
+class RetrievedDocument(BaseModel):
+    """Найденный чанк."""
+    page_content: str = Field(..., description="Текст чанка")
+    metadata: Dict[str, Any] = Field(default={}, description="Метаданные чанка (title, url, score, ...)")
+
+
+class RetrieveResponse(BaseModel):
+    """Ответ сервиса поиска."""
+    documents: List[RetrievedDocument] = Field(default=[], description="Чанки в порядке релевантности")
+    search_query: str = Field(..., description="Текст, по которому искали (перевод запроса)")
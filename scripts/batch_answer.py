@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""Пакетная генерация ответов на частые вопросы для FAQ."""
+import sys
+import pathlib
+
+# Add project root to Python path
+project_root = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.translator import translator
+from app.rag.pipeline import LangChainRAGPipeline
+from app.schemas import ChatRequest
+
+
+def load_questions(path: Path) -> List[Dict]:
+    """Читает вопросы из JSONL: {"id", "question" (или "message"), "version"}."""
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            questions.append({
+                "id": str(item.get("id", line_number)),
+                "question": item.get("question") or item["message"],
+                "version": item.get("version"),
+            })
+    return questions
+
+
+def load_done_ids(path: Path) -> Set[str]:
+    """Id вопросов, уже записанных в выходной файл (чекпоинт)."""
+    if not path.exists():
+        return set()
+    done = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if not record.get("error"):
+                    done.add(record["id"])
+    return done
+
+
+class BatchAnswerer:
+    """Прогоняет вопросы через RAG пайплайн с ограниченной параллельностью.
+
+    Вопросы обрабатываются порциями: перевод и эмбеддинги порции считаются
+    батчами (и попадают в кэши переводчика и retriever'а), затем ответы
+    генерируются в пуле потоков. Каждый ответ сразу дописывается в выходной
+    файл, поэтому прерванный прогон продолжается с места остановки.
+    """
+
+    def __init__(self, pipeline: LangChainRAGPipeline, output_path: Path,
+                 concurrency: int, batch_size: int):
+        self.pipeline = pipeline
+        self.output_path = output_path
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self._write_lock = threading.Lock()
+        self.answered = 0
+        self.failed = 0
+
+    def prepare(self, batch: List[Dict]) -> None:
+        """Переводит и эмбеддит вопросы порции батчами."""
+        texts = [item["question"] for item in batch]
+        if self.pipeline.retriever.mode == "translate":
+            translator.translate_batch(texts)
+
+        by_version: Dict[Optional[str], List[str]] = {}
+        for item in batch:
+            by_version.setdefault(item["version"], []).append(item["question"])
+        for version, questions in by_version.items():
+            retriever = self.pipeline.retriever.get(version)
+            retriever.embed_queries([retriever.search_query(question) for question in questions])
+
+    def answer(self, item: Dict) -> Dict:
+        """Ответ на один вопрос в формате записи FAQ."""
+        session_id = f"batch-{item['id']}"
+        started = time.perf_counter()
+        record = {
+            "id": item["id"],
+            "question": item["question"],
+            "version": item["version"] or settings.moodle_version,
+        }
+        try:
+            response = self.pipeline.answer(ChatRequest(
+                session_id=session_id,
+                message=item["question"],
+                version=item["version"],
+                include_timings=True,
+            ))
+            # Без источников это ответ-заглушка (ошибка поиска или LLM), а не ответ для FAQ
+            if not response.sources:
+                raise RuntimeError("ответ без источников")
+            record.update({
+                "answer": response.answer,
+                "sources": [source.model_dump() for source in response.sources],
+                "timings": response.timings,
+            })
+        except Exception as e:
+            record["error"] = str(e)
+        finally:
+            self.pipeline.memory.clear_session(session_id)
+
+        record["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        self.write(record)
+        return record
+
+    def write(self, record: Dict) -> None:
+        with self._write_lock:
+            with open(self.output_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if record.get("error"):
+                self.failed += 1
+                logger.error(f"Вопрос {record['id']}: {record['error']}")
+            else:
+                self.answered += 1
+
+    def run(self, questions: List[Dict]) -> None:
+        """Отвечает на все вопросы порциями по batch_size."""
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for start in range(0, len(questions), self.batch_size):
+                batch = questions[start:start + self.batch_size]
+                self.prepare(batch)
+                list(executor.map(self.answer, batch))
+                logger.info(f"Обработано {start + len(batch)}/{len(questions)} вопросов")
+
+
+def main(argv: Optional[List[str]] = None):
+    """Точка входа."""
+    parser = argparse.ArgumentParser(description="Пакетная генерация ответов для FAQ")
+    parser.add_argument("--input", type=Path, required=True, help="JSONL с вопросами")
+    parser.add_argument("--output", type=Path, default=settings.faq_path, help="JSONL с ответами")
+    parser.add_argument("--concurrency", type=int, default=settings.llm_max_concurrency,
+                        help="Сколько вопросов обрабатывать одновременно")
+    parser.add_argument("--batch-size", type=int, default=32,
+                        help="Размер порции для пакетного перевода и эмбеддингов")
+    parser.add_argument("--restart", action="store_true", help="Начать заново, игнорируя чекпоинт")
+    args = parser.parse_args(argv)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    if args.restart and args.output.exists():
+        args.output.unlink()
+
+    questions = load_questions(args.input)
+    done = load_done_ids(args.output)
+    pending = [item for item in questions if item["id"] not in done]
+    logger.info(f"Вопросов: {len(questions)}, уже отвечено: {len(questions) - len(pending)}")
+    if not pending:
+        return
+
+    pipeline = LangChainRAGPipeline()
+    status = pipeline.llm.ping()
+    if not pipeline.llm.is_loaded or not status["healthy"]:
+        logger.error(f"LLM недоступна, ответы не будут сгенерированы: {status['message']}")
+        sys.exit(1)
+    # Ответы генерируются заново, а не берутся из существующего FAQ
+    pipeline.faq = None
+
+    answerer = BatchAnswerer(pipeline, args.output, args.concurrency, args.batch_size)
+    started = time.perf_counter()
+    answerer.run(pending)
+
+    logger.info(
+        f"Готово за {time.perf_counter() - started:.1f} с: "
+        f"{answerer.answered} ответов, {answerer.failed} ошибок, результат в {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""Микробенчмарки компонентов горячего пути RAG."""
+import sys
+import pathlib
+
+# Add project root to Python path
+project_root = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import argparse
+import json
+import math
+import platform
+import statistics
+import subprocess
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+
+# Вопросы пользователей для стадий запроса
+BENCH_QUERIES = [
+    "Как создать новый курс в Moodle?",
+    "Как настроить систему оценок в Moodle?",
+    "Как просмотреть журналы активности пользователей?",
+    "How to create a new course in Moodle?",
+    "How to configure the gradebook?",
+    "How to view user activity logs?",
+]
+
+
+class StubLLM:
+    """Заглушка LLM для офлайн прогона пайплайна."""
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        return "1. Откройте курс.\n2. Перейдите в настройки.\n3. Сохраните изменения."
+
+    def complete(self, prompt: str, **kwargs) -> str:
+        return self.generate(prompt)
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Перцентиль по методу ближайшего ранга."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = math.ceil(q / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def measure(name: str, func: Callable[[], object], iterations: int, warmup: int = 3, items: int = 1) -> Dict:
+    """Замеряет функцию и возвращает статистику латентности.
+
+    Args:
+        name: Название бенчмарка
+        func: Замеряемая функция без аргументов
+        iterations: Число замеров
+        warmup: Число прогревочных вызовов
+        items: Сколько элементов обрабатывает один вызов (для пропускной способности)
+
+    Returns:
+        Словарь со статистикой в миллисекундах
+    """
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+
+    total_seconds = sum(samples) / 1000
+    result = {
+        "name": name,
+        "iterations": iterations,
+        "items_per_call": items,
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "p50_ms": round(percentile(samples, 50), 4),
+        "p95_ms": round(percentile(samples, 95), 4),
+        "p99_ms": round(percentile(samples, 99), 4),
+        "throughput_per_s": round(iterations * items / total_seconds, 2) if total_seconds else 0.0,
+    }
+    logger.info(
+        f"{name}: p50={result['p50_ms']:.3f} мс p95={result['p95_ms']:.3f} мс "
+        f"p99={result['p99_ms']:.3f} мс, {result['throughput_per_s']:.1f} эл/с"
+    )
+    return result
+
+
+def load_wiki_pages(limit: int) -> List[str]:
+    """Загружает исходную wiki-разметку страниц из XML экспорта.
+
+    Если экспорта нет, собирает страницы с типичной разметкой из реальных
+    заголовков `moodle_all_pages.txt`.
+    """
+    pages = []
+    ns = {"mw": "http://www.mediawiki.org/xml/export-0.11/"}
+
+    for xml_file in sorted((settings.raw_dir / "xml").glob("*.xml")):
+        for page in ET.parse(xml_file).getroot().findall("mw:page", ns):
+            text_elem = page.find("mw:revision/mw:text", ns)
+            if text_elem is not None and text_elem.text and len(text_elem.text) > 500:
+                pages.append(text_elem.text)
+            if len(pages) >= limit:
+                return pages
+
+    if pages:
+        return pages
+
+    titles_file = settings.raw_dir / "moodle_all_pages.txt"
+    titles = [line.strip() for line in titles_file.read_text(encoding="utf-8").splitlines() if line.strip()]
+    for i in range(limit):
+        title = titles[i % len(titles)]
+        related = titles[(i * 7 + 1) % len(titles)]
+        body = (
+            f"{{{{Template:Docs}}}}\n== {title} ==\n"
+            f"'''{title}''' allows teachers to manage [[{related}|{related.lower()}]] settings. "
+            f"See [https://docs.moodle.org/{settings.moodle_version}/en/{related.replace(' ', '_')} {related}].\n"
+            "=== Settings ===\n"
+            "# Go to ''Site administration'' > ''Plugins''.\n"
+            "# Click <b>Save changes</b>.\n"
+            "{| class=\"wikitable\"\n|-\n| Option || Value\n|}\n"
+            "[[File:screenshot.png|thumb]] [[Category:Administration]]\n"
+        )
+        pages.append(body * 6)
+    return pages
+
+
+def git_commit() -> str:
+    """Текущий коммит для сравнения прогонов."""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=project_root, text=True
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def run_text_benchmarks(pages: List[str], iterations: int) -> List[Dict]:
+    """Очистка текста и разбиение на чанки."""
+    from scripts.chunk_docs import DocumentChunker
+    from scripts.parse_export_xml import clean_wiki_text
+
+    chunker = DocumentChunker()
+    cleaned = [clean_wiki_text(page) for page in pages]
+    results = []
+
+    state = {"i": 0}
+
+    def next_page(source: List[str]) -> str:
+        state["i"] = (state["i"] + 1) % len(source)
+        return source[state["i"]]
+
+    results.append(measure("clean_wiki_text", lambda: clean_wiki_text(next_page(pages)), iterations))
+    results.append(measure("chunker_clean_text", lambda: chunker.clean_text(next_page(cleaned)), iterations))
+    results.append(measure(
+        "text_splitter", lambda: chunker.text_splitter.split_text(next_page(cleaned)), iterations
+    ))
+    return results
+
+
+def run_embedding_benchmarks(pages: List[str], iterations: int, batch_size: int) -> List[Dict]:
+    """Батчевое построение эмбеддингов и одиночный поиск по временной коллекции."""
+    results = []
+    try:
+        import chromadb
+        from sentence_transformers import SentenceTransformer
+
+        from scripts.chunk_docs import DocumentChunker
+        from scripts.parse_export_xml import clean_wiki_text
+
+        model = SentenceTransformer(settings.embedding_model_for(), device="cpu")
+    except Exception as e:
+        logger.warning(f"Пропускаем бенчмарки эмбеддингов: {e}")
+        return results
+
+    chunker = DocumentChunker()
+    chunks = []
+    for page in pages:
+        chunks.extend(chunker.text_splitter.split_text(chunker.clean_text(clean_wiki_text(page))))
+    batch = (chunks * ((batch_size // max(len(chunks), 1)) + 1))[:batch_size]
+
+    results.append(measure(
+        "embed_batch",
+        lambda: model.encode(batch, batch_size=32, show_progress_bar=False, normalize_embeddings=True),
+        max(3, iterations // 20),
+        warmup=1,
+        items=len(batch),
+    ))
+
+    embeddings = model.encode(chunks, batch_size=32, show_progress_bar=False, normalize_embeddings=True)
+    collection = chromadb.EphemeralClient().get_or_create_collection("bench")
+    collection.add(
+        ids=[f"bench_{i}" for i in range(len(chunks))],
+        documents=chunks,
+        embeddings=embeddings.tolist(),
+    )
+
+    state = {"i": 0}
+
+    def search_once():
+        state["i"] = (state["i"] + 1) % len(BENCH_QUERIES)
+        vector = model.encode(BENCH_QUERIES[state["i"]], normalize_embeddings=True)
+        collection.query(query_embeddings=[vector.tolist()], n_results=settings.top_k)
+
+    results.append(measure("single_query_retrieval", search_once, iterations))
+    return results
+
+
+def run_translation_benchmarks(iterations: int) -> List[Dict]:
+    """Перевод моделью и словарным fallback."""
+    from app.core.glossary import glossary
+    from app.core.translator import QueryTranslator
+
+    results = []
+    russian = [query for query in BENCH_QUERIES if any(ord(char) > 127 for char in query)]
+    translator = QueryTranslator()
+    state = {"i": 0}
+
+    def next_query() -> str:
+        state["i"] = (state["i"] + 1) % len(russian)
+        return russian[state["i"]]
+
+    results.append(measure(
+        "translate_fallback", lambda: translator._fallback_translate(next_query()), iterations
+    ))
+    results.append(measure("glossary_annotate", lambda: glossary.annotate(next_query()), iterations))
+
+    translator._initialize_model()
+    if translator._is_initialized:
+        # Замеряем саму модель, минуя кэш переводов и глоссарий
+        results.append(measure(
+            "translate_model", lambda: translator._translate_model(next_query()), max(5, iterations // 20)
+        ))
+    else:
+        logger.warning("Пропускаем бенчмарк модели перевода: модель недоступна")
+
+    return results
+
+
+def run_prompt_and_memory_benchmarks(pages: List[str], iterations: int) -> List[Dict]:
+    """Построение промпта и операции памяти диалогов."""
+    from langchain_core.documents import Document
+
+    from app.rag.extractive import extractive_answer
+    from app.rag.memory import ConversationMemory
+    from app.rag.prompts import build_prompt
+    from scripts.parse_export_xml import clean_wiki_text
+
+    context = "\n".join(
+        f"=== ДОКУМЕНТ {i}: Page {i} ===\n{clean_wiki_text(page)[:1000]}...\n"
+        for i, page in enumerate(pages[:settings.top_k], 1)
+    )
+    documents = [
+        Document(page_content=clean_wiki_text(page), metadata={"title": f"Page {i}", "score": 0.8 - i * 0.05})
+        for i, page in enumerate(pages[:settings.top_k])
+    ]
+    memory = ConversationMemory()
+    for i in range(200):
+        for turn in range(10):
+            memory.add_message(f"session_{i}", "user", BENCH_QUERIES[turn % len(BENCH_QUERIES)])
+            memory.add_message(f"session_{i}", "assistant", StubLLM().generate(""))
+    history = memory.get_history("session_0")
+
+    state = {"i": 0}
+
+    def add_message():
+        state["i"] = (state["i"] + 1) % 200
+        memory.add_message(f"session_{state['i']}", "user", BENCH_QUERIES[0])
+
+    return [
+        measure("build_prompt", lambda: build_prompt(BENCH_QUERIES[0], context, history), iterations),
+        measure("extractive_answer", lambda: extractive_answer(BENCH_QUERIES[3], documents), iterations),
+        measure("memory_add_message", add_message, iterations),
+        measure("memory_get_history", lambda: memory.get_history("session_1"), iterations),
+        measure("memory_cleanup_expired", memory.cleanup_expired_sessions, max(10, iterations // 10)),
+    ]
+
+
+def run_pipeline_benchmark(iterations: int) -> List[Dict]:
+    """Полный пайплайн с заглушкой LLM (нужна собранная коллекция)."""
+    try:
+        from app.rag.pipeline import LangChainRAGPipeline
+        from app.schemas import ChatRequest
+
+        pipeline = LangChainRAGPipeline()
+        if not pipeline.retriever.ping_vectorstore()["healthy"]:
+            raise RuntimeError("коллекция пуста")
+    except Exception as e:
+        logger.warning(f"Пропускаем бенчмарк пайплайна: {e}")
+        return []
+
+    pipeline.llm = StubLLM()
+    state = {"i": 0}
+
+    def answer_once():
+        state["i"] = (state["i"] + 1) % len(BENCH_QUERIES)
+        pipeline.answer(ChatRequest(session_id="bench", message=BENCH_QUERIES[state["i"]]))
+
+    return [measure("pipeline_answer_stub_llm", answer_once, max(5, iterations // 10))]
+
+
+def compare(baseline_path: Path, candidate_path: Path) -> None:
+    """Печатает сравнение двух прогонов по p50/p95."""
+    baseline = {item["name"]: item for item in json.loads(baseline_path.read_text())["results"]}
+    candidate = {item["name"]: item for item in json.loads(candidate_path.read_text())["results"]}
+
+    print(f"{'benchmark':<28}{'p50 base':>12}{'p50 new':>12}{'Δ p50':>9}{'p95 base':>12}{'p95 new':>12}{'Δ p95':>9}")
+    for name in sorted(set(baseline) | set(candidate)):
+        if name not in baseline or name not in candidate:
+            print(f"{name:<28}{'только в одном прогоне':>78}")
+            continue
+        old, new = baseline[name], candidate[name]
+        delta_p50 = (new["p50_ms"] / old["p50_ms"] - 1) * 100 if old["p50_ms"] else 0.0
+        delta_p95 = (new["p95_ms"] / old["p95_ms"] - 1) * 100 if old["p95_ms"] else 0.0
+        print(
+            f"{name:<28}{old['p50_ms']:>12.3f}{new['p50_ms']:>12.3f}{delta_p50:>+8.1f}%"
+            f"{old['p95_ms']:>12.3f}{new['p95_ms']:>12.3f}{delta_p95:>+8.1f}%"
+        )
+
+
+def main(argv: Optional[List[str]] = None):
+    """Точка входа."""
+    parser = argparse.ArgumentParser(description="Микробенчмарки RAG компонентов")
+    parser.add_argument("--iterations", type=int, default=200, help="Число замеров быстрых стадий")
+    parser.add_argument("--pages", type=int, default=50, help="Сколько страниц использовать")
+    parser.add_argument("--batch-size", type=int, default=256, help="Размер батча эмбеддингов")
+    parser.add_argument("--only", nargs="*", default=None,
+                        help="Группы: text, embeddings, translation, prompt, pipeline")
+    parser.add_argument("--output", type=Path, default=None, help="Куда сохранить JSON результатов")
+    parser.add_argument("--compare", nargs=2, type=Path, metavar=("BASE", "NEW"),
+                        help="Сравнить два JSON файла результатов")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    groups = set(args.only or ["text", "embeddings", "translation", "prompt", "pipeline"])
+    pages = load_wiki_pages(args.pages)
+    logger.info(f"Бенчмарки на {len(pages)} страницах, группы: {', '.join(sorted(groups))}")
+
+    results = []
+    if "text" in groups:
+        results.extend(run_text_benchmarks(pages, args.iterations))
+    if "embeddings" in groups:
+        results.extend(run_embedding_benchmarks(pages, args.iterations, args.batch_size))
+    if "translation" in groups:
+        results.extend(run_translation_benchmarks(args.iterations))
+    if "prompt" in groups:
+        results.extend(run_prompt_and_memory_benchmarks(pages, args.iterations))
+    if "pipeline" in groups:
+        results.extend(run_pipeline_benchmark(args.iterations))
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+    output = args.output or settings.data_dir / "bench" / f"bench_{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    logger.info(f"Результаты сохранены в {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,24 +7,38 @@ import pathlib
 project_root = pathlib.Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+import argparse
 import json
 import re
+from collections import defaultdict
+from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from tqdm import tqdm
 
 from app.core.config import settings
 from app.core.logger import logger
+from app.rag.dedup import find_near_duplicates
+
+# Сколько пар дубликат -> оригинал с разных страниц показывать в отчете
+REPORT_EXAMPLES = 20
 
 
 class DocumentChunker:
     """Класс для разбиения документов на чанки."""
     
-    def __init__(self, input_path: Path = None, output_path: Path = None):
-        self.input_path = input_path or settings.raw_dir / "moodle_docs.jsonl"
-        self.output_path = output_path or settings.chunks_dir / "moodle_chunks.jsonl"
+    def __init__(self, input_path: Path = None, output_path: Path = None,
+                 version: str = None, lang: str = None, dedup: Optional[bool] = None,
+                 dedup_threshold: Optional[float] = None):
+        self.dedup = settings.dedup_chunks if dedup is None else dedup
+        self.dedup_threshold = dedup_threshold or settings.dedup_threshold
+        self.version = version or settings.moodle_version
+        self.lang = lang or settings.moodle_lang
+        suffix = settings.docs_suffix(self.version, self.lang)
+        self.input_path = input_path or settings.raw_dir / f"moodle_docs{suffix}.jsonl"
+        self.output_path = output_path or settings.chunks_dir / f"moodle_chunks{suffix}.jsonl"
         
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=settings.chunk_size,
@@ -104,7 +118,11 @@ class DocumentChunker:
                     "url": doc["url"],
                     "text": chunk_text.strip(),
                     "chunk_index": i,
-                    "total_chunks": len(text_chunks)
+                    "total_chunks": len(text_chunks),
+                    "version": doc.get("version", self.version),
+                    "lang": doc.get("lang", self.lang),
+                    # Заголовки редиректов; метаданные Chroma — скаляры, поэтому строкой через "|"
+                    "aliases": "|".join(doc.get("aliases", []))
                 }
                 chunks.append(chunk)
                 chunk_id += 1
@@ -112,6 +130,77 @@ class DocumentChunker:
         logger.info(f"Создано {len(chunks)} чанков")
         return chunks
     
+    def deduplicate(self, chunks: List[Dict]) -> Tuple[List[Dict], Dict]:
+        """Удаляет почти одинаковые чанки (MinHash + LSH) и считает, насколько уменьшился индекс.
+        
+        Остается первый чанк в порядке страниц. Страница, все чанки которой
+        оказались копиями, становится алиасом страницы оригинала, чтобы поиск
+        по ее заголовку продолжал работать.
+        """
+        duplicates = find_near_duplicates(
+            [chunk["text"] for chunk in chunks],
+            threshold=self.dedup_threshold,
+            shingle_size=settings.dedup_shingle_size,
+            num_perm=settings.dedup_num_perm,
+        )
+        kept = [chunk for index, chunk in enumerate(chunks) if index not in duplicates]
+        kept_pages = {chunk["page_id"] for chunk in kept}
+        
+        absorbed: Dict[str, str] = {}
+        new_aliases = defaultdict(list)
+        examples = []
+        for index, original in duplicates.items():
+            duplicate_chunk, original_chunk = chunks[index], chunks[original]
+            if duplicate_chunk["page_id"] == original_chunk["page_id"]:
+                continue
+            if len(examples) < REPORT_EXAMPLES:
+                examples.append({"duplicate": duplicate_chunk["chunk_id"], "duplicate_title": duplicate_chunk["title"],
+                                 "original": original_chunk["chunk_id"], "original_title": original_chunk["title"]})
+            page_id = duplicate_chunk["page_id"]
+            if page_id not in kept_pages and page_id not in absorbed:
+                absorbed[page_id] = original_chunk["page_id"]
+                new_aliases[original_chunk["page_id"]].append(duplicate_chunk["title"])
+                new_aliases[original_chunk["page_id"]].extend(
+                    alias for alias in duplicate_chunk["aliases"].split("|") if alias
+                )
+        
+        for chunk in kept:
+            if chunk["page_id"] in new_aliases:
+                aliases = [alias for alias in chunk["aliases"].split("|") if alias]
+                chunk["aliases"] = "|".join(dict.fromkeys(aliases + new_aliases[chunk["page_id"]]))
+        
+        chars_before = sum(len(chunk["text"]) for chunk in chunks)
+        chars_after = sum(len(chunk["text"]) for chunk in kept)
+        report = {
+            "created_at": datetime.now().isoformat(),
+            "threshold": self.dedup_threshold,
+            "shingle_size": settings.dedup_shingle_size,
+            "num_perm": settings.dedup_num_perm,
+            "chunks_before": len(chunks),
+            "chunks_after": len(kept),
+            "chunks_removed": len(duplicates),
+            "chars_before": chars_before,
+            "chars_after": chars_after,
+            "shrink_ratio": round(1 - chars_after / chars_before, 4) if chars_before else 0.0,
+            "pages_before": len({chunk["page_id"] for chunk in chunks}),
+            "pages_after": len(kept_pages),
+            "pages_absorbed": len(absorbed),
+            "examples": examples,
+        }
+        logger.info(
+            f"Дубликаты: удалено {len(duplicates)} из {len(chunks)} чанков "
+            f"({report['shrink_ratio']:.1%} текста), {len(absorbed)} страниц стали алиасами"
+        )
+        return kept, report
+    
+    def save_report(self, report: Dict) -> Path:
+        """Сохраняет отчет об удалении дубликатов рядом с чанками."""
+        path = self.output_path.with_name(f"{self.output_path.stem}_dedup.json")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        logger.info(f"Отчет об удалении дубликатов: {path}")
+        return path
+    
     def save_chunks(self, chunks: List[Dict]) -> None:
         """Сохраняет чанки в JSONL файл."""
         self.output_path.parent.mkdir(parents=True, exist_ok=True)
@@ -131,6 +220,9 @@ class DocumentChunker:
         try:
             documents = self.load_documents()
             chunks = self.create_chunks(documents)
+            if self.dedup:
+                chunks, report = self.deduplicate(chunks)
+                self.save_report(report)
             self.save_chunks(chunks)
             
             logger.info("Разбиение на чанки завершено успешно")
@@ -142,7 +234,17 @@ class DocumentChunker:
 
 def main():
     """Точка входа."""
-    chunker = DocumentChunker()
+    parser = argparse.ArgumentParser(description="Разбиение документов на чанки")
+    parser.add_argument("--version", default=None, help="Версия Moodle (по умолчанию settings.moodle_version)")
+    parser.add_argument("--lang", default=None, help="Язык документации")
+    parser.add_argument("--no-dedup", action="store_true", help="Не удалять почти одинаковые чанки")
+    parser.add_argument("--dedup-threshold", type=float, default=None,
+                        help="Порог коэффициента Жаккара (по умолчанию settings.dedup_threshold)")
+    args = parser.parse_args()
+    
+    chunker = DocumentChunker(version=args.version, lang=args.lang,
+                              dedup=False if args.no_dedup else None,
+                              dedup_threshold=args.dedup_threshold)
     chunker.run()
 
 
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""Оценка качества и скорости поиска на золотом наборе вопросов."""
+import sys
+import pathlib
+
+# Add project root to Python path
+project_root = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import argparse
+import itertools
+import json
+import math
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+
+
+def normalize_title(title: str) -> str:
+    """Нормализует заголовок страницы для сравнения."""
+    return " ".join(title.replace("_", " ").split()).lower()
+
+
+def rank_pages(documents) -> List[str]:
+    """Список уникальных страниц в порядке первого появления."""
+    pages = []
+    for doc in documents:
+        title = normalize_title(doc.metadata.get("title", ""))
+        if title and title not in pages:
+            pages.append(title)
+    return pages
+
+
+def recall_at_k(ranked: List[str], relevant: Dict[str, int], k: int) -> float:
+    """Доля релевантных страниц, попавших в top-k."""
+    if not relevant:
+        return 0.0
+    found = sum(1 for page in ranked[:k] if page in relevant)
+    return found / len(relevant)
+
+
+def reciprocal_rank(ranked: List[str], relevant: Dict[str, int]) -> float:
+    """Обратный ранг первой релевантной страницы."""
+    for position, page in enumerate(ranked, 1):
+        if page in relevant:
+            return 1.0 / position
+    return 0.0
+
+
+def ndcg_at_k(ranked: List[str], relevant: Dict[str, int], k: int) -> float:
+    """nDCG@k с градуированной релевантностью из золотого набора."""
+    dcg = sum(
+        (2 ** relevant.get(page, 0) - 1) / math.log2(position + 1)
+        for position, page in enumerate(ranked[:k], 1)
+    )
+    ideal = sorted(relevant.values(), reverse=True)[:k]
+    idcg = sum((2 ** gain - 1) / math.log2(position + 1) for position, gain in enumerate(ideal, 1))
+    return dcg / idcg if idcg else 0.0
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Перцентиль по методу ближайшего ранга."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = math.ceil(q / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+class RetrievalEvaluator:
+    """Прогоняет золотой набор через разные конфигурации retriever."""
+
+    def __init__(self, gold_path: Path = None):
+        self.gold_path = gold_path or settings.data_dir / "eval" / "gold_set.jsonl"
+        self._retrievers = {}
+        self._reranker = None
+
+    def load_gold_set(self) -> List[Dict]:
+        """Загружает вопросы и ожидаемые страницы."""
+        if not self.gold_path.exists():
+            raise FileNotFoundError(f"Файл {self.gold_path} не найден")
+
+        items = []
+        with open(self.gold_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    item["relevant"] = {
+                        normalize_title(title): gain for title, gain in item["relevant"].items()
+                    }
+                    items.append(item)
+
+        logger.info(f"Загружено {len(items)} вопросов из {self.gold_path}")
+        return items
+
+    def get_retriever(self, collection_name: Optional[str], mode: str):
+        """Retriever для режима и коллекции (по одной коллекции на вариант чанкинга)."""
+        key = (collection_name, mode)
+        if key not in self._retrievers:
+            from app.rag.retriever import LangChainRetriever
+
+            self._retrievers[key] = LangChainRetriever(collection_name=collection_name, mode=mode)
+        return self._retrievers[key]
+
+    def get_reranker(self):
+        """Cross-encoder для переранжирования кандидатов."""
+        if self._reranker is None:
+            from sentence_transformers import CrossEncoder
+
+            from app.core.model_store import model_load_timer, resolve_model
+
+            logger.info(f"Загружаем reranker: {settings.reranker_model}")
+            with model_load_timer("reranker", settings.reranker_model):
+                self._reranker = CrossEncoder(resolve_model(settings.reranker_model), device="cpu")
+        return self._reranker
+
+    def search(self, query: str, config: Dict):
+        """Поиск по конфигурации, возвращает документы."""
+        from app.core.translator import translator
+
+        retriever = self.get_retriever(config["collection"], config["mode"])
+        retriever.title_index_mode = config["title_index"]
+        top_k = config["top_k"]
+
+        if not config["reranker"]:
+            return retriever.retrieve(
+                query, top_k=top_k, translate=config["translation"], adaptive=config["adaptive"]
+            )
+
+        candidates = retriever.retrieve(
+            query, top_k=max(top_k * 4, 20), translate=config["translation"], adaptive=False
+        )
+        rerank_query = translator.translate(query) if config["translation"] else query
+        scores = self.get_reranker().predict([(rerank_query, doc.page_content) for doc in candidates])
+        ranked = sorted(zip(candidates, scores), key=lambda pair: pair[1], reverse=True)
+        return [doc for doc, _ in ranked[:top_k]]
+
+    def evaluate_config(self, gold_set: List[Dict], config: Dict) -> Dict:
+        """Считает recall@k, MRR, nDCG@k и латентность для конфигурации."""
+        from app.core.translator import translator
+
+        # Кэши переводов и эмбеддингов запросов искажают латентность между конфигурациями
+        translator.clear_cache()
+        for retriever in self._retrievers.values():
+            retriever.clear_cache()
+
+        k = config["top_k"]
+        per_query = []
+        latencies = []
+
+        for item in gold_set:
+            started = time.perf_counter()
+            documents = self.search(item["query"], config)
+            latency_ms = (time.perf_counter() - started) * 1000
+
+            ranked = rank_pages(documents)
+            per_query.append({
+                "id": item["id"],
+                "lang": item["lang"],
+                "recall": recall_at_k(ranked, item["relevant"], k),
+                "rr": reciprocal_rank(ranked, item["relevant"]),
+                "ndcg": ndcg_at_k(ranked, item["relevant"], k),
+                "latency_ms": round(latency_ms, 2),
+                "documents": len(documents),
+                "context_chars": sum(len(doc.page_content) for doc in documents),
+                "pages": ranked,
+            })
+            latencies.append(latency_ms)
+
+        def mean(key: str, lang: Optional[str] = None) -> float:
+            values = [row[key] for row in per_query if lang is None or row["lang"] == lang]
+            return round(statistics.fmean(values), 4) if values else 0.0
+
+        return {
+            "config": config,
+            f"recall@{k}": mean("recall"),
+            "mrr": mean("rr"),
+            f"ndcg@{k}": mean("ndcg"),
+            "mrr_ru": mean("rr", "ru"),
+            "mrr_en": mean("rr", "en"),
+            "documents_mean": mean("documents"),
+            "context_chars_mean": mean("context_chars"),
+            "latency_p50_ms": round(percentile(latencies, 50), 2),
+            "latency_p95_ms": round(percentile(latencies, 95), 2),
+            "latency_mean_ms": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+            "queries": per_query,
+        }
+
+    def run(self, configs: List[Dict]) -> List[Dict]:
+        """Прогоняет все конфигурации."""
+        gold_set = self.load_gold_set()
+        results = []
+
+        for config in configs:
+            logger.info(f"Оцениваем конфигурацию: {config}")
+            try:
+                result = self.evaluate_config(gold_set, config)
+            except Exception as e:
+                logger.error(f"Ошибка оценки конфигурации {config}: {e}")
+                continue
+            results.append(result)
+
+        return results
+
+
+def build_configs(args) -> List[Dict]:
+    """Декартово произведение параметров из командной строки."""
+    configs = []
+    for mode, top_k, reranker, translation, title_index, adaptive in itertools.product(
+        args.mode, args.top_k, args.reranker, args.translation, args.title_index, args.adaptive
+    ):
+        # В мультиязычном режиме перевод не используется
+        if mode == "multilingual":
+            translation = False
+        for collection in args.collections or [settings.collection_name_for(mode)]:
+            config = {
+                "mode": mode,
+                "collection": collection,
+                "top_k": top_k,
+                "reranker": reranker,
+                "translation": translation,
+                "title_index": title_index,
+                "adaptive": adaptive,
+            }
+            if config not in configs:
+                configs.append(config)
+    return configs
+
+
+def print_table(results: List[Dict]) -> None:
+    """Печатает сводную таблицу качества и скорости."""
+    print(f"{'mode':<14}{'collection':<26}{'k':>4}{'rerank':>8}{'transl':>8}{'titles':>8}"
+          f"{'adapt':>7}{'recall':>9}{'MRR':>8}{'nDCG':>8}{'MRR ru':>8}{'MRR en':>8}{'docs':>6}"
+          f"{'p50 ms':>9}{'p95 ms':>9}")
+    for result in results:
+        config = result["config"]
+        k = config["top_k"]
+        print(
+            f"{config['mode']:<14}{config['collection']:<26}{k:>4}"
+            f"{str(config['reranker']):>8}{str(config['translation']):>8}{config['title_index']:>8}"
+            f"{str(config['adaptive']):>7}"
+            f"{result[f'recall@{k}']:>9.3f}{result['mrr']:>8.3f}{result[f'ndcg@{k}']:>8.3f}"
+            f"{result['mrr_ru']:>8.3f}{result['mrr_en']:>8.3f}{result['documents_mean']:>6.1f}"
+            f"{result['latency_p50_ms']:>9.1f}{result['latency_p95_ms']:>9.1f}"
+        )
+
+
+def parse_bool(value: str) -> bool:
+    """on/off, true/false для аргументов."""
+    return value.lower() in ("on", "true", "1", "yes")
+
+
+def main(argv: Optional[List[str]] = None):
+    """Точка входа."""
+    parser = argparse.ArgumentParser(description="Оценка retrieval: качество против латентности")
+    parser.add_argument("--gold", type=Path, default=None, help="JSONL с вопросами и ожидаемыми страницами")
+    parser.add_argument("--mode", nargs="+", choices=["translate", "multilingual"],
+                        default=[settings.retrieval_mode], help="Режимы поиска")
+    parser.add_argument("--collections", nargs="+", default=None,
+                        help="Коллекции Chroma (разные варианты чанкинга), по умолчанию коллекция режима")
+    parser.add_argument("--top-k", nargs="+", type=int, default=[settings.top_k])
+    parser.add_argument("--reranker", nargs="+", type=parse_bool, default=[False], help="on/off")
+    parser.add_argument("--translation", nargs="+", type=parse_bool, default=[True], help="on/off")
+    parser.add_argument("--title-index", nargs="+", choices=["off", "boost", "direct"],
+                        default=[settings.title_index_mode], help="Режимы поиска по заголовкам")
+    parser.add_argument("--adaptive", nargs="+", type=parse_bool, default=[settings.adaptive_retrieval],
+                        help="Адаптивный top-k: on/off")
+    parser.add_argument("--output", type=Path, default=None, help="Куда сохранить JSON отчета")
+    args = parser.parse_args(argv)
+
+    evaluator = RetrievalEvaluator(args.gold)
+    results = evaluator.run(build_configs(args))
+    print_table(results)
+
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=project_root, text=True
+        ).strip()
+    except Exception:
+        commit = "unknown"
+
+    output = args.output or settings.data_dir / "eval" / "results" / f"eval_{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    report = {"commit": commit, "created_at": datetime.now().isoformat(), "results": results}
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    logger.info(f"Отчет сохранен в {output}")
+
+
+if __name__ == "__main__":
+    main()
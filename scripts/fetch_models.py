@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Сохраняет все модели в models_dir для запуска без сети."""
+import sys
+import pathlib
+
+# Add project root to Python path
+project_root = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import argparse
+import json
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.model_store import MANIFEST_FILE, file_sha256, model_dir_name, read_manifest, verify_model
+
+
+def configured_models(all_modes: bool = False) -> Dict[str, str]:
+    """Модели конфигурации: имя -> компонент."""
+    models = {settings.embedding_model_for(): "embeddings"}
+    if all_modes:
+        models[settings.embedding_model_for("translate")] = "embeddings"
+        models[settings.embedding_model_for("multilingual")] = "embeddings"
+    models[settings.translation_model] = "translator"
+    models[settings.reranker_model] = "reranker"
+    if settings.llm_tokenizer:
+        # Только токенизатор LLM для учета токенов; сама модель живет в Ollama
+        models[settings.llm_tokenizer] = "tokenizer"
+    return models
+
+
+def save_model(model_name: str, component: str, path: Path) -> None:
+    """Загружает модель с Hugging Face Hub и сохраняет ее в safetensors.
+
+    sentence-transformers сохраняет веса через save_pretrained, который в
+    transformers >= 4.35 по умолчанию пишет safetensors.
+    """
+    if component == "translator":
+        from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+        AutoTokenizer.from_pretrained(model_name).save_pretrained(path)
+        AutoModelForSeq2SeqLM.from_pretrained(model_name).save_pretrained(path, safe_serialization=True)
+    elif component == "tokenizer":
+        from transformers import AutoTokenizer
+
+        AutoTokenizer.from_pretrained(model_name).save_pretrained(path)
+    elif component == "reranker":
+        from sentence_transformers import CrossEncoder
+
+        CrossEncoder(model_name, device="cpu").save(str(path))
+    else:
+        from sentence_transformers import SentenceTransformer
+
+        SentenceTransformer(model_name, device="cpu").save(str(path))
+
+
+def fetch(models: Dict[str, str], models_dir: Path, quantize: bool, force: bool) -> Dict:
+    """Сохраняет модели и обновляет манифест."""
+    manifest = read_manifest(models_dir)
+    for model_name, component in models.items():
+        path = models_dir / model_dir_name(model_name)
+        if path.exists() and model_name in manifest["models"] and not force:
+            logger.info(f"{model_name} уже в {path}, пропускаем (--force для перезаписи)")
+            continue
+
+        started = time.perf_counter()
+        staging = models_dir / f".{path.name}.tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        save_model(model_name, component, staging)
+        shutil.rmtree(path, ignore_errors=True)
+        staging.rename(path)
+
+        files = {
+            str(file.relative_to(path)): file_sha256(file)
+            for file in sorted(path.rglob("*")) if file.is_file()
+        }
+        manifest["models"][model_name] = {
+            "component": component,
+            "path": path.name,
+            "format": ("tokenizer" if component == "tokenizer"
+                       else "safetensors" if any(name.endswith(".safetensors") for name in files) else "pytorch"),
+            # Динамическое int8 квантование выполняется при загрузке: квантованные
+            # модули PyTorch не сохраняются через save_pretrained
+            "quantized": quantize,
+            "size_mb": round(sum(file.stat().st_size for file in path.rglob("*") if file.is_file()) / 1024 / 1024, 1),
+            "files": files,
+            "saved_at": datetime.now().isoformat(),
+        }
+        logger.info(f"{model_name} сохранена в {path} за {time.perf_counter() - started:.1f} с")
+
+    manifest["updated_at"] = datetime.now().isoformat()
+    (models_dir / MANIFEST_FILE).write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    return manifest
+
+
+def verify(models_dir: Path) -> bool:
+    """Проверяет контрольные суммы всех моделей манифеста."""
+    ok = True
+    for model_name in read_manifest(models_dir)["models"]:
+        errors = verify_model(model_name, models_dir)
+        if errors:
+            ok = False
+            logger.error(f"{model_name}: {errors}")
+        else:
+            logger.info(f"{model_name}: OK")
+    return ok
+
+
+def main(argv: Optional[List[str]] = None):
+    """Точка входа."""
+    parser = argparse.ArgumentParser(description="Бандл моделей для запуска без сети")
+    parser.add_argument("--models-dir", type=Path, default=settings.models_dir)
+    parser.add_argument("--all-modes", action="store_true",
+                        help="Сохранить модели эмбеддингов обоих режимов поиска")
+    parser.add_argument("--quantize", action="store_true",
+                        help="Пометить модели для int8 квантования при загрузке")
+    parser.add_argument("--force", action="store_true", help="Перезаписать уже сохраненные модели")
+    parser.add_argument("--verify", action="store_true", help="Только проверить контрольные суммы")
+    args = parser.parse_args(argv)
+
+    args.models_dir.mkdir(parents=True, exist_ok=True)
+    if args.verify:
+        sys.exit(0 if verify(args.models_dir) else 1)
+
+    manifest = fetch(configured_models(args.all_modes), args.models_dir, args.quantize, args.force)
+    for model_name, info in manifest["models"].items():
+        print(f"{info['component']:<12}{model_name:<60}{info['format']:<13}{info['size_mb']:>8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
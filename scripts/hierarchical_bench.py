@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""Сравнение плоского и иерархического поиска при росте корпуса."""
+import sys
+import pathlib
+
+# Add project root to Python path
+project_root = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import argparse
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import chromadb
+import numpy as np
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.rag.chroma_client import create_chroma_client
+from scripts.bench import git_commit, percentile
+from scripts.ingest_chroma import combine_page_vector, normalize_rows
+
+
+def load_corpus(collection_name: str, normalize: bool = True) -> Tuple[np.ndarray, List[Dict]]:
+    """Эмбеддинги и метаданные чанков из существующей коллекции."""
+    client = create_chroma_client()
+    data = client.get_collection(collection_name).get(include=["embeddings", "metadatas"])
+    embeddings = np.asarray(data["embeddings"], dtype=np.float32)
+    if normalize:
+        embeddings = normalize_rows(embeddings)
+    logger.info(f"Загружено {len(embeddings)} чанков из {collection_name}")
+    return embeddings, data["metadatas"]
+
+
+def scale_corpus(embeddings: np.ndarray, metadatas: List[Dict], scale: float, noise: float,
+                 rng: np.random.Generator) -> Tuple[np.ndarray, List[str]]:
+    """Уменьшает корпус выборкой страниц или увеличивает копиями-"версиями" с шумом."""
+    page_ids = np.array([str(metadata["page_id"]) for metadata in metadatas])
+
+    if scale <= 1:
+        unique_pages = np.unique(page_ids)
+        keep = set(rng.choice(unique_pages, size=max(1, int(len(unique_pages) * scale)), replace=False))
+        mask = np.array([page_id in keep for page_id in page_ids])
+        return embeddings[mask], page_ids[mask].tolist()
+
+    versions = int(round(scale))
+    parts, ids = [], []
+    for version in range(versions):
+        jitter = rng.normal(0, noise, embeddings.shape).astype(np.float32) if version else 0
+        parts.append(normalize_rows(embeddings + jitter))
+        ids.extend(f"v{version}:{page_id}" for page_id in page_ids)
+    return np.concatenate(parts), ids
+
+
+def build_page_matrix(embeddings: np.ndarray, page_ids: List[str],
+                      title_vectors: Dict[str, np.ndarray]) -> Tuple[np.ndarray, List[str]]:
+    """Векторы страниц так же, как при загрузке (заголовок + центроид)."""
+    order = sorted(set(page_ids))
+    index = {page_id: i for i, page_id in enumerate(order)}
+    sums = np.zeros((len(order), embeddings.shape[1]), dtype=np.float32)
+    counts = np.zeros(len(order), dtype=np.float32)
+    for row, page_id in enumerate(page_ids):
+        sums[index[page_id]] += embeddings[row]
+        counts[index[page_id]] += 1
+
+    centroids = sums / counts[:, None]
+    titles = np.stack([title_vectors.get(page_id.split(":")[-1], centroids[i]) for i, page_id in enumerate(order)])
+    return combine_page_vector(centroids, titles, settings.page_title_weight), order
+
+
+def add_in_batches(collection, embeddings: np.ndarray, ids: List[str], metadatas: List[Dict]) -> None:
+    """Добавляет векторы в коллекцию батчами (у Chroma есть лимит на батч)."""
+    for start in range(0, len(ids), 5000):
+        collection.add(
+            ids=ids[start:start + 5000],
+            embeddings=embeddings[start:start + 5000].tolist(),
+            metadatas=metadatas[start:start + 5000],
+        )
+
+
+def run_scale(embeddings: np.ndarray, page_ids: List[str], title_vectors: Dict[str, np.ndarray],
+              queries: np.ndarray, top_k: int, top_pages: int) -> Dict:
+    """Recall@k против точного поиска и латентность для одного размера корпуса."""
+    client = chromadb.EphemeralClient()
+    suffix = str(time.time_ns())
+    chunks = client.create_collection(f"chunks_{suffix}", metadata=settings.hnsw_metadata())
+    pages = client.create_collection(f"pages_{suffix}", metadata=settings.hnsw_metadata())
+
+    chunk_ids = [f"c{i}" for i in range(len(page_ids))]
+    add_in_batches(chunks, embeddings, chunk_ids, [{"page_id": page_id} for page_id in page_ids])
+    page_matrix, page_order = build_page_matrix(embeddings, page_ids, title_vectors)
+    add_in_batches(pages, page_matrix, page_order, [{"page_id": page_id} for page_id in page_order])
+
+    results = {"flat": {"recall": [], "latency": []}, "hierarchical": {"recall": [], "latency": []}}
+    for query in queries:
+        exact = {chunk_ids[i] for i in np.argsort(-(embeddings @ query))[:top_k]}
+        vector = query.tolist()
+
+        started = time.perf_counter()
+        flat = chunks.query(query_embeddings=[vector], n_results=top_k)["ids"][0]
+        results["flat"]["latency"].append((time.perf_counter() - started) * 1000)
+        results["flat"]["recall"].append(len(exact & set(flat)) / top_k)
+
+        started = time.perf_counter()
+        selected = pages.query(query_embeddings=[vector], n_results=min(top_pages, len(page_order)))
+        selected_ids = [metadata["page_id"] for metadata in selected["metadatas"][0]]
+        hierarchical = chunks.query(
+            query_embeddings=[vector], n_results=top_k, where={"page_id": {"$in": selected_ids}}
+        )["ids"][0]
+        results["hierarchical"]["latency"].append((time.perf_counter() - started) * 1000)
+        results["hierarchical"]["recall"].append(len(exact & set(hierarchical)) / top_k)
+
+    return {
+        "chunks": len(page_ids),
+        "pages": len(page_order),
+        **{
+            strategy: {
+                f"recall@{top_k}": round(float(np.mean(values["recall"])), 4),
+                "latency_p50_ms": round(percentile(values["latency"], 50), 3),
+                "latency_p95_ms": round(percentile(values["latency"], 95), 3),
+            }
+            for strategy, values in results.items()
+        },
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    """Точка входа."""
+    parser = argparse.ArgumentParser(description="Плоский против иерархического поиска по размеру корпуса")
+    parser.add_argument("--collection", default=settings.collection_name_for())
+    parser.add_argument("--scales", nargs="+", type=float, default=[0.25, 0.5, 1, 2, 4],
+                        help="Доли корпуса (<1) или число копий-версий (>1)")
+    parser.add_argument("--noise", type=float, default=0.02, help="Шум векторов в копиях-версиях")
+    parser.add_argument("--queries", type=int, default=200, help="Число запросов")
+    parser.add_argument("--top-pages", type=int, default=settings.hierarchical_top_pages)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, default=None, help="Куда сохранить JSON отчета")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    embeddings, metadatas = load_corpus(args.collection)
+
+    # Эмбеддинги заголовков страниц для векторов страниц
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(settings.embedding_model_for(), device="cpu")
+    titles = {str(metadata["page_id"]): metadata["title"] for metadata in metadatas}
+    title_matrix = model.encode(list(titles.values()), batch_size=64, show_progress_bar=False,
+                                normalize_embeddings=True)
+    title_vectors = dict(zip(titles.keys(), title_matrix))
+
+    # Запросы: зашумленные чанки (перефразированные вопросы к известному месту)
+    sample = embeddings[rng.choice(len(embeddings), size=min(args.queries, len(embeddings)), replace=False)]
+    queries = normalize_rows(sample + rng.normal(0, 0.05, sample.shape).astype(np.float32))
+
+    report = {"commit": git_commit(), "created_at": datetime.now().isoformat(),
+              "top_k": settings.top_k, "top_pages": args.top_pages, "scales": []}
+
+    print(f"{'scale':>6}{'chunks':>9}{'pages':>8}{'flat R':>9}{'flat p50':>10}{'hier R':>9}{'hier p50':>10}")
+    for scale in args.scales:
+        scaled, page_ids = scale_corpus(embeddings, metadatas, scale, args.noise, rng)
+        result = run_scale(scaled, page_ids, title_vectors, queries, settings.top_k, args.top_pages)
+        result["scale"] = scale
+        report["scales"].append(result)
+
+        recall_key = f"recall@{settings.top_k}"
+        print(
+            f"{scale:>6}{result['chunks']:>9}{result['pages']:>8}"
+            f"{result['flat'][recall_key]:>9.3f}{result['flat']['latency_p50_ms']:>10.2f}"
+            f"{result['hierarchical'][recall_key]:>9.3f}{result['hierarchical']['latency_p50_ms']:>10.2f}"
+        )
+
+    output = args.output or settings.data_dir / "bench" / f"hierarchical_{report['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    logger.info(f"Отчет сохранен в {output}")
+
+
+if __name__ == "__main__":
+    main()
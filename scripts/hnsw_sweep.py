@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Подбор параметров HNSW: recall@k против точного поиска, латентность и размер индекса."""
+import sys
+import pathlib
+
+# Add project root to Python path
+project_root = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import argparse
+import itertools
+import json
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import chromadb
+import numpy as np
+
+from app.core.config import settings
+from app.core.logger import logger
+from scripts.bench import git_commit, percentile
+from scripts.hierarchical_bench import add_in_batches, load_corpus
+from scripts.ingest_chroma import normalize_rows
+
+
+def exact_top_k(embeddings: np.ndarray, query: np.ndarray, space: str, k: int) -> List[int]:
+    """Точный поиск перебором в той же метрике, что и индекс."""
+    if space == "l2":
+        scores = -np.sum((embeddings - query) ** 2, axis=1)
+    elif space == "cosine":
+        scores = normalize_rows(embeddings) @ (query / max(np.linalg.norm(query), 1e-12))
+    else:
+        scores = embeddings @ query
+    return np.argsort(-scores)[:k].tolist()
+
+
+def directory_size(path: Path) -> int:
+    """Размер файлов индекса на диске в байтах."""
+    return sum(item.stat().st_size for item in path.rglob("*") if item.is_file())
+
+
+def load_queries(embeddings: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    """Английские вопросы золотого набора и зашумленные чанки."""
+    queries = []
+    gold_path = settings.data_dir / "eval" / "gold_set.jsonl"
+    if gold_path.exists():
+        from sentence_transformers import SentenceTransformer
+
+        texts = [
+            json.loads(line)["query"] for line in gold_path.read_text(encoding="utf-8").splitlines()
+            if line.strip() and json.loads(line)["lang"] == "en"
+        ]
+        model = SentenceTransformer(settings.embedding_model_for(), device="cpu")
+        queries.append(model.encode(texts, show_progress_bar=False,
+                                    normalize_embeddings=settings.normalize_embeddings))
+
+    sample = embeddings[rng.choice(len(embeddings), size=min(count, len(embeddings)), replace=False)]
+    noisy = sample + rng.normal(0, 0.05, sample.shape).astype(np.float32)
+    queries.append(normalize_rows(noisy) if settings.normalize_embeddings else noisy)
+    return np.concatenate(queries).astype(np.float32)
+
+
+def run_config(embeddings: np.ndarray, queries: np.ndarray, space: str, m: int,
+               construction_ef: int, search_ef: int, top_k: int) -> Dict:
+    """Строит индекс с заданными параметрами и измеряет его."""
+    workdir = Path(tempfile.mkdtemp(prefix="hnsw_sweep_"))
+    try:
+        client = chromadb.PersistentClient(path=str(workdir))
+        collection = client.create_collection("sweep", metadata={
+            "hnsw:space": space,
+            "hnsw:M": m,
+            "hnsw:construction_ef": construction_ef,
+            "hnsw:search_ef": search_ef,
+        })
+
+        ids = [str(i) for i in range(len(embeddings))]
+        started = time.perf_counter()
+        add_in_batches(collection, embeddings, ids, [{"i": i} for i in range(len(ids))])
+        build_seconds = time.perf_counter() - started
+
+        recalls, latencies = [], []
+        for query in queries:
+            exact = {str(i) for i in exact_top_k(embeddings, query, space, top_k)}
+            started = time.perf_counter()
+            found = collection.query(query_embeddings=[query.tolist()], n_results=top_k, include=[])["ids"][0]
+            latencies.append((time.perf_counter() - started) * 1000)
+            recalls.append(len(exact & set(found)) / top_k)
+
+        index_bytes = directory_size(workdir)
+        del client
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "space": space,
+        "M": m,
+        "construction_ef": construction_ef,
+        "search_ef": search_ef,
+        f"recall@{top_k}": round(float(np.mean(recalls)), 4),
+        "latency_p50_ms": round(percentile(latencies, 50), 3),
+        "latency_p95_ms": round(percentile(latencies, 95), 3),
+        "build_seconds": round(build_seconds, 2),
+        "index_mb": round(index_bytes / 1024 / 1024, 2),
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    """Точка входа."""
+    parser = argparse.ArgumentParser(description="Перебор параметров HNSW индекса Chroma")
+    parser.add_argument("--collection", default=settings.collection_name_for())
+    parser.add_argument("--spaces", nargs="+", default=[settings.hnsw_space], choices=["cosine", "ip", "l2"])
+    parser.add_argument("--m", nargs="+", type=int, default=[8, 16, 32])
+    parser.add_argument("--construction-ef", nargs="+", type=int, default=[100, 200])
+    parser.add_argument("--search-ef", nargs="+", type=int, default=[10, 50, 100])
+    parser.add_argument("--queries", type=int, default=200, help="Число зашумленных чанков-запросов")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, default=None, help="Куда сохранить JSON отчета")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    embeddings, _ = load_corpus(args.collection, normalize=settings.normalize_embeddings)
+    queries = load_queries(embeddings, args.queries, rng)
+    top_k = settings.top_k
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now().isoformat(),
+        "collection": args.collection,
+        "chunks": len(embeddings),
+        "queries": len(queries),
+        "top_k": top_k,
+        "results": [],
+    }
+
+    print(f"{'space':>7}{'M':>5}{'c_ef':>6}{'s_ef':>6}{'recall':>9}{'p50 ms':>9}{'p95 ms':>9}{'build s':>9}{'MB':>8}")
+    for space, m, construction_ef, search_ef in itertools.product(
+        args.spaces, args.m, args.construction_ef, args.search_ef
+    ):
+        result = run_config(embeddings, queries, space, m, construction_ef, search_ef, top_k)
+        report["results"].append(result)
+        print(
+            f"{space:>7}{m:>5}{construction_ef:>6}{search_ef:>6}{result[f'recall@{top_k}']:>9.3f}"
+            f"{result['latency_p50_ms']:>9.2f}{result['latency_p95_ms']:>9.2f}"
+            f"{result['build_seconds']:>9.1f}{result['index_mb']:>8.1f}"
+        )
+
+    output = args.output or settings.data_dir / "bench" / f"hnsw_sweep_{report['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    logger.info(f"Отчет сохранен в {output}")
+
+
+if __name__ == "__main__":
+    main()
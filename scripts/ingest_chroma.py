@@ -7,39 +7,98 @@ import pathlib
 project_root = pathlib.Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+import argparse
+import hashlib
 import json
 import time
 from pathlib import Path
 from typing import List, Dict, Any
 
-import chromadb
+import numpy as np
 from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
 from tqdm import tqdm
 
 from app.core.config import settings
+from app.core.inference import configure_torch_threads, quantize_linear
 from app.core.logger import logger
+from app.core.model_store import is_prequantized, model_load_timer, resolve_model
+from app.rag.chroma_client import create_chroma_client
+from app.rag.dedup import text_hash
+from app.rag.index_bundle import write_bundle
+from app.rag.index_registry import delete_build, index_registry, new_build_name
+from app.rag.quantized_store import QuantizedVectorStore, update_shared, write_view
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-нормализация строк матрицы."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def combine_page_vector(centroid: np.ndarray, title_embedding: np.ndarray, title_weight: float) -> np.ndarray:
+    """Вектор страницы: взвешенная сумма эмбеддинга заголовка и центроида чанков."""
+    vector = title_weight * normalize_rows(title_embedding) + (1 - title_weight) * normalize_rows(centroid)
+    return normalize_rows(vector)
 
 
 class ChromaIngester:
     """Класс для загрузки данных в Chroma DB."""
     
-    def __init__(self, chunks_path: Path = None, chroma_dir: Path = None):
-        self.chunks_path = chunks_path or settings.chunks_dir / "moodle_chunks.jsonl"
+    def __init__(self, chunks_path: Path = None, chroma_dir: Path = None, mode: str = None,
+                 version: str = None, lang: str = None, activate: bool = True):
+        self.version = version or settings.moodle_version
+        self.lang = lang or settings.moodle_lang
+        suffix = settings.docs_suffix(self.version, self.lang)
+        self.chunks_path = chunks_path or settings.chunks_dir / f"moodle_chunks{suffix}.jsonl"
         self.chroma_dir = chroma_dir or settings.chroma_dir
         
+        # Модель зависит от режима поиска (translate / multilingual),
+        # коллекция — еще и от версии и языка документации
+        self.embedding_model_name = settings.embedding_model_for(mode)
+        self.index_name = settings.collection_name_for(mode, self.version, self.lang)
+        # Blue/green: новая сборка пишется рядом с живой коллекцией,
+        # API переключается на нее только после проверки
+        self.blue_green = settings.blue_green_ingest
+        self.activate = activate
+        self.collection_name = new_build_name(self.index_name) if self.blue_green else self.index_name
+        
         # Инициализируем Chroma
-        self.client = chromadb.PersistentClient(path=str(self.chroma_dir))
+        self.client = create_chroma_client(self.chroma_dir)
         
         # Загружаем модель эмбеддингов
-        logger.info(f"Загружаем модель эмбеддингов: {settings.embedding_model}")
-        self.embedding_model = SentenceTransformer(settings.embedding_model)
+        logger.info(f"Загружаем модель эмбеддингов: {self.embedding_model_name}")
+        configure_torch_threads()
+        with model_load_timer("embeddings", self.embedding_model_name):
+            self.embedding_model = SentenceTransformer(resolve_model(self.embedding_model_name))
+        if settings.optimized_inference or is_prequantized(self.embedding_model_name):
+            self.embedding_model = quantize_linear(self.embedding_model)
+            logger.info("Модель эмбеддингов квантована в int8")
         
         # Получаем или создаем коллекцию
         self.collection = self.client.get_or_create_collection(
-            name=settings.collection_name,
-            metadata={"description": "Moodle documentation chunks"}
+            name=self.collection_name,
+            metadata=self.collection_metadata()
         )
+        
+        # Коллекции других версий с той же моделью: источник готовых эмбеддингов
+        self.sibling_collections = self.find_sibling_collections()
+        self.reused_embeddings = 0
+        
+        # Суммы нормализованных эмбеддингов чанков по страницам для векторов страниц
+        self.page_sums: Dict[str, np.ndarray] = {}
+        self.page_counts: Dict[str, int] = {}
+    
+    def collection_metadata(self) -> Dict[str, Any]:
+        """Метаданные коллекции чанков вместе с параметрами HNSW."""
+        return {
+            "description": "Moodle documentation chunks",
+            "embedding_model": self.embedding_model_name,
+            "normalized": settings.normalize_embeddings,
+            "version": self.version,
+            "lang": self.lang,
+            **settings.hnsw_metadata()
+        }
     
     def load_chunks(self) -> List[Dict]:
         """Загружает чанки из JSONL файла."""
@@ -71,22 +130,62 @@ class ChromaIngester:
             texts, 
             batch_size=32, 
             show_progress_bar=False,
-            convert_to_numpy=True
+            convert_to_numpy=True,
+            normalize_embeddings=settings.normalize_embeddings
         )
         return embeddings.tolist()
     
+    def find_sibling_collections(self) -> List:
+        """Коллекции чанков других версий, построенные той же моделью эмбеддингов."""
+        siblings = []
+        for item in self.client.list_collections():
+            # chromadb < 0.6 возвращает коллекции, новые версии — имена
+            name = getattr(item, "name", item)
+            if name == self.collection_name or name.endswith(settings.pages_collection_suffix):
+                continue
+            collection = self.client.get_collection(name)
+            metadata = collection.metadata or {}
+            if (metadata.get("embedding_model") == self.embedding_model_name
+                    and metadata.get("normalized") == settings.normalize_embeddings):
+                siblings.append(collection)
+        
+        if siblings:
+            logger.info(f"Эмбеддинги одинаковых чанков берем из: {', '.join(c.name for c in siblings)}")
+        return siblings
+    
+    def embed_batch(self, texts: List[str], hashes: List[str]) -> List[List[float]]:
+        """Эмбеддинги батча: совпадающие по тексту чанки берутся из других версий."""
+        known: Dict[str, List[float]] = {}
+        for collection in self.sibling_collections:
+            missing = [h for h in set(hashes) if h not in known]
+            if not missing:
+                break
+            data = collection.get(where={"text_hash": {"$in": missing}}, include=["embeddings", "metadatas"])
+            for embedding, metadata in zip(data["embeddings"], data["metadatas"]):
+                known[metadata["text_hash"]] = list(embedding)
+        
+        new_indexes = [i for i, h in enumerate(hashes) if h not in known]
+        if new_indexes:
+            for i, embedding in zip(new_indexes, self.create_embeddings([texts[i] for i in new_indexes])):
+                known[hashes[i]] = embedding
+        
+        self.reused_embeddings += len(hashes) - len(new_indexes)
+        return [known[h] for h in hashes]
+    
     def ingest_chunks(self, chunks: List[Dict]) -> None:
         """Загружает чанки в Chroma DB."""
         logger.info("Начинаем загрузку чанков в Chroma DB")
         
-        # Проверяем, есть ли уже данные в коллекции
+        # Параметры HNSW задаются только при создании коллекции, поэтому
+        # непустую коллекцию пересоздаем, а не очищаем
         count = self.collection.count()
         if count > 0:
-            logger.warning(f"В коллекции уже есть {count} документов. Очищаем...")
-            # Получаем все ID и удаляем их
-            all_data = self.collection.get()
-            if all_data["ids"]:
-                self.collection.delete(ids=all_data["ids"])
+            logger.warning(f"В коллекции уже есть {count} документов. Пересоздаем...")
+            self.client.delete_collection(self.collection_name)
+            self.collection = self.client.create_collection(
+                name=self.collection_name,
+                metadata=self.collection_metadata()
+            )
         
         # Подготавливаем батчи
         batches = self.prepare_batch(chunks)
@@ -98,19 +197,25 @@ class ChromaIngester:
                 # Извлекаем данные из батча
                 texts = [chunk["text"] for chunk in batch]
                 ids = [chunk["chunk_id"] for chunk in batch]
+                hashes = [text_hash(text) for text in texts]
                 metadatas = [
                     {
                         "title": chunk["title"],
                         "url": chunk["url"],
                         "page_id": chunk["page_id"],
                         "chunk_index": chunk["chunk_index"],
-                        "total_chunks": chunk["total_chunks"]
+                        "total_chunks": chunk["total_chunks"],
+                        "version": chunk.get("version", self.version),
+                        "lang": chunk.get("lang", self.lang),
+                        "aliases": chunk.get("aliases", ""),
+                        "text_hash": chunk_hash
                     }
-                    for chunk in batch
+                    for chunk, chunk_hash in zip(batch, hashes)
                 ]
                 
-                # Создаем эмбеддинги
-                embeddings = self.create_embeddings(texts)
+                # Создаем эмбеддинги (или берем готовые из других версий)
+                embeddings = self.embed_batch(texts, hashes)
+                self.accumulate_page_vectors(batch, embeddings)
                 
                 # Добавляем в коллекцию
                 self.collection.add(
@@ -124,17 +229,144 @@ class ChromaIngester:
                 
             except Exception as e:
                 logger.error(f"Ошибка при загрузке батча: {e}")
+                if self.blue_green:
+                    # Сборку без части чанков нельзя публиковать, живая коллекция остается прежней
+                    raise
                 continue
         
         # Сохраняем изменения (persist автоматически при использовании persist_directory)
         pass
         
-        logger.info(f"Загружено {total_ingested} чанков в Chroma DB")
+        logger.info(
+            f"Загружено {total_ingested} чанков в Chroma DB, "
+            f"эмбеддингов из других версий: {self.reused_embeddings}"
+        )
+    
+    def accumulate_page_vectors(self, batch: List[Dict], embeddings: List[List[float]]) -> None:
+        """Накапливает эмбеддинги чанков для центроидов страниц."""
+        for chunk, vector in zip(batch, normalize_rows(np.asarray(embeddings, dtype=np.float32))):
+            page_id = str(chunk["page_id"])
+            if page_id in self.page_sums:
+                self.page_sums[page_id] += vector
+                self.page_counts[page_id] += 1
+            else:
+                self.page_sums[page_id] = vector.copy()
+                self.page_counts[page_id] = 1
     
-    def verify_ingestion(self) -> None:
-        """Проверяет успешность загрузки."""
+    def ingest_pages(self, chunks: List[Dict]) -> None:
+        """Записывает векторы страниц (заголовок + центроид чанков) в отдельную коллекцию."""
+        if not self.page_sums:
+            return
+        
+        pages_name = f"{self.collection_name}{settings.pages_collection_suffix}"
+        logger.info(f"Строим векторы {len(self.page_sums)} страниц в коллекции {pages_name}")
+        
+        try:
+            self.client.delete_collection(pages_name)
+        except Exception:
+            pass
+        pages_collection = self.client.get_or_create_collection(
+            name=pages_name,
+            metadata={"description": "Moodle documentation page vectors", **settings.hnsw_metadata()}
+        )
+        
+        pages = {}
+        for chunk in chunks:
+            pages.setdefault(str(chunk["page_id"]), chunk)
+        page_ids = [page_id for page_id in pages if page_id in self.page_sums]
+        
+        for batch_ids in self.prepare_batch(page_ids, batch_size=256):
+            titles = [pages[page_id]["title"] for page_id in batch_ids]
+            title_embeddings = np.asarray(self.create_embeddings(titles), dtype=np.float32)
+            centroids = np.stack([self.page_sums[page_id] / self.page_counts[page_id] for page_id in batch_ids])
+            vectors = combine_page_vector(centroids, title_embeddings, settings.page_title_weight)
+            
+            pages_collection.add(
+                ids=batch_ids,
+                embeddings=vectors.tolist(),
+                documents=titles,
+                metadatas=[
+                    {
+                        "title": pages[page_id]["title"],
+                        "url": pages[page_id]["url"],
+                        "page_id": page_id,
+                        "total_chunks": self.page_counts[page_id]
+                    }
+                    for page_id in batch_ids
+                ]
+            )
+        
+        logger.info(f"Загружено {len(page_ids)} векторов страниц")
+    
+    def ingest_quantized(self, data: Dict[str, Any]) -> None:
+        """Сохраняет квантованные коды коллекции для vector_store=quantized.
+        
+        С shared_vectors векторы дописываются в общую матрицу модели
+        эмбеддингов (один раз на text_hash), а коллекция получает только
+        номера своих строк в ней.
+        """
+        path = settings.quantized_dir / self.collection_name
+        page_ids = [metadata["page_id"] for metadata in data["metadatas"]]
+        embeddings = np.asarray(data["embeddings"], dtype=np.float32)
+        metadata = {
+            "embedding_model": self.embedding_model_name,
+            "normalized": settings.normalize_embeddings,
+            "collection": self.collection_name
+        }
+        if not settings.shared_vectors:
+            QuantizedVectorStore.build(path, ids=data["ids"], page_ids=page_ids, embeddings=embeddings,
+                                       metadata=metadata)
+            logger.info(f"Квантованный индекс сохранен в {path}")
+            return
+        
+        hashes = [
+            item.get("text_hash") or text_hash(document)
+            for item, document in zip(data["metadatas"], data["documents"])
+        ]
+        rows = update_shared(
+            settings.shared_vectors_dir(self.embedding_model_name), hashes, embeddings,
+            metadata={"embedding_model": self.embedding_model_name, "normalized": settings.normalize_embeddings}
+        )
+        write_view(path, data["ids"], page_ids, rows, metadata)
+        logger.info(f"Строки коллекции в общей матрице сохранены в {path}")
+    
+    def ingest_bundle(self, data: Dict[str, Any]) -> None:
+        """Выпускает неизменяемый бандл индекса для vector_store=bundle."""
+        write_bundle(
+            settings.bundles_dir / self.index_name,
+            ids=data["ids"],
+            documents=data["documents"],
+            metadatas=data["metadatas"],
+            embeddings=np.asarray(data["embeddings"], dtype=np.float32),
+            manifest={
+                "collection": self.collection_name,
+                "embedding_model": self.embedding_model_name,
+                "normalized": settings.normalize_embeddings,
+                "space": settings.hnsw_space,
+                "chunk_size": settings.chunk_size,
+                "chunk_overlap": settings.chunk_overlap,
+                "version": self.version,
+                "lang": self.lang,
+                "source": self.chunks_path.name,
+                "source_sha256": hashlib.sha256(self.chunks_path.read_bytes()).hexdigest()
+            },
+            activate=self.activate
+        )
+    
+    def check_complete(self, chunks: List[Dict]) -> None:
+        """Проверяет, что в сборку попали все чанки, до выпуска бандла и публикации.
+        
+        Raises:
+            RuntimeError: В коллекции сборки не столько документов, сколько чанков
+        """
+        count = self.collection.count()
+        if count != len(chunks):
+            raise RuntimeError(f"В сборке {self.collection_name} {count} документов из {len(chunks)} чанков")
+    
+    def verify_ingestion(self) -> int:
+        """Проверяет успешность загрузки и возвращает число документов."""
         count = self.collection.count()
-        logger.info(f"В коллекции {settings.collection_name}: {count} документов")
+        logger.info(f"В коллекции {self.collection_name}: {count} документов")
         
         # Тестовый поиск
         try:
@@ -145,6 +377,8 @@ class ChromaIngester:
             logger.info("Тестовый поиск прошел успешно")
         except Exception as e:
             logger.error(f"Ошибка при тестовом поиске: {e}")
+        
+        return count
     
     def run(self) -> None:
         """Основной метод запуска."""
@@ -153,18 +387,53 @@ class ChromaIngester:
         try:
             chunks = self.load_chunks()
             self.ingest_chunks(chunks)
-            self.verify_ingestion()
+            if self.blue_green:
+                self.check_complete(chunks)
+            if settings.build_page_index:
+                self.ingest_pages(chunks)
+            if settings.build_quantized_index or settings.build_index_bundle:
+                data = self.collection.get(include=["embeddings", "documents", "metadatas"])
+                if data["ids"]:
+                    if settings.build_quantized_index:
+                        self.ingest_quantized(data)
+                    if settings.build_index_bundle:
+                        self.ingest_bundle(data)
+            count = self.verify_ingestion()
+            
+            if self.blue_green:
+                if count == 0:
+                    raise RuntimeError(f"Сборка {self.collection_name} пуста")
+                index_registry.publish(
+                    self.index_name, self.collection_name,
+                    info={"count": count, "version": self.version, "lang": self.lang},
+                    activate=self.activate
+                )
+                state = "активна" if self.activate else "ждет активации"
+                logger.info(f"Сборка {self.collection_name} опубликована ({state})")
             
             logger.info("Загрузка в Chroma DB завершена успешно")
             
         except Exception as e:
             logger.error(f"Ошибка при загрузке в Chroma DB: {e}")
+            if self.blue_green:
+                # Живая коллекция не тронута, недостроенную сборку удаляем
+                delete_build(self.client, self.collection_name)
             raise
 
 
 def main():
     """Точка входа."""
-    ingester = ChromaIngester()
+    parser = argparse.ArgumentParser(description="Загрузка чанков в ChromaDB")
+    parser.add_argument("--mode", choices=["translate", "multilingual"], default=None,
+                        help="Режим поиска, для которого строится коллекция")
+    parser.add_argument("--version", default=None, help="Версия Moodle (по умолчанию settings.moodle_version)")
+    parser.add_argument("--lang", default=None, help="Язык документации")
+    parser.add_argument("--no-activate", action="store_true",
+                        help="Только опубликовать сборку; переключение через POST /api/v1/admin/index/reload")
+    args = parser.parse_args()
+    
+    ingester = ChromaIngester(mode=args.mode, version=args.version, lang=args.lang,
+                              activate=not args.no_activate)
     ingester.run()
 
 
@@ -7,14 +7,19 @@ import pathlib
 project_root = pathlib.Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+import argparse
 import xml.etree.ElementTree as ET
 from pathlib import Path
 import json
 import re
+from typing import Dict, List, Optional
 
 from app.core.config import settings
 from app.core.logger import logger
 
+# #REDIRECT [[Заголовок]] или [[Заголовок#Раздел]] (в русской вики — #ПЕРЕНАПРАВЛЕНИЕ)
+REDIRECT_PATTERN = re.compile(r"^\s*#(?:REDIRECT|ПЕРЕНАПРАВЛЕНИЕ)\s*:?\s*\[\[([^\]|#]+)", re.IGNORECASE)
+
 
 def clean_wiki_text(text):
     """Очищает wiki markup из текста."""
@@ -63,8 +68,56 @@ def clean_wiki_text(text):
     return text
 
 
-def parse_xml_file(xml_file):
-    """Парсит один XML файл и извлекает страницы."""
+def redirect_target(page, wiki_text: str, ns: Dict[str, str]) -> Optional[str]:
+    """Заголовок страницы, на которую ведет редирект (None для обычной страницы)."""
+    redirect = page.find("mw:redirect", ns)
+    if redirect is not None and redirect.get("title"):
+        return redirect.get("title")
+    match = REDIRECT_PATTERN.match(wiki_text or "")
+    if match:
+        return match.group(1).strip().replace("_", " ")
+    return None
+
+
+def resolve_redirects(pages: List[Dict], redirects: Dict[str, str]) -> int:
+    """Добавляет заголовки редиректов в aliases их целевых страниц.
+    
+    Цепочки редиректов проходятся до конечной страницы. Заголовки
+    сравниваются без учета регистра: "Activity Locking" -> "Activity locking".
+    
+    Returns:
+        Число редиректов, ставших алиасами
+    """
+    by_title = {page["title"].casefold(): page for page in pages}
+    targets = {alias.casefold(): target for alias, target in redirects.items()}
+    resolved = 0
+    
+    for alias, target in redirects.items():
+        key = target.casefold()
+        seen = {alias.casefold()}
+        while key not in by_title and key in targets and key not in seen:
+            seen.add(key)
+            key = targets[key].casefold()
+        
+        page = by_title.get(key)
+        if page is None:
+            logger.debug(f"Редирект {alias} -> {target} ведет на отсутствующую страницу")
+            continue
+        if page["title"].casefold() != alias.casefold() and alias not in page.setdefault("aliases", []):
+            page["aliases"].append(alias)
+            resolved += 1
+    
+    return resolved
+
+
+def parse_xml_file(xml_file, version=None, lang=None, redirects: Optional[Dict[str, str]] = None):
+    """Парсит один XML файл и извлекает страницы версии документации.
+    
+    Редиректы не попадают в страницы; если передан словарь redirects, в него
+    записывается заголовок редиректа -> заголовок целевой страницы.
+    """
+    version = version or settings.moodle_version
+    lang = lang or settings.moodle_lang
     pages = []
     
     try:
@@ -99,6 +152,12 @@ def parse_xml_file(xml_file):
                 text_elem = rev.find("mw:text", ns)
                 wiki_text = text_elem.text if text_elem is not None else ""
                 
+                target = redirect_target(page, wiki_text, ns)
+                if target:
+                    if redirects is not None:
+                        redirects[title] = target
+                    continue
+                
                 # Очищаем wiki markup
                 plain_text = clean_wiki_text(wiki_text)
                 
@@ -110,7 +169,9 @@ def parse_xml_file(xml_file):
                     "id": str(len(pages) + 1),
                     "title": title,
                     "text": plain_text[:5000],  # Ограничиваем длину
-                    "url": f"https://docs.moodle.org/403/en/{title.replace(' ', '_')}",
+                    "url": settings.docs_url(title, version, lang),
+                    "version": version,
+                    "lang": lang,
                     "timestamp": "",
                     "length": len(plain_text)
                 }
@@ -133,8 +194,15 @@ def parse_xml_file(xml_file):
 
 def main():
     """Основная функция."""
-    xml_dir = settings.raw_dir / "xml"
-    output_file = settings.raw_dir / "moodle_docs.jsonl"
+    parser = argparse.ArgumentParser(description="Парсинг XML экспорта документации Moodle")
+    parser.add_argument("--version", default=settings.moodle_version, help="Версия Moodle (например 311, 401, 403)")
+    parser.add_argument("--lang", default=settings.moodle_lang, help="Язык документации")
+    args = parser.parse_args()
+    
+    # Каждая версия документации лежит в своей папке и своем файле
+    suffix = settings.docs_suffix(args.version, args.lang)
+    xml_dir = settings.raw_dir / f"xml{suffix}"
+    output_file = settings.raw_dir / f"moodle_docs{suffix}.jsonl"
     
     if not xml_dir.exists():
         logger.error(f"Папка с XML файлами не найдена: {xml_dir}")
@@ -151,15 +219,27 @@ def main():
     
     # Обрабатываем все XML файлы
     all_pages = []
+    redirects: Dict[str, str] = {}
     
     for xml_file in xml_files:
-        pages = parse_xml_file(xml_file)
+        pages = parse_xml_file(xml_file, args.version, args.lang, redirects)
         all_pages.extend(pages)
     
     if not all_pages:
         logger.error("Не удалось извлечь ни одной страницы")
         return
     
+    # Одна и та же страница может встретиться в нескольких файлах экспорта
+    unique_pages = {}
+    for page in all_pages:
+        unique_pages.setdefault(page["title"], page)
+    if len(unique_pages) < len(all_pages):
+        logger.info(f"Пропущено {len(all_pages) - len(unique_pages)} повторов страниц")
+    all_pages = list(unique_pages.values())
+    
+    resolved = resolve_redirects(all_pages, redirects)
+    logger.info(f"Редиректов: {len(redirects)}, стали алиасами страниц: {resolved}")
+    
     # Переназначаем ID
     for i, page in enumerate(all_pages, 1):
         page["id"] = str(i)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Проверка размера промпта на золотом наборе: медиана токенов не должна расти."""
+import sys
+import pathlib
+
+# Add project root to Python path
+project_root = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import argparse
+import json
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.rag.prompts import prompt_sections
+from app.rag.tokens import SECTIONS, TokenCounter, median_regressions, median_tokens, section_tokens
+
+
+def load_questions(gold_path: Path) -> List[Dict]:
+    """Вопросы золотого набора."""
+    with open(gold_path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def measure(questions: List[Dict], counter: TokenCounter) -> List[Dict]:
+    """Токены промпта по секциям для каждого вопроса (без истории диалога)."""
+    from app.rag.retriever import VersionedRetriever
+
+    retriever = VersionedRetriever()
+    rows = []
+    for item in questions:
+        documents = retriever.retrieve(item["query"], version=item.get("version"))
+        context = retriever.build_context(documents)
+        counts = section_tokens(prompt_sections(item["query"], context), counter)
+        counts["total"] = sum(counts.values())
+        rows.append({"id": item["id"], **counts})
+    return rows
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def main(argv: Optional[List[str]] = None):
+    """Точка входа."""
+    parser = argparse.ArgumentParser(description="Медиана токенов промпта на золотом наборе")
+    parser.add_argument("--gold", type=Path, default=settings.data_dir / "eval" / "gold_set.jsonl")
+    parser.add_argument("--baseline", type=Path, default=settings.data_dir / "eval" / "prompt_tokens_baseline.json")
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                        help="Допустимый рост медианы (доля, по умолчанию 5%%)")
+    parser.add_argument("--update", action="store_true", help="Записать текущие медианы как baseline")
+    args = parser.parse_args(argv)
+
+    counter = TokenCounter()
+    if not counter.exact:
+        logger.warning("Токенизатор LLM недоступен, медианы оценены по числу символов")
+
+    rows = measure(load_questions(args.gold), counter)
+    medians = median_tokens(rows)
+    for key in SECTIONS + ("total",):
+        print(f"{key:<10}{medians[key]:>10.1f}")
+
+    if args.update:
+        args.baseline.write_text(json.dumps({
+            "commit": git_commit(),
+            "created_at": datetime.now().isoformat(),
+            "tokenizer": settings.llm_tokenizer if counter.exact else None,
+            "medians": medians,
+            "queries": rows,
+        }, ensure_ascii=False, indent=2), encoding="utf-8")
+        logger.info(f"Baseline сохранен в {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        logger.error(f"Baseline {args.baseline} не найден, запустите с --update")
+        sys.exit(2)
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    regressions = median_regressions(medians, baseline["medians"], args.tolerance)
+    if regressions:
+        for key, (before, after) in regressions.items():
+            logger.error(f"Медиана токенов {key} выросла: {before:.1f} -> {after:.1f}")
+        sys.exit(1)
+    logger.info(f"Медианы токенов не выросли больше чем на {args.tolerance:.0%} (baseline {baseline['commit']})")
+
+
+if __name__ == "__main__":
+    main()
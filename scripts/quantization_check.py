@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""Проверка точности и скорости int8 инференса против fp32."""
+import sys
+import pathlib
+
+# Add project root to Python path
+project_root = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import argparse
+import copy
+import json
+import math
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+from scripts.bench import git_commit, measure, percentile
+
+
+def corpus_bleu(hypotheses: List[str], references: List[str], max_n: int = 4) -> float:
+    """Корпусный BLEU (0-100) со сглаживанием +1 для n > 1."""
+    matches = [0] * max_n
+    totals = [0] * max_n
+    hyp_length = ref_length = 0
+
+    for hypothesis, reference in zip(hypotheses, references):
+        hyp_tokens = hypothesis.lower().split()
+        ref_tokens = reference.lower().split()
+        hyp_length += len(hyp_tokens)
+        ref_length += len(ref_tokens)
+
+        for n in range(1, max_n + 1):
+            hyp_ngrams = Counter(tuple(hyp_tokens[i:i + n]) for i in range(len(hyp_tokens) - n + 1))
+            ref_ngrams = Counter(tuple(ref_tokens[i:i + n]) for i in range(len(ref_tokens) - n + 1))
+            matches[n - 1] += sum(min(count, ref_ngrams[ngram]) for ngram, count in hyp_ngrams.items())
+            totals[n - 1] += max(len(hyp_tokens) - n + 1, 0)
+
+    if hyp_length == 0:
+        return 0.0
+
+    log_precision = 0.0
+    for n in range(max_n):
+        smoothing = 1 if n > 0 else 0
+        if matches[n] + smoothing == 0:
+            return 0.0
+        log_precision += math.log((matches[n] + smoothing) / (totals[n] + smoothing)) / max_n
+
+    brevity_penalty = 1.0 if hyp_length > ref_length else math.exp(1 - ref_length / hyp_length)
+    return round(100 * brevity_penalty * math.exp(log_precision), 2)
+
+
+def load_sample_texts(limit: int) -> List[str]:
+    """Чанки из индекса или заголовки страниц, если чанков нет."""
+    chunks_path = settings.chunks_dir / "moodle_chunks.jsonl"
+    texts = []
+    if chunks_path.exists():
+        with open(chunks_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    texts.append(json.loads(line)["text"])
+                if len(texts) >= limit:
+                    break
+
+    if not texts:
+        titles_file = settings.raw_dir / "moodle_all_pages.txt"
+        texts = [line.strip() for line in titles_file.read_text(encoding="utf-8").splitlines() if line.strip()][:limit]
+
+    return texts
+
+
+def load_russian_queries() -> List[str]:
+    """Русские вопросы из золотого набора."""
+    gold_path = settings.data_dir / "eval" / "gold_set.jsonl"
+    queries = []
+    with open(gold_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                if item["lang"] == "ru":
+                    queries.append(item["query"])
+    return queries
+
+
+def check_embeddings(texts: List[str], queries: List[str], iterations: int) -> Dict:
+    """Косинусный дрейф int8 эмбеддингов и совпадение ближайших соседей."""
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+
+    from app.core.inference import quantize_linear
+
+    model_name = settings.embedding_model_for()
+    fp32 = SentenceTransformer(model_name, device="cpu")
+    int8 = quantize_linear(copy.deepcopy(fp32))
+
+    def encode(model, items: List[str]):
+        return model.encode(items, batch_size=32, show_progress_bar=False, normalize_embeddings=True)
+
+    fp32_docs, int8_docs = encode(fp32, texts), encode(int8, texts)
+    cosines = np.sum(fp32_docs * int8_docs, axis=1)
+
+    # Совпадение top-k при поиске int8 запросами по fp32 индексу
+    k = settings.top_k
+    fp32_queries, int8_queries = encode(fp32, queries), encode(int8, queries)
+    overlaps = []
+    for fp32_query, int8_query in zip(fp32_queries, int8_queries):
+        expected = set(np.argsort(-fp32_docs @ fp32_query)[:k])
+        actual = set(np.argsort(-fp32_docs @ int8_query)[:k])
+        overlaps.append(len(expected & actual) / k)
+
+    state = {"i": 0}
+
+    def single_query(model):
+        def run():
+            state["i"] = (state["i"] + 1) % len(queries)
+            model.encode(queries[state["i"]], normalize_embeddings=True)
+        return run
+
+    batch = texts[:64]
+    return {
+        "model": model_name,
+        "cosine_mean": round(float(cosines.mean()), 5),
+        "cosine_min": round(float(cosines.min()), 5),
+        "cosine_p5": round(percentile(cosines.tolist(), 5), 5),
+        f"top{k}_overlap": round(float(np.mean(overlaps)), 4),
+        "latency": [
+            measure("embed_query_fp32", single_query(fp32), iterations),
+            measure("embed_query_int8", single_query(int8), iterations),
+            measure("embed_batch_fp32", lambda: encode(fp32, batch), max(3, iterations // 20), items=len(batch)),
+            measure("embed_batch_int8", lambda: encode(int8, batch), max(3, iterations // 20), items=len(batch)),
+        ],
+    }
+
+
+def check_translation(queries: List[str], iterations: int) -> Optional[Dict]:
+    """BLEU int8 перевода относительно fp32 и латентность."""
+    from app.core.translator import QueryTranslator
+
+    fp32 = QueryTranslator(optimized=False)
+    int8 = QueryTranslator(optimized=True)
+    fp32._initialize_model()
+    int8._initialize_model()
+    if not (fp32._is_initialized and int8._is_initialized):
+        logger.warning("Модель перевода недоступна, проверка перевода пропущена")
+        return None
+
+    references = [fp32._translate_model(query) for query in queries]
+    hypotheses = [int8._translate_model(query) for query in queries]
+
+    state = {"i": 0}
+
+    def translate(translator):
+        def run():
+            state["i"] = (state["i"] + 1) % len(queries)
+            translator._translate_model(queries[state["i"]])
+        return run
+
+    runs = max(5, iterations // 10)
+    return {
+        "model": settings.translation_model,
+        "bleu_vs_fp32": corpus_bleu(hypotheses, references),
+        "exact_match": round(sum(h == r for h, r in zip(hypotheses, references)) / len(queries), 4),
+        "samples": [
+            {"query": query, "fp32": reference, "int8": hypothesis}
+            for query, reference, hypothesis in zip(queries, references, hypotheses)
+        ],
+        "latency": [
+            measure("translate_fp32", translate(fp32), runs),
+            measure("translate_int8", translate(int8), runs),
+        ],
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    """Точка входа."""
+    parser = argparse.ArgumentParser(description="Точность и скорость int8 инференса против fp32")
+    parser.add_argument("--texts", type=int, default=500, help="Сколько чанков использовать для эмбеддингов")
+    parser.add_argument("--iterations", type=int, default=100, help="Число замеров латентности")
+    parser.add_argument("--output", type=Path, default=None, help="Куда сохранить JSON отчета")
+    args = parser.parse_args(argv)
+
+    queries = load_russian_queries()
+    texts = load_sample_texts(args.texts)
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now().isoformat(),
+        "embeddings": check_embeddings(texts, queries, args.iterations),
+        "translation": check_translation(queries, args.iterations),
+    }
+
+    embeddings = report["embeddings"]
+    logger.info(
+        f"Эмбеддинги int8: косинус mean={embeddings['cosine_mean']} min={embeddings['cosine_min']}, "
+        f"совпадение top-{settings.top_k}={embeddings[f'top{settings.top_k}_overlap']}"
+    )
+    if report["translation"]:
+        logger.info(f"Перевод int8: BLEU против fp32={report['translation']['bleu_vs_fp32']}")
+
+    output = args.output or settings.data_dir / "bench" / f"quantization_{report['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    logger.info(f"Отчет сохранен в {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Память и потеря recall квантованного хранилища против поиска в float32."""
+import sys
+import pathlib
+
+# Add project root to Python path
+project_root = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import argparse
+import json
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.rag.quantized_store import QuantizedVectorStore
+from scripts.bench import git_commit, percentile
+from scripts.hierarchical_bench import load_corpus
+from scripts.hnsw_sweep import exact_top_k, load_queries
+
+
+def evaluate(store: QuantizedVectorStore, embeddings: np.ndarray, queries: np.ndarray,
+             shortlist: int, top_k: int) -> Dict:
+    """Recall@k относительно точного поиска и латентность одного варианта."""
+    recalls, latencies = [], []
+    for query in queries:
+        exact = {str(i) for i in exact_top_k(embeddings, query, settings.hnsw_space, top_k)}
+        started = time.perf_counter()
+        found = [chunk_id for chunk_id, _ in store.search(query, top_k, shortlist=shortlist)]
+        latencies.append((time.perf_counter() - started) * 1000)
+        recalls.append(len(exact & set(found)) / top_k)
+
+    return {
+        "quantization": store.quantization,
+        "shortlist": shortlist,
+        f"recall@{top_k}": round(float(np.mean(recalls)), 4),
+        "latency_p50_ms": round(percentile(latencies, 50), 3),
+        "latency_p95_ms": round(percentile(latencies, 95), 3),
+        **store.memory_stats(),
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    """Точка входа."""
+    parser = argparse.ArgumentParser(description="Оценка квантованного векторного хранилища")
+    parser.add_argument("--collection", default=settings.collection_name_for())
+    parser.add_argument("--shortlists", nargs="+", type=int, default=[10, 20, 50, 100, 200])
+    parser.add_argument("--queries", type=int, default=200, help="Число зашумленных чанков-запросов")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, default=None, help="Куда сохранить JSON отчета")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    embeddings, metadatas = load_corpus(args.collection, normalize=settings.normalize_embeddings)
+    queries = load_queries(embeddings, args.queries, rng)
+    top_k = settings.top_k
+
+    # Точный поиск в float32 как опорная латентность
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        exact_top_k(embeddings, query, settings.hnsw_space, top_k)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now().isoformat(),
+        "collection": args.collection,
+        "chunks": len(embeddings),
+        "queries": len(queries),
+        "top_k": top_k,
+        "float32_exact": {
+            "latency_p50_ms": round(percentile(latencies, 50), 3),
+            "latency_p95_ms": round(percentile(latencies, 95), 3),
+            "memory_mb": round(embeddings.nbytes / 1024 / 1024, 3),
+        },
+        "results": [],
+    }
+
+    workdir = Path(tempfile.mkdtemp(prefix="quantized_eval_"))
+    try:
+        QuantizedVectorStore.build(
+            workdir,
+            ids=[str(i) for i in range(len(embeddings))],
+            page_ids=[metadata["page_id"] for metadata in metadatas],
+            embeddings=embeddings,
+        )
+
+        print(f"{'codes':>7}{'short':>7}{'recall':>9}{'p50 ms':>9}{'p95 ms':>9}{'MB':>8}{'x less':>8}")
+        for quantization in ("int8", "binary"):
+            store = QuantizedVectorStore(workdir, quantization, settings.hnsw_space)
+            for shortlist in args.shortlists:
+                result = evaluate(store, embeddings, queries, shortlist, top_k)
+                report["results"].append(result)
+                print(
+                    f"{quantization:>7}{shortlist:>7}{result[f'recall@{top_k}']:>9.3f}"
+                    f"{result['latency_p50_ms']:>9.2f}{result['latency_p95_ms']:>9.2f}"
+                    f"{result['codes_mb']:>8.2f}{result['reduction']:>8.1f}"
+                )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or settings.data_dir / "bench" / f"quantized_{report['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    logger.info(f"Отчет сохранен в {output}")
+
+
+if __name__ == "__main__":
+    main()
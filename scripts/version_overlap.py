@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Пересечение чанков версий документации и память, которую заняло бы общее хранилище."""
+import sys
+import pathlib
+
+# Add project root to Python path
+project_root = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import argparse
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.rag.dedup import text_hash, version_overlap
+
+
+def load_hashes(path: Path) -> List[str]:
+    """text_hash чанков из JSONL файла."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [text_hash(json.loads(line)["text"]) for line in f if line.strip()]
+
+
+def main(argv: Optional[List[str]] = None):
+    """Точка входа."""
+    parser = argparse.ArgumentParser(description="Сколько чанков разных версий документации совпадает по тексту")
+    parser.add_argument("--versions", nargs="+", default=settings.doc_versions)
+    parser.add_argument("--languages", nargs="+", default=settings.doc_languages)
+    parser.add_argument("--dim", type=int, default=384, help="Размерность эмбеддингов (MiniLM — 384)")
+    parser.add_argument("--output", type=Path, default=None, help="Куда сохранить JSON отчета")
+    args = parser.parse_args(argv)
+
+    hashes: Dict[str, List[str]] = {}
+    for version in args.versions:
+        for lang in args.languages:
+            path = settings.chunks_dir / f"moodle_chunks{settings.docs_suffix(version, lang)}.jsonl"
+            if not path.exists():
+                logger.warning(f"Чанки {path} не найдены, версия {version}/{lang} пропущена")
+                continue
+            hashes[settings.collection_name_for(None, version, lang)] = load_hashes(path)
+    if not hashes:
+        logger.error("Нет ни одного файла чанков")
+        sys.exit(1)
+
+    # Как в оценке памяти retriever'а: float32 вектор и 2*M связей нижнего слоя HNSW
+    report = version_overlap(hashes, args.dim * 4 + 2 * settings.hnsw_m * 4)
+
+    print(f"{'Коллекция':<30}{'чанков':>10}{'общих':>10}")
+    for name, row in report["collections"].items():
+        print(f"{name:<30}{row['chunks']:>10}{row['shared_with_other_versions']:>10}")
+    print(
+        f"Векторов хранится: {report['stored_vectors']}, уникальных текстов: {report['unique_texts']}; "
+        f"индексы: {report['stored_bytes'] / 1024 / 1024:.1f} МБ, "
+        f"с общим хранилищем: {report['shared_bytes'] / 1024 / 1024:.1f} МБ"
+    )
+
+    if args.output:
+        args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        logger.info(f"Отчет сохранен в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
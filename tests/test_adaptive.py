@@ -0,0 +1,50 @@
+"""Тесты для адаптивного отбора контекста."""
+import pytest
+from langchain_core.documents import Document
+
+from app.rag.adaptive import adaptive_cut, is_smalltalk
+
+
+def _documents(*scores):
+    return [Document(page_content=f"chunk {i}", metadata={"score": score}) for i, score in enumerate(scores)]
+
+
+class TestSmalltalk:
+    """Тесты для is_smalltalk."""
+
+    @pytest.mark.parametrize("message", ["Спасибо!", "ок, понятно", "Добрый день", "thank you", "Всё ясно, спасибо большое"])
+    def test_smalltalk(self, message):
+        """Тест реплик, для которых поиск не нужен."""
+        assert is_smalltalk(message)
+
+    @pytest.mark.parametrize("message", [
+        "", "Как создать курс?", "нет, не работает", "спасибо, а как удалить курс?",
+        "да", "Нет", "yes", "no it", "все", "теперь",
+    ])
+    def test_questions(self, message):
+        """Тест сообщений, которым нужен поиск."""
+        assert not is_smalltalk(message)
+
+
+class TestAdaptiveCut:
+    """Тесты для adaptive_cut."""
+
+    def test_cut_at_gap(self):
+        """Тест обрыва на разрыве после почти точного совпадения."""
+        documents = adaptive_cut(_documents(0.92, 0.55, 0.54, 0.5), min_k=1, min_score=0.3, max_gap=0.15)
+
+        assert [doc.metadata["score"] for doc in documents] == [0.92]
+
+    def test_cut_at_threshold(self):
+        """Тест обрыва на пороге релевантности."""
+        documents = adaptive_cut(_documents(0.6, 0.55, 0.5, 0.25, 0.2), min_k=1, min_score=0.3, max_gap=0.15)
+
+        assert len(documents) == 3
+
+    def test_min_k_and_unscored(self):
+        """Тест минимума документов и документов без оценки."""
+        title_match = Document(page_content="title", metadata={})
+        documents = adaptive_cut([title_match] + _documents(0.2, 0.1), min_k=2, min_score=0.3, max_gap=0.15)
+
+        assert len(documents) == 2
+        assert documents[0] is title_match
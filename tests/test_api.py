@@ -26,6 +26,18 @@ def test_health_check():
     assert "message" in data
 
 
+def test_health_details():
+    """Тест детального статуса компонентов."""
+    response = client.get("/api/v1/health/details")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] in ("healthy", "unhealthy")
+    assert "components" in data
+    for component in data["components"].values():
+        assert "healthy" in component
+        assert "checked_at" in component
+
+
 def test_chat_endpoint():
     """Тест чат эндпоинта."""
     request_data = {
@@ -45,6 +57,30 @@ def test_chat_endpoint():
 
 
 
+def test_chat_with_timings():
+    """Тест разбивки времени по стадиям в ответе."""
+    request_data = {
+        "session_id": "test_session",
+        "message": "Как создать курс в Moodle?",
+        "include_timings": True
+    }
+    
+    response = client.post("/api/v1/chat", json=request_data)
+    assert response.status_code == 200
+    timings = response.json()["timings"]
+    assert "total" in timings
+    assert all(value >= 0 for value in timings.values())
+
+
+def test_metrics_endpoint():
+    """Тест эндпоинта метрик Prometheus."""
+    client.post("/api/v1/chat", json={"session_id": "test_session", "message": "test"})
+    
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "rag_stage_duration_seconds" in response.text
+
+
 def test_invalid_chat_request():
     """Тест некорректного запроса чата."""
     # Отсутствует обязательное поле
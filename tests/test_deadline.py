@@ -0,0 +1,152 @@
+"""Тесты для дедлайнов и отмены запросов."""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.core.deadline import Deadline, RequestCancelled, check_deadline, set_deadline
+from app.rag.llm import LangChainLLM
+
+
+class StubChatModel:
+    """Потоковая модель, которая отдает токены и запоминает, что поток закрыли.
+
+    Последний фрагмент, как у Ollama, несет eval_count; prompt_delay —
+    сколько секунд модель обрабатывает промпт до первого токена.
+    """
+
+    def __init__(self, tokens=100, on_token=None, eval_count=None, prompt_delay=0.0):
+        self.tokens = tokens
+        self.on_token = on_token
+        self.eval_count = tokens if eval_count is None else eval_count
+        self.prompt_delay = prompt_delay
+        self.generated = 0
+        self.closed = False
+
+    async def astream(self, prompt):
+        try:
+            await asyncio.sleep(self.prompt_delay)
+            for i in range(self.tokens):
+                self.generated += 1
+                if self.on_token:
+                    self.on_token(i)
+                metadata = {"eval_count": self.eval_count} if i == self.tokens - 1 else {}
+                yield SimpleNamespace(content=f"t{i} ", response_metadata=metadata, usage_metadata=None)
+        finally:
+            self.closed = True
+
+
+def _sample(name, reason):
+    return REGISTRY.get_sample_value(name, {"reason": reason}) or 0.0
+
+
+class TestDeadline:
+    """Тесты для Deadline."""
+
+    def test_expires(self):
+        """Тест истечения дедлайна."""
+        deadline = Deadline(0.01)
+        assert not deadline.cancelled
+        time.sleep(0.02)
+
+        assert deadline.remaining() == 0.0
+        with pytest.raises(RequestCancelled) as error:
+            deadline.check("retrieval")
+        assert error.value.reason == "deadline"
+        assert error.value.stage == "retrieval"
+
+    def test_cancel_keeps_first_reason(self):
+        """Тест отмены: запоминается первая причина, без дедлайна срок не истекает."""
+        deadline = Deadline(None)
+        assert deadline.remaining() is None
+
+        deadline.cancel("disconnected")
+        deadline.cancel("deadline")
+        assert deadline.reason == "disconnected"
+
+    def test_check_without_deadline(self):
+        """Тест: вне запроса API проверка ничего не делает."""
+        set_deadline(None)
+        check_deadline("generation")
+
+
+class TestLLMCancellation:
+    """Тесты для прерывания генерации."""
+
+    @pytest.fixture
+    def llm(self, monkeypatch):
+        monkeypatch.setattr(LangChainLLM, "_load_model", lambda self: None)
+        llm = LangChainLLM()
+        llm.is_loaded = True
+        yield llm
+        set_deadline(None)
+
+    def test_generation_stops_on_cancel(self, llm):
+        """Тест: отмена обрывает поток ответа, освобождает слот и считает токены."""
+        deadline = Deadline(None)
+        llm.llm = StubChatModel(tokens=100, on_token=lambda i: i == 4 and deadline.cancel("disconnected"))
+        llm.mean_tokens = 50.0
+        set_deadline(deadline)
+        cancelled_before = _sample("rag_cancelled_tokens_total", "disconnected")
+        saved_before = _sample("rag_cancellation_saved_tokens_total", "disconnected")
+
+        with pytest.raises(RequestCancelled):
+            llm.complete("prompt")
+
+        assert llm.llm.closed
+        assert llm.llm.generated == 5
+        assert _sample("rag_cancelled_tokens_total", "disconnected") - cancelled_before == 5
+        assert _sample("rag_cancellation_saved_tokens_total", "disconnected") - saved_before == 45
+        assert llm._slots.acquire(blocking=False)
+        llm._slots.release()
+
+    def test_completed_generation_updates_mean(self, llm):
+        """Тест: без отмены ответ возвращается целиком, средняя длина обновляется."""
+        llm.llm = StubChatModel(tokens=3)
+        set_deadline(Deadline(30))
+
+        assert llm.complete("prompt") == "t0 t1 t2"
+        assert llm.mean_tokens == 3.0
+
+    def test_mean_uses_eval_count(self, llm):
+        """Тест: длина ответа берется из eval_count Ollama, а не из числа фрагментов."""
+        llm.llm = StubChatModel(tokens=3, eval_count=7)
+        set_deadline(Deadline(30))
+
+        llm.complete("prompt")
+        assert llm.mean_tokens == 7.0
+
+    def test_cancelled_before_first_token(self, llm):
+        """Тест: отмена во время обработки промпта закрывает поток, не дожидаясь токенов."""
+        llm.llm = StubChatModel(prompt_delay=30)
+        llm.mean_tokens = 50.0
+        set_deadline(Deadline(0.1))
+        saved_before = _sample("rag_cancellation_saved_tokens_total", "deadline")
+
+        started = time.perf_counter()
+        with pytest.raises(RequestCancelled) as error:
+            llm.complete("prompt")
+        assert error.value.stage == "llm_generation"
+        assert time.perf_counter() - started < 1
+        assert llm.llm.closed
+        assert llm.llm.generated == 0
+        assert _sample("rag_cancellation_saved_tokens_total", "deadline") - saved_before == 50
+        assert llm._slots.acquire(blocking=False)
+        llm._slots.release()
+
+    def test_cancelled_while_queued(self, llm):
+        """Тест: отмененный запрос уходит из очереди, не дожидаясь queue_timeout."""
+        llm.llm = StubChatModel()
+        while llm._slots.acquire(blocking=False):
+            pass
+        deadline = Deadline(0.05)
+        set_deadline(deadline)
+
+        started = time.perf_counter()
+        with pytest.raises(RequestCancelled) as error:
+            llm.complete("prompt", queue_timeout=10)
+        assert error.value.stage == "llm_queue"
+        assert time.perf_counter() - started < 1
+        assert llm.llm.generated == 0
@@ -0,0 +1,86 @@
+"""Тесты для поиска почти одинаковых чанков."""
+from app.rag.dedup import (
+    MinHasher,
+    find_near_duplicates,
+    jaccard,
+    lsh_bands,
+    shingles,
+    text_hash,
+    version_overlap,
+)
+
+TEXT = (
+    "To add a new user, go to Site administration > Users > Accounts > Add a new user. "
+    "Enter the username, a new password, first name, surname and email address, "
+    "then click the button Create user at the bottom of the page. "
+    "New users receive an email with their login details if the option to send it is enabled, "
+    "and an administrator can later change their profile fields, authentication method, "
+    "system roles and course enrolments from the list of users."
+)
+
+
+class TestShingles:
+    """Тесты для шинглов и MinHash."""
+
+    def test_jaccard_of_edited_text(self):
+        """Тест: правка одного слова оставляет большую часть шинглов общей."""
+        edited = TEXT.replace("bottom", "end")
+
+        assert jaccard(shingles(TEXT), shingles(TEXT)) == 1.0
+        assert 0.7 < jaccard(shingles(TEXT), shingles(edited)) < 1.0
+        assert shingles("Add user") == shingles("add, USER!")
+
+    def test_minhash_estimates_jaccard(self):
+        """Тест: доля совпадающих значений сигнатур близка к коэффициенту Жаккара."""
+        hasher = MinHasher(num_perm=256)
+        first, second = shingles(TEXT), shingles(TEXT.replace("bottom", "end"))
+
+        estimate = (hasher.signature(first) == hasher.signature(second)).mean()
+        assert abs(estimate - jaccard(first, second)) < 0.15
+
+    def test_lsh_bands(self):
+        """Тест выбора числа полос под порог."""
+        assert lsh_bands(64, 0.85) == 16
+        assert lsh_bands(64, 0.5) == 32
+
+
+class TestFindNearDuplicates:
+    """Тесты для find_near_duplicates."""
+
+    def test_finds_copies_of_earlier_texts(self):
+        """Тест: копии с мелкими правками ссылаются на первый текст, разные тексты остаются."""
+        texts = [
+            TEXT,
+            "Backups of courses are created from the course administration menu with the Backup link.",
+            TEXT.replace("Add a new user", "Add new user"),
+            TEXT,
+        ]
+
+        assert find_near_duplicates(texts, threshold=0.8) == {2: 0, 3: 0}
+
+    def test_threshold(self):
+        """Тест: при пороге выше сходства текст не считается дубликатом."""
+        texts = [TEXT, TEXT.replace("bottom", "end")]
+        similarity = jaccard(shingles(texts[0]), shingles(texts[1]))
+
+        assert find_near_duplicates(texts, threshold=similarity - 0.01) == {1: 0}
+        assert find_near_duplicates(texts, threshold=similarity + 0.01) == {}
+
+
+class TestVersionOverlap:
+    """Тесты для подсчета совпадающих чанков версий."""
+
+    def test_counts_shared_texts(self):
+        """Тест: общие чанки хранятся в каждой коллекции, уникальных текстов меньше."""
+        common = [text_hash(f"общий чанк {i}") for i in range(8)]
+        hashes = {
+            "moodle_docs_311_en": common + [text_hash("только 3.11")],
+            "moodle_docs": common + [text_hash("только 4.3"), text_hash("еще 4.3")],
+        }
+
+        report = version_overlap(hashes, bytes_per_vector=100)
+
+        assert report["stored_vectors"] == 19
+        assert report["unique_texts"] == 11
+        assert report["stored_bytes"] == 1900 and report["shared_bytes"] == 1100
+        assert report["collections"]["moodle_docs_311_en"] == {"chunks": 9, "shared_with_other_versions": 8}
@@ -0,0 +1,44 @@
+"""Тесты для извлекающего ответа."""
+from langchain_core.documents import Document
+
+from app.rag.extractive import EXTRACTIVE_HEADER, extractive_answer, select_sentences, split_sentences
+
+
+class TestExtractiveAnswer:
+    """Тесты для extractive_answer."""
+
+    def _documents(self):
+        return [
+            Document(
+                page_content="== Adding a course ==\nCourses are created by administrators. "
+                             "To add a new course, go to Site administration > Courses > Add a new course. "
+                             "Fill in the course settings and click Save.",
+                metadata={"title": "Adding a new course", "url": "https://docs.moodle.org/403/en/Adding_a_new_course",
+                          "score": 0.82},
+            ),
+            Document(
+                page_content="The gradebook collects grades. Teachers can add a new grade item to a course.",
+                metadata={"title": "Gradebook", "url": "https://docs.moodle.org/403/en/Gradebook", "score": 0.41},
+            ),
+        ]
+
+    def test_split_sentences(self):
+        """Тест разбиения без заголовков и обрывков."""
+        sentences = split_sentences("== Settings ==\nOpen the course page. Short.\nClick Save changes to apply.")
+
+        assert sentences == ["Open the course page.", "Click Save changes to apply."]
+
+    def test_selects_matching_sentence(self):
+        """Тест выбора предложения с наибольшим совпадением со словами запроса."""
+        selected = select_sentences("How to add a new course?", self._documents(), max_sentences=1)
+
+        assert selected == [(0, 1, "To add a new course, go to Site administration > Courses > Add a new course.")]
+
+    def test_answer_has_titles_and_urls(self):
+        """Тест формата ответа: заголовок, источники и выдержки в порядке документов."""
+        answer = extractive_answer("add new course", self._documents(), max_sentences=3)
+
+        assert answer.startswith(EXTRACTIVE_HEADER)
+        assert "Adding a new course (https://docs.moodle.org/403/en/Adding_a_new_course)" in answer
+        assert answer.index("Adding a new course") < answer.index("Gradebook")
+        assert answer.count("\n- ") == 3
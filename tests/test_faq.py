@@ -0,0 +1,64 @@
+"""Тесты для хранилища FAQ."""
+import json
+
+import pytest
+
+from app.rag.faq import FAQStore, normalize_question
+
+
+class TestFAQStore:
+    """Тесты для FAQStore."""
+
+    @pytest.fixture
+    def store(self):
+        """FAQ с ответами для двух версий и одной ошибкой."""
+        source = {"title": "Create a course", "url": "https://docs.moodle.org/403/en/Create_a_course",
+                  "chunk_id": "1_0", "score": 0.9}
+        return FAQStore([
+            {"id": "1", "question": "Как создать курс?", "version": "403",
+             "answer": "Откройте управление курсами.", "sources": [source]},
+            {"id": "2", "question": "Как создать курс?", "version": "311",
+             "answer": "Ответ для 3.11.", "sources": []},
+            {"id": "3", "question": "Как настроить журнал оценок?", "version": "403",
+             "error": "ответ без источников"},
+        ], default_version="403", match_threshold=0.85)
+
+    def test_normalize_question(self):
+        """Тест нормализации регистра, пунктуации и буквы ё."""
+        assert normalize_question("  Где ЖУРНАЛ оценок, ёлки?! ") == "где журнал оценок елки"
+
+    def test_exact_match(self, store):
+        """Тест точного совпадения после нормализации."""
+        entry = store.lookup("как создать КУРС")
+
+        assert entry["id"] == "1"
+        assert entry["match"] == "exact"
+        assert entry["score"] == 1.0
+
+    def test_fuzzy_match(self, store):
+        """Тест почти точного совпадения с опечаткой."""
+        entry = store.lookup("Как создать курсс?")
+
+        assert entry["id"] == "1"
+        assert entry["match"] == "fuzzy"
+
+    def test_version_and_errors(self, store):
+        """Тест разделения версий и пропуска неудачных ответов."""
+        assert store.lookup("Как создать курс?", version="311")["answer"] == "Ответ для 3.11."
+        assert store.lookup("Как создать курс?", version="401") is None
+        assert store.lookup("Как настроить журнал оценок?") is None
+        assert store.lookup("Как удалить пользователя?") is None
+        assert len(store) == 2
+
+    def test_load(self, tmp_path):
+        """Тест загрузки вывода batch_answer из JSONL."""
+        path = tmp_path / "answers.jsonl"
+        path.write_text(
+            json.dumps({"id": "1", "question": "Что такое Moodle?", "answer": "LMS.", "sources": []},
+                       ensure_ascii=False) + "\n\n",
+            encoding="utf-8"
+        )
+
+        store = FAQStore.load(path, default_version="403")
+
+        assert store.lookup("что такое moodle")["answer"] == "LMS."
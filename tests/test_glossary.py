@@ -0,0 +1,66 @@
+"""Тесты для глоссарного переводчика."""
+import pytest
+
+from app.core.glossary import AhoCorasick, GlossaryTranslator
+
+
+class TestAhoCorasick:
+    """Тесты для автомата Ахо-Корасик."""
+
+    def test_finds_overlapping_patterns(self):
+        """Тест поиска пересекающихся шаблонов."""
+        automaton = AhoCorasick()
+        for value, pattern in enumerate(["he", "she", "his", "hers"]):
+            automaton.add(pattern, value)
+
+        matches = sorted(automaton.iter_matches("ushers"))
+        assert matches == [(1, 4, 1), (2, 4, 0), (2, 6, 3)]
+
+
+class TestGlossaryTranslator:
+    """Тесты для GlossaryTranslator."""
+
+    @pytest.fixture
+    def glossary(self):
+        """Глоссарий с заголовками страниц из репозитория."""
+        return GlossaryTranslator()
+
+    def test_translates_homework_query(self, glossary):
+        """Тест перевода тестового запроса."""
+        annotation = glossary.annotate("Как создать новый курс в Moodle?")
+
+        assert annotation["translation"] == "how to create new course moodle"
+        assert annotation["uncovered"] == []
+
+    def test_matches_word_boundaries(self, glossary):
+        """Тест: служебное слово не заменяется внутри других слов."""
+        annotation = glossary.annotate("какие курсы")
+
+        assert annotation["translation"] == "which course"
+        assert "how to" not in annotation["translation"]
+
+    def test_longest_phrase_wins(self, glossary):
+        """Тест: фраза приоритетнее отдельных слов."""
+        assert glossary.translate("журнал оценок") == "gradebook"
+
+    @pytest.mark.parametrize("text,expected", [
+        ("логин", "login"),
+        ("новости", "news"),
+        ("настройки курса", "settings course"),
+        ("логины пользователей", "login user"),
+    ])
+    def test_longest_stem_wins(self, glossary, text, expected):
+        """Тест: из пересекающихся основ ("лог*" и "логин*") выбирается самая длинная."""
+        assert glossary.translate(text) == expected
+
+    def test_english_titles_are_terms(self, glossary):
+        """Тест распознавания английских заголовков страниц."""
+        annotation = glossary.annotate("Как настроить Activity completion")
+
+        assert "activity completion" in annotation["terms"]
+
+    def test_reports_uncovered_words(self, glossary):
+        """Тест: неизвестные русские слова попадают в uncovered."""
+        annotation = glossary.annotate("покажи курсы")
+
+        assert annotation["uncovered"] == ["покажи"]
@@ -0,0 +1,64 @@
+"""Тесты времени импорта приложения."""
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).parent.parent
+BUDGET_FILE = Path(__file__).parent / "import_budget.json"
+
+
+def parse_importtime(stderr: str) -> Dict[str, float]:
+    """Накопленное время импорта модулей в мс из вывода `python -X importtime`."""
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative_us, module = line.split("|")
+        cumulative[module.strip()] = int(cumulative_us) / 1000
+    return cumulative
+
+
+class TestImportTime:
+    """Импорт app.main укладывается в бюджет и не загружает тяжелые зависимости."""
+
+    @pytest.fixture(scope="class")
+    def budget(self):
+        return json.loads(BUDGET_FILE.read_text(encoding="utf-8"))
+
+    @pytest.fixture(scope="class")
+    def import_times(self):
+        """Время импорта модулей в свежем интерпретаторе."""
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import app.main"],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=120,
+        )
+        assert result.returncode == 0, result.stderr[-2000:]
+        return parse_importtime(result.stderr)
+
+    def test_parse_importtime(self):
+        """Тест разбора вывода -X importtime."""
+        stderr = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   _io\n"
+            "import time:      1500 |       2500 | app.main\n"
+        )
+        assert parse_importtime(stderr) == {"_io": 0.12, "app.main": 2.5}
+
+    def test_heavy_modules_are_lazy(self, budget, import_times):
+        """Тест: torch, transformers, chromadb и др. не импортируются вместе с приложением."""
+        imported = {name.split(".")[0] for name in import_times}
+        assert imported.isdisjoint(budget["forbidden_modules"]), \
+            sorted(imported & set(budget["forbidden_modules"]))
+
+    def test_import_budget(self, budget, import_times):
+        """Тест бюджета времени импорта модулей приложения."""
+        over_budget = {
+            module: round(import_times[module])
+            for module, limit in budget["budgets_ms"].items()
+            if import_times.get(module, 0) > limit
+        }
+        assert not over_budget, f"Импорт дольше бюджета (мс): {over_budget}"
@@ -0,0 +1,61 @@
+"""Тесты для бандла индекса."""
+import numpy as np
+import pytest
+
+from app.rag.index_bundle import IndexBundle, current_bundle, list_bundles, write_bundle
+
+
+def make_bundle(root, seed=0):
+    """Бандл из трех страниц по два чанка."""
+    rng = np.random.default_rng(seed)
+    embeddings = rng.normal(size=(6, 16)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    ids = [f"{page}_{index}" for page in range(1, 4) for index in range(2)]
+    documents = [f"Текст чанка {chunk_id}" for chunk_id in ids]
+    metadatas = [
+        {"page_id": chunk_id.split("_")[0], "title": f"Page {chunk_id.split('_')[0]}",
+         "url": "https://docs.moodle.org/403/en/Page", "chunk_index": int(chunk_id.split("_")[1]),
+         "total_chunks": 2}
+        for chunk_id in ids
+    ]
+    return write_bundle(root, ids, documents, metadatas, embeddings, {"embedding_model": "test"}), embeddings
+
+
+class TestIndexBundle:
+    """Тесты для IndexBundle."""
+
+    @pytest.fixture
+    def bundle(self, tmp_path):
+        """Загруженный бандл и его эмбеддинги."""
+        path, embeddings = make_bundle(tmp_path)
+        bundle = IndexBundle(path)
+        yield bundle, embeddings
+        bundle.close()
+
+    def test_search_returns_documents(self, bundle):
+        """Тест точного поиска с текстами и метаданными."""
+        store, embeddings = bundle
+
+        documents = store.similarity_search_by_vector(embeddings[3].tolist(), k=2)
+
+        assert documents[0].metadata["chunk_id"] == "2_1"
+        assert documents[0].page_content == "Текст чанка 2_1"
+        assert documents[0].metadata["title"] == "Page 2"
+
+    def test_filters_by_page(self, bundle):
+        """Тест фильтра по page_id в поиске и в get."""
+        store, embeddings = bundle
+
+        documents = store.similarity_search_by_vector(embeddings[0].tolist(), k=5, filter={"page_id": {"$in": ["3"]}})
+        data = store.get(where={"page_id": {"$in": ["1"]}})
+
+        assert {doc.metadata["page_id"] for doc in documents} == {"3"}
+        assert data["ids"] == ["1_0", "1_1"]
+
+    def test_new_bundle_becomes_current(self, tmp_path):
+        """Тест: новый бандл становится актуальным, старый остается на диске."""
+        first, _ = make_bundle(tmp_path, seed=0)
+        second, _ = make_bundle(tmp_path, seed=1)
+
+        assert current_bundle(tmp_path) == second
+        assert list_bundles(tmp_path) == sorted([first.name, second.name])
@@ -0,0 +1,51 @@
+"""Тесты для реестра сборок индекса."""
+import pytest
+
+from app.rag.index_registry import IndexRegistry, logical_name
+
+
+@pytest.fixture
+def registry(tmp_path):
+    """Пустой реестр во временной папке."""
+    return IndexRegistry(tmp_path / "registry.json")
+
+
+class TestIndexRegistry:
+    """Тесты для IndexRegistry."""
+
+    def test_resolves_legacy_name_without_builds(self, registry):
+        """Тест: без сборок используется логическое имя коллекции."""
+        assert registry.resolve("moodle_docs") == "moodle_docs"
+
+    def test_publish_and_activate(self, registry):
+        """Тест публикации без активации и последующего переключения."""
+        registry.publish("moodle_docs", "moodle_docs__1")
+        registry.publish("moodle_docs", "moodle_docs__2", activate=False)
+
+        assert registry.resolve("moodle_docs") == "moodle_docs__1"
+        assert registry.activate("moodle_docs", "moodle_docs__2") == "moodle_docs__1"
+        assert registry.resolve("moodle_docs") == "moodle_docs__2"
+        assert logical_name("moodle_docs__2") == "moodle_docs"
+
+    def test_rejects_unknown_build(self, registry):
+        """Тест: нельзя активировать незарегистрированную сборку."""
+        with pytest.raises(ValueError):
+            registry.activate("moodle_docs", "moodle_docs__404")
+
+    def test_obsolete_keeps_active_and_previous(self, registry):
+        """Тест: устаревшими считаются сборки старше предыдущей активной."""
+        for build in ("moodle_docs__1", "moodle_docs__2", "moodle_docs__3"):
+            registry.publish("moodle_docs", build)
+
+        assert registry.obsolete("moodle_docs", keep=1) == ["moodle_docs__1"]
+
+        registry.forget("moodle_docs", ["moodle_docs__1"])
+        assert registry.obsolete("moodle_docs", keep=1) == []
+
+    def test_obsolete_waits_for_grace_period(self, registry):
+        """Тест: только что отключенная сборка не удаляется до конца grace периода."""
+        for build in ("moodle_docs__1", "moodle_docs__2"):
+            registry.publish("moodle_docs", build)
+
+        assert registry.obsolete("moodle_docs", keep=0, grace=300) == []
+        assert registry.obsolete("moodle_docs", keep=0) == ["moodle_docs__1"]
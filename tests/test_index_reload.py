@@ -0,0 +1,89 @@
+"""Тесты для blue/green перезагрузки индекса."""
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.rag import pipeline as pipeline_module
+from app.rag.index_registry import IndexRegistry
+from app.rag.pipeline import LangChainRAGPipeline
+
+
+class StubVersionedRetriever:
+    """Retriever версий, который запоминает сборки и закрытие."""
+
+    healthy = True
+
+    def __init__(self, embeddings=None, collections=None):
+        self.default = SimpleNamespace(embeddings=embeddings, index_name="moodle_docs")
+        self.collections = {"moodle_docs": (collections or {}).get("moodle_docs", "moodle_docs__1")}
+        self.retrievers = {("403", "en"): SimpleNamespace(index_name="moodle_docs", client=None)}
+        self.closed = False
+
+    def ping_vectorstore(self):
+        # Какая сборка активна в реестре в момент проверки
+        self.active_at_check = pipeline_module.index_registry.resolve("moodle_docs")
+        return {"healthy": self.healthy, "message": "ok" if self.healthy else "пусто"}
+
+    def retrieve(self, query, translate=None):
+        return ["doc"]
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    """Реестр с активной сборкой moodle_docs__1 и опубликованной moodle_docs__2."""
+    registry = IndexRegistry(tmp_path / "registry.json")
+    registry.publish("moodle_docs", "moodle_docs__1")
+    registry.publish("moodle_docs", "moodle_docs__2", activate=False)
+    monkeypatch.setattr(pipeline_module, "index_registry", registry)
+    monkeypatch.setattr(pipeline_module, "VersionedRetriever", StubVersionedRetriever)
+    monkeypatch.setattr(settings, "bundles_dir", tmp_path / "bundles")
+    return registry
+
+
+@pytest.fixture
+def rag_pipeline():
+    """Пайплайн без моделей: только то, что нужно перезагрузке индекса."""
+    rag_pipeline = LangChainRAGPipeline.__new__(LangChainRAGPipeline)
+    rag_pipeline.retriever = StubVersionedRetriever(embeddings="model")
+    rag_pipeline._reload_lock = pipeline_module.threading.Lock()
+    return rag_pipeline
+
+
+class TestReloadIndex:
+    """Тесты для LangChainRAGPipeline.reload_index."""
+
+    def test_failed_build_is_not_activated(self, registry, rag_pipeline, monkeypatch):
+        """Тест: сборка, не прошедшая проверку, не попадает в реестр как активная."""
+        monkeypatch.setattr(StubVersionedRetriever, "healthy", False)
+        previous = rag_pipeline.retriever
+
+        with pytest.raises(RuntimeError):
+            rag_pipeline.reload_index("moodle_docs__2")
+
+        assert registry.resolve("moodle_docs") == "moodle_docs__1"
+        assert rag_pipeline.retriever is previous
+        assert not previous.closed
+
+    def test_unknown_build_is_rejected(self, registry, rag_pipeline):
+        """Тест: незарегистрированная сборка отклоняется до построения retriever'а."""
+        with pytest.raises(ValueError):
+            rag_pipeline.reload_index("moodle_docs__404")
+
+    def test_previous_index_closed_after_grace_period(self, registry, rag_pipeline, monkeypatch):
+        """Тест: прежний индекс закрывается и удаляется не сразу после переключения."""
+        monkeypatch.setattr(settings, "index_gc_grace_seconds", 300)
+        previous = rag_pipeline.retriever
+
+        result = rag_pipeline.reload_index("moodle_docs__2")
+
+        assert result["active"] == {"moodle_docs": "moodle_docs__2"}
+        assert rag_pipeline.retriever.active_at_check == "moodle_docs__1"
+        assert registry.resolve("moodle_docs") == "moodle_docs__2"
+        assert not previous.closed
+
+        rag_pipeline._cleanup(previous)
+        assert previous.closed
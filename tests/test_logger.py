@@ -0,0 +1,29 @@
+"""Тесты для логгера приложения."""
+import json
+import logging
+import queue
+
+from app.core.logger import JsonFormatter, TracebackQueueHandler
+
+
+class TestJsonLogging:
+    """Тесты для записи логов в JSON через очередь."""
+
+    def test_exception_survives_queue(self):
+        """Тест: traceback из logger.exception доходит до JSON форматтера слушателя."""
+        log_queue: queue.Queue = queue.Queue()
+        logger = logging.getLogger("test_exception_survives_queue")
+        logger.propagate = False
+        logger.addHandler(TracebackQueueHandler(log_queue))
+
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logger.exception("Ошибка в %s", "пайплайне")
+
+        entry = json.loads(JsonFormatter().format(log_queue.get_nowait()))
+
+        assert entry["message"] == "Ошибка в пайплайне"
+        assert entry["level"] == "ERROR"
+        assert "ZeroDivisionError: division by zero" in entry["exc_info"]
+        assert entry["exc_info"].startswith("Traceback")
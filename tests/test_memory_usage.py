@@ -0,0 +1,91 @@
+"""Тесты для учета памяти по компонентам."""
+import sys
+
+from app.core.memory_usage import (
+    deep_sizeof,
+    start_tracemalloc,
+    stop_tracemalloc,
+    summarize,
+    tracemalloc_top,
+)
+from app.rag.memory import ConversationMemory
+
+
+class Node:
+    __slots__ = ("children", "value")
+
+    def __init__(self, value):
+        self.children = {}
+        self.value = value
+
+
+class TestDeepSizeof:
+    """Тесты для deep_sizeof."""
+
+    def test_counts_referenced_objects_once(self):
+        """Тест: вложенные объекты учитываются, общие — один раз."""
+        text = "x" * 10000
+        assert deep_sizeof([text]) >= sys.getsizeof(text)
+        assert deep_sizeof([text, text]) < 2 * sys.getsizeof(text)
+
+        node = Node("a" * 1000)
+        node.children["b"] = Node("b" * 1000)
+        assert deep_sizeof(node) > 2000
+
+    def test_sampled_estimate(self):
+        """Тест: оценка большого словаря по выборке близка к полному обходу."""
+        data = {f"key-{i}": ["v" * (i % 50)] for i in range(20000)}
+
+        exact = deep_sizeof(data, sample=len(data))
+        estimate = deep_sizeof(data, sample=256)
+
+        assert abs(estimate - exact) / exact < 0.1
+
+
+class TestMemoryReport:
+    """Тесты для отчетов о памяти компонентов."""
+
+    def test_conversation_memory(self):
+        """Тест: память сессий растет вместе с историей."""
+        memory = ConversationMemory()
+        empty = memory.memory_usage()["sessions"]
+        for i in range(5):
+            memory.add_message(f"s{i}", "user", f"{i}. " + "Как создать курс? " * 50)
+
+        usage = memory.memory_usage()["sessions"]
+        assert usage["kind"] == "sessions"
+        assert usage["entries"] == 5
+        assert usage["bytes"] > empty["bytes"] + 5 * 900
+
+    def test_summarize(self):
+        """Тест строки лога: компоненты по убыванию размера."""
+        report = {
+            "rss_bytes": 3 * 1024 ** 3,
+            "accounted_bytes": 600 * 1024 ** 2,
+            "components": {
+                "sessions": {"bytes": 2048},
+                "embeddings.model": {"bytes": 500 * 1024 ** 2},
+                "translator.model": {"bytes": 100 * 1024 ** 2},
+            },
+        }
+
+        line = summarize(report, limit=2)
+
+        assert line.startswith("Память: RSS 3.00 ГБ, учтено 600.0 МБ")
+        assert line.endswith("embeddings.model 500.0 МБ, translator.model 100.0 МБ")
+
+    def test_tracemalloc_top(self):
+        """Тест: снимок tracemalloc доступен только при включенной трассировке."""
+        stop_tracemalloc()
+        assert tracemalloc_top(5) == {"tracing": False, "traced_bytes": 0, "peak_bytes": 0, "top": []}
+
+        start_tracemalloc(1)
+        try:
+            allocated = [bytearray(100000) for _ in range(10)]
+            snapshot = tracemalloc_top(5)
+        finally:
+            stop_tracemalloc()
+
+        assert snapshot["tracing"] and allocated
+        assert snapshot["traced_bytes"] >= 10 * 100000
+        assert snapshot["top"][0]["location"].startswith(__file__)
@@ -0,0 +1,57 @@
+"""Тесты для бандла моделей."""
+import json
+
+import pytest
+
+from app.core.config import settings
+from app.core.model_store import (
+    MANIFEST_FILE,
+    file_sha256,
+    is_prequantized,
+    model_dir_name,
+    resolve_model,
+    verify_model,
+)
+
+MODEL = "Helsinki-NLP/opus-mt-ru-en"
+
+
+class TestModelStore:
+    """Тесты для resolve_model и verify_model."""
+
+    @pytest.fixture
+    def models_dir(self, tmp_path, monkeypatch):
+        """models_dir с одной сохраненной моделью."""
+        monkeypatch.setattr(settings, "models_dir", tmp_path)
+        model_path = tmp_path / model_dir_name(MODEL)
+        model_path.mkdir()
+        weights = model_path / "model.safetensors"
+        weights.write_bytes(b"weights")
+        manifest = {"models": {MODEL: {
+            "component": "translator",
+            "path": model_path.name,
+            "quantized": True,
+            "files": {"model.safetensors": file_sha256(weights)},
+        }}}
+        (tmp_path / MANIFEST_FILE).write_text(json.dumps(manifest), encoding="utf-8")
+        return tmp_path
+
+    def test_resolve_local_model(self, models_dir):
+        """Тест загрузки модели из models_dir."""
+        assert resolve_model(MODEL) == str(models_dir / "Helsinki-NLP__opus-mt-ru-en")
+        assert is_prequantized(MODEL)
+
+    def test_resolve_missing_model(self, models_dir, monkeypatch):
+        """Тест модели вне бандла: имя на Hub или ошибка в офлайн режиме."""
+        assert resolve_model("cross-encoder/ms-marco-MiniLM-L-6-v2") == "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+        monkeypatch.setattr(settings, "offline_models", True)
+        with pytest.raises(FileNotFoundError):
+            resolve_model("cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+    def test_verify_checksums(self, models_dir):
+        """Тест проверки контрольных сумм."""
+        assert verify_model(MODEL) == {}
+
+        (models_dir / model_dir_name(MODEL) / "model.safetensors").write_bytes(b"corrupted")
+        assert verify_model(MODEL) == {"model.safetensors": "checksum"}
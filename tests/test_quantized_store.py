@@ -0,0 +1,112 @@
+"""Тесты для квантованного векторного хранилища."""
+import numpy as np
+import pytest
+
+from app.rag.quantized_store import QuantizedVectorStore, QuantizedView, open_shared, update_shared, write_view
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    """Индекс из случайных нормализованных векторов."""
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(500, 64)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    ids = [f"chunk_{i}" for i in range(len(embeddings))]
+    page_ids = [str(i // 5) for i in range(len(embeddings))]
+    QuantizedVectorStore.build(tmp_path, ids, page_ids, embeddings)
+    return tmp_path, embeddings
+
+
+class TestQuantizedVectorStore:
+    """Тесты для QuantizedVectorStore."""
+
+    @pytest.mark.parametrize("quantization", ["int8", "binary"])
+    def test_finds_exact_neighbours(self, store_path, quantization):
+        """Тест: пересчет возвращает тот же top-k, что и точный поиск."""
+        path, embeddings = store_path
+        store = QuantizedVectorStore(path, quantization)
+
+        query = embeddings[42]
+        expected = [f"chunk_{i}" for i in np.argsort(-(embeddings @ query))[:5]]
+        found = [chunk_id for chunk_id, _ in store.search(query, 5, shortlist=200)]
+
+        assert found[0] == "chunk_42"
+        assert found == expected
+
+    def test_int8_shortlist_with_mean_offset(self, tmp_path):
+        """Тест: при ненулевом среднем эмбеддингов короткий список по int8 кодам не теряет соседей."""
+        rng = np.random.default_rng(1)
+        # Как у sentence-transformers: все векторы смещены в одну сторону
+        embeddings = rng.normal(size=(2000, 64)).astype(np.float32) + 1.5
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        ids = [f"chunk_{i}" for i in range(len(embeddings))]
+        QuantizedVectorStore.build(tmp_path, ids, ["0"] * len(ids), embeddings)
+        store = QuantizedVectorStore(tmp_path, "int8", "ip")
+
+        recalls = []
+        for row in range(0, 2000, 100):
+            query = embeddings[row] + rng.normal(scale=0.05, size=64).astype(np.float32)
+            expected = {f"chunk_{i}" for i in np.argsort(-(embeddings @ query))[:10]}
+            found = {chunk_id for chunk_id, _ in store.search(query, 10, shortlist=20)}
+            recalls.append(len(found & expected) / 10)
+
+        assert np.mean(recalls) >= 0.95
+
+    def test_filters_by_page(self, store_path):
+        """Тест поиска только среди чанков выбранных страниц."""
+        path, embeddings = store_path
+        store = QuantizedVectorStore(path)
+
+        hits = store.search(embeddings[42], 10, page_ids=["3", "4"])
+
+        assert len(hits) == 10
+        assert {int(chunk_id.split("_")[1]) // 5 for chunk_id, _ in hits} == {3, 4}
+
+    def test_codes_are_smaller_than_float32(self, store_path):
+        """Тест оценки экономии памяти."""
+        path, _ = store_path
+
+        assert QuantizedVectorStore(path, "int8").memory_stats()["reduction"] == 4.0
+        assert QuantizedVectorStore(path, "binary").memory_stats()["reduction"] == 32.0
+
+
+class TestSharedVectors:
+    """Тесты для общей матрицы векторов версий документации."""
+
+    def test_versions_share_identical_texts(self, tmp_path):
+        """Тест: совпадающие тексты хранятся один раз, поиск версии — только по ее чанкам."""
+        rng = np.random.default_rng(2)
+        texts = rng.normal(size=(300, 32)).astype(np.float32)
+        texts /= np.linalg.norm(texts, axis=1, keepdims=True)
+        # Три версии по 200 текстов, соседние совпадают на 150
+        versions = {name: np.arange(start, start + 200) for name, start in (("311", 0), ("401", 50), ("403", 100))}
+
+        root = tmp_path / "shared"
+        for name, text_rows in versions.items():
+            rows = update_shared(root, [f"hash_{i}" for i in text_rows], texts[text_rows])
+            write_view(tmp_path / name, [f"{name}_{i}" for i in text_rows], [name] * len(text_rows), rows)
+
+        shared = open_shared(root)
+        views = {name: QuantizedView(tmp_path / name, shared) for name in versions}
+
+        assert len(shared) == 300
+        assert shared.codes.nbytes == 300 * 32
+        assert sum(len(view) for view in views.values()) == 600
+
+        query = texts[120]
+        for name, text_rows in versions.items():
+            expected = [f"{name}_{text_rows[i]}" for i in np.argsort(-(texts[text_rows] @ query))[:5]]
+            assert [chunk_id for chunk_id, _ in views[name].search(query, 5, shortlist=100)] == expected
+
+    def test_rows_survive_new_generation(self, tmp_path):
+        """Тест: новая версия дописывается в конец, строки старых коллекций не меняются."""
+        rng = np.random.default_rng(3)
+        vectors = rng.normal(size=(4, 8)).astype(np.float32)
+        root = tmp_path / "shared"
+
+        first = update_shared(root, ["a", "b", "c"], vectors[:3])
+        second = update_shared(root, ["c", "d", "a"], vectors[[2, 3, 0]])
+
+        assert first.tolist() == [0, 1, 2]
+        assert second.tolist() == [2, 3, 0]
+        assert open_shared(root).ids == ["a", "b", "c", "d"]
@@ -0,0 +1,66 @@
+"""Тесты для клиента сервиса поиска."""
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+
+from app.rag.remote_retriever import RemoteRetriever
+from app.retrieval_service import create_retrieval_app
+
+
+class StubRetriever:
+    """Локальная замена VersionedRetriever для сервиса поиска."""
+
+    def __init__(self):
+        self.calls = []
+
+    def retrieve(self, query, top_k=None, translate=None, version=None, lang=None, adaptive=None):
+        self.calls.append({"query": query, "top_k": top_k, "version": version})
+        return [
+            Document(page_content="To add a new course, go to Site administration.",
+                     metadata={"title": "Adding a new course", "url": "https://docs.moodle.org/403/en/Adding_a_new_course",
+                               "chunk_id": "10_0", "score": 0.81}),
+        ]
+
+    def get(self, version=None, lang=None):
+        return self
+
+    def search_query(self, query, translate=None):
+        return "How to create a course?"
+
+    def ping_embeddings(self):
+        return {"healthy": True, "message": "ok"}
+
+    def ping_vectorstore(self):
+        return {"healthy": True, "message": "ok"}
+
+
+class TestRemoteRetriever:
+    """Тесты для RemoteRetriever против локального сервиса."""
+
+    def _remote(self):
+        stub = StubRetriever()
+        client = TestClient(create_retrieval_app(stub))
+        return RemoteRetriever(base_url="http://testserver", client=client), stub
+
+    def test_retrieve(self):
+        """Тест поиска через сервис: документы, метаданные и параметры запроса."""
+        remote, stub = self._remote()
+
+        documents = remote.retrieve("Как создать курс?", top_k=3, version="401")
+
+        assert stub.calls == [{"query": "Как создать курс?", "top_k": 3, "version": "401"}]
+        assert documents[0].metadata["title"] == "Adding a new course"
+        assert remote.to_sources(documents)[0].score == 0.81
+        assert remote.search_query("Как создать курс?") == "How to create a course?"
+
+    def test_health(self):
+        """Тест проверок здоровья через сервис."""
+        remote, _ = self._remote()
+
+        assert remote.health_check()
+
+    def test_unavailable_service(self):
+        """Тест недоступного сервиса."""
+        remote = RemoteRetriever(base_url="http://127.0.0.1:9")
+
+        assert not remote.ping_vectorstore()["healthy"]
+        remote.close()
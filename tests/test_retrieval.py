@@ -1,124 +1,119 @@
 """Тесты для retriever."""
 import pytest
-import numpy as np
 from unittest.mock import Mock, patch
 
+from langchain_core.documents import Document
+
 from app.rag.retriever import LangChainRetriever
 from app.schemas import Source
 
 
 class TestLangChainRetriever:
     """Тесты для LangChainRetriever."""
-    
+
     @pytest.fixture
-    def mock_chroma_client(self):
-        """Мок для Chroma клиента."""
-        with patch('app.rag.retriever.chromadb.Client') as mock_client:
-            # Мокаем коллекцию
-            mock_collection = Mock()
-            mock_collection.count.return_value = 100
-            
+    def mock_vectorstore(self):
+        """Мок для Chroma (клиент и обертка LangChain импортируются при создании retriever'а)."""
+        with patch('app.rag.retriever.create_chroma_client'), \
+                patch('langchain_chroma.Chroma') as mock_chroma:
+            vectorstore = Mock()
+            vectorstore._collection.count.return_value = 100
+            vectorstore._collection.metadata = {}
+
             # Мокаем результаты поиска
-            mock_collection.query.return_value = {
-                "documents": [["Test document content"]],
-                "metadatas": [[{"title": "Test Page", "url": "https://test.com"}]],
-                "distances": [[0.1]],
-                "ids": [["test_chunk_1"]]
-            }
-            
-            mock_collection.get.return_value = {
-                "documents": ["Test document content"]
+            vectorstore.similarity_search_by_vector_with_relevance_scores.return_value = [
+                (Document(
+                    page_content="Test document content",
+                    metadata={"title": "Test Page", "url": "https://test.com", "chunk_id": "test_chunk_1"}
+                ), 0.1)
+            ]
+
+            vectorstore.get.return_value = {
+                "ids": ["test_chunk_1"],
+                "documents": ["Test document content"],
+                "metadatas": [{"title": "Test Page", "url": "https://test.com", "page_id": "1"}]
             }
-            
-            mock_client.return_value.get_collection.return_value = mock_collection
-            yield mock_client
-    
+
+            mock_chroma.return_value = vectorstore
+            yield vectorstore
+
     @pytest.fixture
     def mock_embedding_model(self):
         """Мок для модели эмбеддингов."""
-        with patch('app.rag.retriever.HuggingFaceEmbeddings') as mock_model:
+        with patch('langchain_huggingface.HuggingFaceEmbeddings') as mock_model, \
+                patch('app.rag.retriever.configure_torch_threads'):
             mock_instance = Mock()
-            # Создаем numpy array для эмбеддинга
-            mock_instance.encode.return_value = np.array([[0.1, 0.2, 0.3]])
+            mock_instance.embed_query.return_value = [0.1, 0.2, 0.3]
             mock_model.return_value = mock_instance
             yield mock_model
-    
-    def test_retriever_initialization(self, mock_chroma_client, mock_embedding_model):
+
+    def test_retriever_initialization(self, mock_vectorstore, mock_embedding_model):
         """Тест инициализации retriever."""
         retriever = LangChainRetriever()
         assert retriever is not None
-        assert retriever.collection is not None
-        assert retriever.embedding_model is not None
-    
-    def test_search_returns_sources(self, mock_chroma_client, mock_embedding_model):
+        assert retriever.vectorstore is mock_vectorstore
+        assert retriever.embeddings is mock_embedding_model.return_value
+
+    def test_search_returns_sources(self, mock_vectorstore, mock_embedding_model):
         """Тест поиска возвращает источники."""
         retriever = LangChainRetriever()
         sources = retriever.search("test query")
-        
+
         assert isinstance(sources, list)
         assert len(sources) > 0
         assert all(isinstance(source, Source) for source in sources)
-        
+
         # Проверяем структуру Source
         source = sources[0]
-        assert hasattr(source, 'title')
-        assert hasattr(source, 'url')
-        assert hasattr(source, 'chunk_id')
-        assert hasattr(source, 'score')
-    
-    def test_get_document_text(self, mock_chroma_client, mock_embedding_model):
-        """Тест получения текста документа."""
+        assert source.title == "Test Page"
+        assert source.url == "https://test.com"
+        assert source.chunk_id == "test_chunk_1"
+        assert 0.0 <= source.score <= 1.0
+
+    def test_get_documents(self, mock_vectorstore, mock_embedding_model):
+        """Тест получения чанков по id."""
         retriever = LangChainRetriever()
-        text = retriever.get_document_text("test_chunk_1")
-        
-        assert text is not None
-        assert isinstance(text, str)
-        assert "Test document content" in text
-    
-    def test_get_context(self, mock_chroma_client, mock_embedding_model):
+        documents = retriever.get_documents(["test_chunk_1"])
+
+        assert len(documents) == 1
+        assert documents[0].page_content == "Test document content"
+        assert documents[0].metadata["chunk_id"] == "test_chunk_1"
+
+    def test_get_context(self, mock_vectorstore, mock_embedding_model):
         """Тест получения контекста."""
         retriever = LangChainRetriever()
         context = retriever.get_context("test query")
-        
+
         assert isinstance(context, str)
         assert len(context) > 0
         assert "Test Page" in context
-    
-    def test_health_check(self, mock_chroma_client, mock_embedding_model):
+
+    def test_health_check(self, mock_vectorstore, mock_embedding_model):
         """Тест проверки здоровья."""
         retriever = LangChainRetriever()
         is_healthy = retriever.health_check()
-        
+
         assert isinstance(is_healthy, bool)
         assert is_healthy  # Должен быть здоров с моком
-    
-    def test_search_with_empty_results(self, mock_chroma_client, mock_embedding_model):
+
+    def test_search_with_empty_results(self, mock_vectorstore, mock_embedding_model):
         """Тест поиска с пустыми результатами."""
         # Мокаем пустые результаты
-        mock_collection = Mock()
-        mock_collection.query.return_value = {
-            "documents": [[]],
-            "metadatas": [[]],
-            "distances": [[]],
-            "ids": [[]]
-        }
-        mock_chroma_client.return_value.get_collection.return_value = mock_collection
-        
+        mock_vectorstore.similarity_search_by_vector_with_relevance_scores.return_value = []
+
         retriever = LangChainRetriever()
         sources = retriever.search("test query")
-        
+
         assert isinstance(sources, list)
         assert len(sources) == 0
-    
-    def test_search_exception_handling(self, mock_chroma_client, mock_embedding_model):
+
+    def test_search_exception_handling(self, mock_vectorstore, mock_embedding_model):
         """Тест обработки исключений при поиске."""
         # Мокаем исключение
-        mock_collection = Mock()
-        mock_collection.query.side_effect = Exception("Test error")
-        mock_chroma_client.return_value.get_collection.return_value = mock_collection
-        
+        mock_vectorstore.similarity_search_by_vector_with_relevance_scores.side_effect = Exception("Test error")
+
         retriever = LangChainRetriever()
         sources = retriever.search("test query")
-        
+
         assert isinstance(sources, list)
-        assert len(sources) == 0  # Должен вернуть пустой список при ошибке 
\ No newline at end of file
+        assert len(sources) == 0  # Должен вернуть пустой список при ошибке
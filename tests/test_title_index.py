@@ -0,0 +1,58 @@
+"""Тесты для индекса заголовков."""
+import pytest
+
+from app.rag.title_index import TitleIndex, normalize
+
+
+class TestTitleIndex:
+    """Тесты для TitleIndex."""
+
+    @pytest.fixture
+    def index(self):
+        """Индекс с несколькими страницами документации."""
+        index = TitleIndex()
+        index.add("Create a course", "1")
+        index.add("Gradebook", "2")
+        index.add("Gradebook FAQ", "3")
+        index.add("Accessibility", "4")
+        index.add("Activity completion settings", "5")
+        index.add_alias("Accesibility", "Accessibility")
+        return index
+
+    def test_normalize_strips_question(self):
+        """Тест нормализации вопроса до названия страницы."""
+        assert normalize("How to create a course in Moodle?") == "create course"
+
+    def test_exact_match(self, index):
+        """Тест точного совпадения."""
+        match = index.lookup("What is the Gradebook?")
+
+        assert match["title"] == "Gradebook"
+        assert match["page_ids"] == ["2"]
+        assert match["kind"] == "exact"
+        assert match["score"] == 1.0
+
+    def test_alias_match(self, index):
+        """Тест совпадения по алиасу."""
+        match = index.lookup("Accesibility")
+
+        assert match["title"] == "Accessibility"
+        assert match["page_ids"] == ["4"]
+
+    def test_unique_prefix_match(self, index):
+        """Тест однозначного префикса."""
+        match = index.lookup("activity completion")
+
+        assert match["kind"] == "prefix"
+        assert match["page_ids"] == ["5"]
+
+    def test_fuzzy_match(self, index):
+        """Тест нечеткого совпадения с опечаткой."""
+        match = index.lookup("Acessibility")
+
+        assert match["kind"] == "fuzzy"
+        assert match["title"] == "Accessibility"
+
+    def test_no_match(self, index):
+        """Тест запроса без названия страницы."""
+        assert index.lookup("why is my server slow") is None
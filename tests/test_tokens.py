@@ -0,0 +1,64 @@
+"""Тесты для учета токенов."""
+import sys
+from unittest.mock import Mock, patch
+
+from app.core.config import settings
+from app.rag.prompts import prompt_sections
+from app.rag.tokens import (
+    TokenCounter,
+    median_regressions,
+    median_tokens,
+    ollama_usage,
+    section_tokens,
+)
+
+
+class TestTokens:
+    """Тесты для разбивки промпта и метаданных Ollama."""
+
+    def test_section_tokens_without_tokenizer(self):
+        """Тест секций промпта с оценкой по символам."""
+        counter = TokenCounter(model_name="")
+        sections = prompt_sections("Как создать курс?", context="Adding a new course", history="")
+
+        counts = section_tokens(sections, counter)
+
+        assert not counter.exact
+        assert set(counts) == {"system", "context", "history", "question"}
+        assert counts["history"] == 0
+        assert counts["system"] > counts["context"] > 0
+        assert "ОТВЕТ:" in sections["system"] and "{prompt}" not in sections["system"]
+
+    def test_tokenizer_not_downloaded(self):
+        """Тест: по умолчанию токенизатора нет, а заданный читается только с диска."""
+        assert settings.llm_tokenizer is None
+        assert not TokenCounter().exact
+
+        transformers = Mock()
+        transformers.AutoTokenizer.from_pretrained.side_effect = OSError("not cached")
+        with patch.dict(sys.modules, {"transformers": transformers}):
+            counter = TokenCounter(model_name="Qwen/Qwen2.5-7B-Instruct")
+            assert not counter.exact
+
+        _, kwargs = transformers.AutoTokenizer.from_pretrained.call_args
+        assert kwargs["local_files_only"] is True
+        assert counter.count("a" * 35) == 10
+
+    def test_ollama_usage(self):
+        """Тест счетчиков токенов из метаданных Ollama и usage_metadata LangChain."""
+        assert ollama_usage({"prompt_eval_count": 812, "eval_count": 143}) == {"prompt": 812, "completion": 143}
+        assert ollama_usage({"usage_metadata": {"input_tokens": 10, "output_tokens": 3}}) == {
+            "prompt": 10, "completion": 3,
+        }
+
+    def test_median_regressions(self):
+        """Тест проверки роста медианы промпта."""
+        rows = [{"system": 300, "context": c, "history": 0, "question": 10, "total": 310 + c} for c in (100, 400, 500)]
+        medians = median_tokens(rows)
+        assert medians["context"] == 400.0
+
+        baseline = {"system": 300.0, "context": 380.0, "history": 0.0, "question": 10.0, "total": 700.0}
+        assert median_regressions(medians, baseline, tolerance=0.1) == {}
+        assert median_regressions(medians, baseline, tolerance=0.01) == {
+            "context": (380.0, 400.0), "total": (700.0, 710.0),
+        }
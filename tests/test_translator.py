@@ -0,0 +1,28 @@
+"""Тесты для переводчика запросов."""
+from prometheus_client import REGISTRY
+
+from app.core.translator import QueryTranslator
+
+
+def _cache_sample(kind):
+    return REGISTRY.get_sample_value(f"rag_cache_{kind}_total", {"cache": "translation"}) or 0.0
+
+
+class TestTranslateBatch:
+    """Тесты для пакетного перевода."""
+
+    def test_each_query_counted_once(self, monkeypatch):
+        """Тест: запрос батча учитывается в метриках кэша один раз — промахом или попаданием."""
+        monkeypatch.setattr(QueryTranslator, "_translate_model_batch", lambda self, texts: [f"en {t}" for t in texts])
+        monkeypatch.setattr(QueryTranslator, "_translate", lambda self, text, model_translation=None: f"en:{text}")
+        translator = QueryTranslator()
+        texts = ["как создать курс", "Moodle", "как создать курс", "настроить оценки"]
+
+        hits, misses = _cache_sample("hits"), _cache_sample("misses")
+        assert translator.translate_batch(texts) == [
+            "en:как создать курс", "Moodle", "en:как создать курс", "en:настроить оценки",
+        ]
+        assert (_cache_sample("hits") - hits, _cache_sample("misses") - misses) == (0, 2)
+
+        assert translator.translate_batch(texts)[0] == "en:как создать курс"
+        assert (_cache_sample("hits") - hits, _cache_sample("misses") - misses) == (2, 2)